@@ -0,0 +1,69 @@
+"""
+Сравнение ls -l на os.scandir с прежней реализацией на Path.iterdir.
+
+Запуск: python -m benchmarks.bench_ls [--entries 1000000] [--dir /tmp/ls-bench]
+Директория с пустыми файлами создается один раз и переиспользуется при следующих запусках.
+"""
+import argparse
+import datetime
+import logging
+import os
+import stat
+import tempfile
+import time
+from pathlib import Path
+
+from src.services.luckyos_console import LuckyOSConsoleService
+
+
+def iterdir_ls_long(path: Path) -> list[list[object]]:
+    """
+    Прежняя реализация ls -l: Path на каждый файл, stat, filemode и strftime для каждого
+    """
+    entry = []
+    for file in path.iterdir():
+        file_info = file.stat()
+        entry.append([
+            stat.filemode(file_info.st_mode),
+            file_info.st_nlink,
+            file_info.st_size,
+            datetime.datetime.fromtimestamp(file_info.st_mtime).strftime("%b %d %H:%M"),
+            file.name,
+        ])
+    return entry
+
+
+def make_directory(path: Path, entries: int) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    existing = sum(1 for _ in os.scandir(path))
+    for number in range(existing, entries):
+        with open(path / f"file{number:07}.txt", "wb"):
+            pass
+
+
+def measure(name: str, function, path: Path) -> float:
+    started = time.perf_counter()
+    result = function(path)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<10} {elapsed:8.2f} с  ({len(result)} записей)")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк ls -l")
+    parser.add_argument("--entries", type=int, default=1_000_000, help="Количество файлов в директории")
+    parser.add_argument("--dir", type=Path, default=Path(tempfile.gettempdir()) / "ls-bench",
+                        help="Директория для синтетических файлов")
+    args = parser.parse_args()
+
+    make_directory(args.dir, args.entries)
+    service = LuckyOSConsoleService(logging.getLogger("bench"))
+    # Первый проход прогревает кэш страниц и dentry, чтобы оба варианта были в равных условиях
+    iterdir_ls_long(args.dir)
+    before = measure("iterdir", iterdir_ls_long, args.dir)
+    after = measure("scandir", lambda path: service.ls(path, True), args.dir)
+    print(f"Ускорение: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
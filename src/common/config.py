@@ -3,6 +3,64 @@ from pathlib import Path
 LOG_FILE = "shell.log"
 MAX_LOG_SIZE = 5 * 1024 * 1024  # 5 MB
 
+# grep --jobs: сколько файлов отправляется в процесс за один раз
+GREP_BATCH_SIZE = 32
+# grep --jobs: сколько пакетов на один процесс может ожидать обработки
+GREP_BATCHES_PER_JOB = 2
+# Файлы от этого размера grep читает через mmap, если паттерн позволяет искать по байтам
+GREP_MMAP_THRESHOLD = 1024 * 1024  # 1 MB
+# По сколько байт считаются переводы строк между совпадениями в mmap
+GREP_NEWLINE_CHUNK = 16 * 1024 * 1024  # 16 MB
+# По сколько байт читаются файлы внутри архивов при grep
+GREP_STREAM_CHUNK = 64 * 1024  # 64 KB
+# grep считает файл бинарным, если в первых байтах есть NUL
+GREP_BINARY_CHECK = 8 * 1024  # 8 KB
+# Файлы с правилами игнорирования в стиле .gitignore
+IGNORE_FILE_NAMES = (".gitignore", ".ignore")
+# Служебные директории систем контроля версий, которые пропускаются вместе с правилами игнорирования
+VCS_DIR_NAMES = frozenset({".git", ".hg", ".svn"})
+# Где хранятся индексы триграмм для grep --index (по файлу на каждое дерево)
+GREP_INDEX_DIR = "~/.cache/luckyos/grep-index"
+# По сколько байт читаются файлы при построении индекса
+GREP_INDEX_CHUNK = 1024 * 1024  # 1 MB
+# ls -R/--tree: сколько директорий на текущем пути читается открытыми итераторами os.scandir;
+# глубже остаток директории читается в список, чтобы не упереться в лимит открытых файлов
+WALK_MAX_OPEN_DIRS = 64
+# cat: по сколько байт копируются файлы, если os.sendfile недоступен
+CAT_CHUNK = 1024 * 1024  # 1 MB
+# cat: файлы не больше этого размера выводятся в терминал через rich, остальные копируются потоком
+CAT_RICH_MAX_SIZE = 256 * 1024  # 256 KB
+# cat --lines: где хранятся индексы строк (по файлу на каждый индексированный файл)
+LINE_INDEX_DIR = "~/.cache/luckyos/line-index"
+# cat --lines: индекс запоминает смещение начала каждой LINE_INDEX_EVERY-й строки
+LINE_INDEX_EVERY = 1000
+# head/tail: по сколько байт читается файл (tail -n читает такими блоками от конца файла)
+TAIL_BLOCK = 64 * 1024  # 64 KB
+# tail -f без inotify: как часто (в секундах) проверяется размер файла
+TAIL_POLL_INTERVAL = 0.5
+# du: сколько потоков по умолчанию читают директории
+DU_JOBS = 8
+# cp -r: сколько потоков по умолчанию копируют файлы
+CP_JOBS = 8
+# cp -r: сколько файлов копирует одна задача пула (мелкие файлы не порождают задачу на каждый)
+CP_BATCH = 64
+# cp --checksum: какими блоками сравнивается содержимое файлов
+CP_COMPARE_BLOCK = 1024 * 1024  # 1 MB
+# cp --resume: какими блоками копируется файл, хэш каждого блока сохраняется в контрольной точке
+CP_RESUME_BLOCK = 4 * 1024 * 1024  # 4 MB
+# cp --resume: через сколько блоков данные сбрасываются на диск и сохраняется контрольная точка
+CP_RESUME_SYNC_BLOCKS = 16
+# Как часто (в секундах) долгие операции сообщают о прогрессе
+PROGRESS_INTERVAL = 0.2
+# За сколько последних секунд считается мгновенная скорость
+PROGRESS_WINDOW = 2.0
+# find: сколько потоков по умолчанию обходят поддеревья
+FIND_JOBS = 8
+# Где хранится кэш результатов grep --cache (по файлу на каждый запрос)
+GREP_CACHE_DIR = "~/.cache/luckyos/grep-cache"
+# Максимальный общий размер кэша результатов, давно не использованные запросы вытесняются
+GREP_CACHE_MAX_SIZE = 64 * 1024 * 1024  # 64 MB
+
 
 def check_and_clear_log_file():
     """
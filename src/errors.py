@@ -1,2 +1,11 @@
 class NotAZipFileError(OSError):
     pass
+
+
+class PartialCopyError(OSError):
+    """
+    Часть файлов дерева не скопирована, остальные скопированы
+    """
+    def __init__(self, message: str, errors: list[tuple[str, OSError]]):
+        super().__init__(message)
+        self.errors = errors
@@ -1,13 +1,20 @@
+import sys
+import time
 import typer
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager
 from rich.table import Table
 from rich.console import Console
+from rich.progress import BarColumn, Progress as ProgressBar, TextColumn, TimeElapsedColumn
 from typer import Typer, Argument, Option
 from logging import getLogger, config
 from typing_extensions import Annotated
-from src.common.config import LOGGING_CONFIG
+from src.common.config import CAT_RICH_MAX_SIZE, CP_JOBS, DU_JOBS, FIND_JOBS, LOGGING_CONFIG
 from pathlib import Path
 from src.services. luckyos_console import LuckyOSConsoleService
 from src.common.config import check_and_clear_log_file
+from src.errors import PartialCopyError
+from src.services.progress import Progress, format_duration, format_size
 
 
 app = Typer()
@@ -19,38 +26,93 @@ service = LuckyOSConsoleService(logger=logger)
 
 check_and_clear_log_file()
 
+# Максимальное число строк, которое копится перед выводом очередной части таблицы
+RENDER_BATCH_SIZE = 200
+# Как часто (в секундах) выводится накопленная часть таблицы, даже если она не заполнена
+RENDER_INTERVAL = 0.1
+
 @app.command()
 def ls(
         path: Annotated[Path, Argument(exists=False, readable=False, help="Путь к выводимой директории")] = Path.cwd(),
-        long: Annotated[bool, Option("--long", "-l", help="Расширенный формат вывода")] = False
+        long: Annotated[bool, Option("--long", "-l", help="Расширенный формат вывода")] = False,
+        limit: Annotated[int | None, Option("--limit", help="Вывести не больше N записей")] = None,
+        offset: Annotated[int, Option("--offset", help="Пропустить первые N записей")] = 0,
+        sort: Annotated[str | None, Option("--sort", help="Сортировка: name, size или mtime")] = None,
+        top: Annotated[int | None, Option("--top", help="Только N первых записей по --sort (по умолчанию самые большие)")] = None,
+        recursive: Annotated[bool, Option("-R", "--recursive", help="Вывести содержимое всех поддиректорий")] = False,
+        tree: Annotated[bool, Option("--tree", help="Вывести дерево директорий")] = False,
+        max_depth: Annotated[int | None, Option("--max-depth", help="Максимальная глубина для -R и --tree")] = None
 ) -> None:
     """
     Выводит содержимое директории
     :param path: путь к выводимой директории
     :param long: флаг для расширенного формата вывода
+    :param limit: максимальное количество выводимых записей
+    :param offset: количество пропускаемых записей (вместе с --limit - постраничный вывод)
+    :param sort: порядок: name - по имени, size - от больших к меньшим, mtime - от новых к старым
+    :param top: количество записей, которые выбираются по --sort без сортировки всей директории
+    :param recursive: флаг вывода содержимого каждой поддиректории отдельным блоком
+    :param tree: флаг вывода дерева директорий
+    :param max_depth: максимальная глубина выводимых записей для -R и --tree (записи самой директории - 1)
     :return: таблицу с содержанием директории
     """
+    if recursive and tree:
+        raise typer.BadParameter("Опции -R и --tree несовместимы")
+    if (recursive or tree) and (limit is not None or offset or sort is not None or top is not None):
+        raise typer.BadParameter("Опции -R и --tree не сочетаются с --limit, --offset, --sort и --top")
+    if max_depth is not None and not (recursive or tree):
+        raise typer.BadParameter("Опция --max-depth используется только вместе с -R или --tree")
     try:
-        content = service.ls(path, long)
-        table = Table()
-        if content and isinstance(content[0], str):
-            table.add_column("Название файла", justify="left", style="cyan")
-            for row  in content:
-                if isinstance(row, str):
-                    table.add_row(row.strip())
+        if recursive:
+            for number, (directory, block) in enumerate(service.iter_ls_recursive(path, long, max_depth)):
+                if number:
+                    console.print()
+                console.print(f"{directory}:", markup=False, highlight=False)
+                print_table_in_batches(
+                    block if long else ([str(row).strip()] for row in block),
+                    ls_long_table if long else ls_table
+                )
+            return
+        if tree:
+            console.print(str(path), markup=False, highlight=False)
+            print_lines_in_batches(
+                tree_line(prefix, row) for prefix, row in service.iter_ls_tree(path, long, max_depth)
+            )
+            return
+        rows = service.iter_ls(path, long, limit, offset, sort, top)
+        if long:
+            make_table = ls_long_table
         else:
-            table.add_column("Права", justify="center")
-            table.add_column("Количество ссылок", justify="center")
-            table.add_column("Размер (байт)", justify="center")
-            table.add_column("Дата изменения", justify="center")
-            table.add_column("Название файла", justify="center")
-            for row in content:
-                table.add_row(*map(str, row))
-        console.print(table)
-    except OSError as e:
+            make_table = ls_table
+            rows = ([str(row).strip()] for row in rows)
+        if not print_table_in_batches(rows, make_table):
+            console.print(make_table(True))
+    except (OSError, ValueError) as e:
         typer.echo(f"Ошибка: {e}")
 
 
+def tree_line(prefix: str, row: str | list[object]) -> str:
+    if isinstance(row, list):
+        return f"{prefix}[{' '.join(map(str, row[:4]))}]  {row[4]}"
+    return prefix + row.strip()
+
+
+def ls_table(show_header: bool) -> Table:
+    table = Table(show_header=show_header)
+    table.add_column("Название файла", justify="left", style="cyan")
+    return table
+
+
+def ls_long_table(show_header: bool) -> Table:
+    table = Table(show_header=show_header)
+    table.add_column("Права", justify="center")
+    table.add_column("Количество ссылок", justify="center")
+    table.add_column("Размер (байт)", justify="center")
+    table.add_column("Дата изменения", justify="center")
+    table.add_column("Название файла", justify="center")
+    return table
+
+
 @app.command()
 def cd(
         path: Annotated[Path, Argument(exists=False, readable=False, help="Путь, в который нужно перейти")]
@@ -68,37 +130,199 @@ def cd(
 
 @app.command()
 def cat(
-        filename: Annotated[Path, Argument(exists=False, readable=False, help="Название файла, которое нужно прочитать")]
+        filenames: Annotated[list[Path], Argument(exists=False, readable=False, help="Файлы, которые нужно прочитать")],
+        rich: Annotated[bool, Option("--rich", help="Выводить в терминал через rich даже большие файлы")] = False,
+        lines: Annotated[str | None, Option("--lines", help="Вывести только строки START:END (с 1, включительно)")] = None,
+        line_index: Annotated[bool, Option("--line-index", help="Построить или обновить индекс строк файла")] = False
 ) -> None:
     """
-    Выводит содержимое файла
-    :param filename: путь к файлу для чтения
-    :return: содержимое файла
+    Выводит содержимое файлов
+    :param filenames: пути к файлам для чтения, выводятся по очереди
+    :param rich: флаг вывода через rich независимо от размера (только в терминал)
+    :param lines: диапазон строк START:END, любую из границ можно опустить
+    :param line_index: флаг построения (обновления) индекса строк; уже построенный индекс используется всегда
+    :return: содержимое файлов
     """
+    if lines is not None:
+        if len(filenames) != 1:
+            raise typer.BadParameter("С опцией --lines указывается один файл")
+        start, end = parse_line_range(lines)
+    elif line_index:
+        raise typer.BadParameter("Опция --line-index используется только вместе с --lines")
     try:
-        data = service.cat(filename)
-        console.print(data)
-    except OSError as e:
+        if lines is not None:
+            for line in service.cat_lines(filenames[0], start, end, line_index):
+                sys.stdout.buffer.write(line)
+            sys.stdout.buffer.flush()
+        elif sys.stdout.isatty() and (rich or all(
+                path.is_file() and path.stat().st_size <= CAT_RICH_MAX_SIZE for path in filenames)):
+            for filename in filenames:
+                console.print(service.cat(filename))
+        else:
+            # В файл или канал (и для больших файлов) данные копируются как есть, без разметки rich
+            service.cat_stream(filenames, sys.stdout.buffer)
+    except (OSError, ValueError) as e:
+        typer.echo(f"Ошибка: {e}")
+
+
+def parse_line_range(value: str) -> tuple[int, int | None]:
+    """
+    Разбирает диапазон строк cat --lines
+    :param value: START:END, START: или :END
+    :return: номер первой строки и номер последней (None - до конца файла)
+    """
+    first, separator, last = value.partition(":")
+    try:
+        start = int(first) if first else 1
+        end = int(last) if last else None
+    except ValueError:
+        raise typer.BadParameter(f"Некорректный диапазон строк: {value}")
+    if not separator:
+        # Одно число - одна строка
+        end = start
+    return start, end
+
+
+@app.command()
+def head(
+        filename: Annotated[Path, Argument(exists=False, readable=False, help="Файл")],
+        lines: Annotated[int, Option("-n", "--lines", help="Количество первых строк")] = 10,
+        byte_count: Annotated[int | None, Option("-c", "--bytes", help="Количество первых байт")] = None
+) -> None:
+    """
+    Выводит начало файла
+    :param filename: путь к файлу
+    :param lines: количество выводимых строк
+    :param byte_count: количество выводимых байт (вместо строк)
+    :return: первые строки или байты файла
+    """
+    try:
+        write_output(service.head(filename, lines, byte_count))
+    except (OSError, ValueError) as e:
         typer.echo(f"Ошибка: {e}")
 
 
+@app.command()
+def tail(
+        filename: Annotated[Path, Argument(exists=False, readable=False, help="Файл")],
+        lines: Annotated[int, Option("-n", "--lines", help="Количество последних строк")] = 10,
+        byte_count: Annotated[int | None, Option("-c", "--bytes", help="Количество последних байт")] = None,
+        follow: Annotated[bool, Option("-f", "--follow", help="Выводить дописываемые в файл данные")] = False
+) -> None:
+    """
+    Выводит конец файла
+    :param filename: путь к файлу
+    :param lines: количество выводимых строк
+    :param byte_count: количество выводимых байт (вместо строк)
+    :param follow: флаг слежения за файлом: после конца файла выводятся новые данные, пока не нажат Ctrl+C
+    :return: последние строки или байты файла
+    """
+    try:
+        if not follow:
+            write_output(service.tail(filename, lines, byte_count))
+            return
+        for chunk in service.tail_follow(filename, lines, byte_count):
+            write_output(chunk)
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError) as e:
+        typer.echo(f"Ошибка: {e}")
+
+
+def write_output(data: bytes) -> None:
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+@contextmanager
+def show_progress() -> Iterator[None]:
+    """
+    Показывает прогресс долгой операции сервиса полосой rich. Полоса появляется при первом сообщении
+    о прогрессе (после подтверждений) и убирается по завершении; вне терминала ничего не выводится
+    """
+    bar = ProgressBar(
+        TextColumn("{task.description}"),
+        BarColumn(),
+        TextColumn("{task.fields[details]}"),
+        TimeElapsedColumn(),
+        console=console,
+        transient=True,
+        disable=not console.is_terminal,
+    )
+    task_id = None
+
+    def update(progress: Progress) -> None:
+        nonlocal task_id
+        if task_id is None:
+            bar.start()
+            task_id = bar.add_task(progress.operation, total=None, details="")
+        bar.update(
+            task_id, total=progress.bytes_total, completed=progress.bytes_done, details=describe_progress(progress)
+        )
+
+    service.set_progress_callback(update)
+    try:
+        yield
+    finally:
+        service.set_progress_callback(None)
+        bar.stop()
+
+
+def describe_progress(progress: Progress) -> str:
+    """
+    :return: сделано и всего байт и файлов, мгновенная и средняя скорость, оставшееся время, если его можно оценить
+    """
+    bytes_total = "?" if progress.bytes_total is None else format_size(progress.bytes_total)
+    files_total = "?" if progress.files_total is None else progress.files_total
+    return (
+        f"{format_size(progress.bytes_done)} / {bytes_total}, файлов {progress.files_done} / {files_total}, "
+        f"{format_size(progress.rate)}/с (в среднем {format_size(progress.average_rate)}/с)"
+        + ("" if progress.eta is None else f", осталось {format_duration(progress.eta)}")
+    )
+
+
 @app.command()
 def cp(
         filename: Annotated[Path, Argument(exists=False, readable=False, help="Название копируемого файла")],
         path: Annotated[Path, Argument(exists=False, readable=False, help="Путь, куда нужно выполнить копирование")],
-        recursive: Annotated[bool, Option("--recursive", "-r", help="Активация рекурсии")] = False
+        recursive: Annotated[bool, Option("--recursive", "-r", help="Активация рекурсии")] = False,
+        reflink: Annotated[str, Option("--reflink", help="Клонирование файлов: auto, always или never")] = "auto",
+        jobs: Annotated[int, Option("--jobs", "-j", help="Количество потоков, копирующих файлы дерева")] = CP_JOBS,
+        update: Annotated[bool, Option("--update", "-u", help="Пропускать файлы с теми же размером и mtime, что у копии")] = False,
+        checksum: Annotated[bool, Option("--checksum", "-c", help="Пропускать файлы с тем же содержимым, что у копии")] = False,
+        delete: Annotated[bool, Option("--delete", help="Удалять из назначения файлы, которых нет в источнике")] = False,
+        resume: Annotated[bool, Option("--resume", help="Продолжить прерванное копирование с последнего сохраненного блока")] = False
 ) -> None:
     """
     Копирует файл или директорию в указанное место
     :param filename: путь к файлу или директории для копирования
     :param path: путь назначения для копирования
     :param recursive: флаг для рекурсивного копирования директорий
-    :return: сообщение об успешном копировании
+    :param reflink: auto - клонировать, если файловая система умеет, always - только клонировать, never - не клонировать
+    :param jobs: количество потоков, копирующих файлы при рекурсивном копировании
+    :param update: флаг пропуска файлов, у копии которых те же размер и время изменения (данные не читаются)
+    :param checksum: флаг пропуска файлов, копия которых совпадает по содержимому (сравнение блоками)
+    :param delete: флаг удаления из назначения файлов и директорий, которых нет в источнике
+    :param resume: флаг копирования через временный файл с контрольной точкой, прерванная копия продолжается
+    :return: сообщение об успешном копировании и способы, которыми копировались файлы
     """
+    if update and checksum:
+        raise typer.BadParameter("Опции --update и --checksum несовместимы")
+    if delete and not recursive:
+        raise typer.BadParameter("Опция --delete используется только вместе с -r")
     try:
-        service.cp(filename, path, recursive)
-        console.print(f"Скопировано: {filename} -> {path}")
-    except OSError as e:
+        with show_progress():
+            methods = service.cp(
+                filename, path, recursive, reflink, jobs,
+                "update" if update else "checksum" if checksum else None, delete, resume
+            )
+        used = ", ".join(f"{method}: {count}" for method, count in methods.items())
+        console.print(f"Скопировано: {filename} -> {path}" + (f" ({used})" if used else ""))
+    except PartialCopyError as e:
+        for failed, error in e.errors:
+            typer.echo(f"Ошибка: {failed}: {error}")
+        typer.echo(f"Ошибка: {e}")
+    except (OSError, ValueError) as e:
         typer.echo(f"Ошибка: {e}")
 
 
@@ -114,7 +338,8 @@ def mv(
     :return: сообщение об успешном перемещении
     """
     try:
-        service.mv(path1, path2)
+        with show_progress():
+            service.mv(path1, path2)
         console.print(f"Перемещено: {path1} -> {path2}")
     except OSError as e:
         typer.echo(f"Ошибка: {e}")
@@ -132,7 +357,8 @@ def rm(
     """
     try:
         for path in paths:
-            service.rm(path, recursive)
+            with show_progress():
+                service.rm(path, recursive)
             console.print(f"Удалено: {path}")
     except OSError as e:
         typer.echo(f"Ошибка: {e}")
@@ -149,7 +375,8 @@ def zip(
     :return: сообщение об успешном создании архива
     """
     try:
-        service.zip(folder, filename)
+        with show_progress():
+            service.zip(folder, filename)
         console.print(f"Создан ZIP архив: {folder} -> {filename}")
     except OSError as e:
         typer.echo(f"Ошибка: {e}")
@@ -165,7 +392,8 @@ def unzip(
     :return: сообщение об успешной распаковке
     """
     try:
-        service.unzip(filename)
+        with show_progress():
+            service.unzip(filename)
         console.print(f"Распакован ZIP архив: {filename} -> {Path.cwd()}")
     except OSError as e:
         typer.echo(f"Ошибка: {e}")
@@ -183,7 +411,8 @@ def tar(
     :return: сообщение об успешном создании архива
     """
     try:
-        service.tar(folder, filename)
+        with show_progress():
+            service.tar(folder, filename)
         console.print(f"Создан TAR.GZ архив: {folder} -> {filename}")
     except OSError as e:
         typer.echo(f"Ошибка: {e}")
@@ -199,41 +428,216 @@ def untar(
     :return: сообщение об успешной распаковке
     """
     try:
-        service.untar(filename)
+        with show_progress():
+            service.untar(filename)
         console.print(f"Распакован TAR.GZ архив: {filename} -> {Path.cwd()}")
     except OSError as e:
         typer.echo(f"Ошибка: {e}")
 
+@app.command()
+def du(
+        path: Annotated[Path, Argument(exists=False, readable=False, help="Директория или файл")] = Path("."),
+        max_depth: Annotated[int | None, Option("--max-depth", "-d", help="Выводить директории до глубины N")] = None,
+        summarize: Annotated[bool, Option("--summarize", "-s", help="Выводить только итог")] = False,
+        jobs: Annotated[int, Option("--jobs", "-j", help="Количество потоков для чтения директорий")] = DU_JOBS
+) -> None:
+    """
+    Считает место, занимаемое директорией и ее поддиректориями
+    :param path: путь к директории или файлу
+    :param max_depth: максимальная глубина выводимых директорий (сама директория - 0)
+    :param summarize: флаг вывода только итога по директории
+    :param jobs: количество потоков, читающих директории
+    :return: таблицу с размером (st_size) и местом на диске (st_blocks) для каждой директории
+    """
+    try:
+        rows = service.du(path, max_depth, summarize, jobs)
+        table = Table()
+        table.add_column("Размер (байт)", justify="right", style="green")
+        table.add_column("На диске (байт)", justify="right", style="yellow")
+        table.add_column("Путь", style="cyan")
+        for directory, apparent, allocated in rows:
+            table.add_row(str(apparent), str(allocated), str(directory))
+        console.print(table)
+    except (OSError, ValueError) as e:
+        typer.echo(f"Ошибка: {e}")
+
+
+@app.command()
+def find(
+        path: Annotated[Path, Argument(exists=False, readable=False, help="Где искать")] = Path("."),
+        name: Annotated[str | None, Option("-name", "--name", help="Имя по шаблону glob")] = None,
+        iname: Annotated[str | None, Option("-iname", "--iname", help="Имя по шаблону glob без учета регистра")] = None,
+        size: Annotated[str | None, Option("-size", "--size", help="Размер: [+-]N[bcwkMG], по умолчанию блоки по 512 байт")] = None,
+        mtime: Annotated[str | None, Option("-mtime", "--mtime", help="Время изменения: [+-]N суток назад")] = None,
+        file_type: Annotated[str | None, Option("-type", "--type", help="Тип: f - файл, d - директория, l - ссылка")] = None,
+        max_depth: Annotated[int | None, Option("-maxdepth", "--maxdepth", help="Максимальная глубина")] = None,
+        jobs: Annotated[int, Option("--jobs", "-j", help="Количество потоков для обхода")] = FIND_JOBS
+) -> None:
+    """
+    Ищет файлы и директории по имени, размеру, времени изменения и типу
+    :param path: директория, с которой начинается поиск
+    :param name: шаблон имени (glob)
+    :param iname: шаблон имени (glob) без учета регистра
+    :param size: условие на размер: +N - больше, -N - меньше, N - ровно (с округлением вверх до единиц)
+    :param mtime: условие на время изменения в полных сутках: +N - раньше, -N - позже, N - ровно N суток назад
+    :param file_type: тип записи: f, d или l
+    :param max_depth: максимальная глубина (сам путь - 0)
+    :param jobs: количество потоков, параллельно обходящих поддеревья
+    :return: найденные пути по мере обхода
+    """
+    try:
+        found = print_lines_in_batches(service.iter_find(path, name, iname, size, mtime, file_type, max_depth, jobs))
+        if not found:
+            console.print(f"Ничего не найдено в {path}")
+    except (OSError, ValueError) as e:
+        typer.echo(f"Ошибка: {e}")
+
+
 @app.command()
 def grep(
-        pattern: Annotated[str, Argument(help="Регулярное выражение")],
-        path: Annotated[Path, Argument(exists=False, readable=False, help="Место поиска")],
+        pattern: Annotated[str | None, Argument(help="Регулярное выражение (с -e - путь поиска)")] = None,
+        path: Annotated[Path | None, Argument(exists=False, readable=False, help="Место поиска")] = None,
         recursive: Annotated[bool, Option("-r", help="Рекурсивный поиск")] = False,
-        ignore_case: Annotated[bool, Option("-i", "--ignore-case", help="Игнорирование регистра")] = False
+        ignore_case: Annotated[bool, Option("-i", "--ignore-case", help="Игнорирование регистра")] = False,
+        jobs: Annotated[int, Option("--jobs", "-j", help="Количество процессов для параллельного поиска")] = 1,
+        regexp: Annotated[list[str] | None, Option("-e", "--regexp", help="Паттерн для поиска (можно повторять)")] = None,
+        fixed_strings: Annotated[bool, Option("-F", "--fixed-strings", help="Поиск фиксированных строк")] = False,
+        index: Annotated[bool, Option("--index", help="Построить или обновить индекс триграмм дерева")] = False,
+        include: Annotated[list[str] | None, Option("--include", help="Искать только в файлах с подходящим именем (glob)")] = None,
+        exclude: Annotated[list[str] | None, Option("--exclude", help="Пропускать файлы и директории с подходящим именем (glob)")] = None,
+        no_ignore: Annotated[bool, Option("--no-ignore", help="Не учитывать .gitignore/.ignore и не пропускать .git")] = False,
+        text: Annotated[bool, Option("-a", "--text", help="Искать и в бинарных файлах")] = False,
+        files_with_matches: Annotated[bool, Option("-l", "--files-with-matches", help="Выводить только имена файлов с совпадениями")] = False,
+        count: Annotated[bool, Option("-c", "--count", help="Выводить только количество совпадений в каждом файле")] = False,
+        max_count: Annotated[int | None, Option("-m", "--max-count", help="Останавливать чтение файла после N совпадений")] = None,
+        quiet: Annotated[bool, Option("-q", "--quiet", help="Ничего не выводить, остановиться на первом совпадении")] = False,
+        cache: Annotated[bool, Option("--cache/--no-cache", help="Использовать кэш результатов для неизменившихся файлов")] = False
 ) -> None:
     """
     Ищет совпадения регулярного выражения в файлах
-    :param pattern: регулярное выражение для поиска
+    :param pattern: регулярное выражение для поиска (если паттерны заданы через -e - путь поиска)
     :param path: путь к файлу или директории для поиска
     :param recursive: флаг для рекурсивного поиска в директориях
     :param ignore_case: флаг для игнорирования регистра при поиске
+    :param jobs: количество процессов, по которым распределяются файлы
+    :param regexp: паттерны, заданные через -e; совпадением считается совпадение с любым из них
+    :param fixed_strings: флаг поиска паттернов как фиксированных строк, а не регулярных выражений
+    :param index: флаг построения (обновления) индекса триграмм; уже построенный индекс используется всегда
+    :param include: шаблоны имен файлов, в которых нужно искать
+    :param exclude: шаблоны имен файлов и директорий, которые нужно пропускать
+    :param no_ignore: флаг отключения правил из .gitignore/.ignore
+    :param text: флаг поиска в бинарных файлах (по умолчанию файлы с NUL-байтом пропускаются)
+    :param files_with_matches: флаг вывода только имен файлов; файл читается до первого совпадения
+    :param count: флаг вывода только количества совпадений в каждом файле
+    :param max_count: максимальное число совпадений в одном файле
+    :param quiet: флаг проверки наличия совпадений: код возврата 0, если совпадение есть, иначе 1
+    :param cache: флаг использования кэша результатов: заново просматриваются только файлы с новыми размером или mtime
     :return: таблицу с результатами поиска (файл, строка, совпадение)
     """
+    if regexp:
+        if path is not None:
+            raise typer.BadParameter("При использовании -e указывается только путь поиска")
+        patterns: str | list[str] | None = regexp
+        path = Path(pattern) if pattern is not None else None
+    else:
+        patterns = pattern
+    if patterns is None or path is None:
+        raise typer.BadParameter("Нужно указать паттерн и путь поиска")
     try:
-        result: list[list[str]] = service.grep(pattern, path, recursive, ignore_case)
-        if not result:
-            console.print(f"Совпадения не найдены для паттерна '{pattern}' в {path}")
-        table = Table()
-        table.add_column("File", style="cyan")
-        table.add_column("Line", justify="right", style="green")
-        table.add_column("Match", style="yellow")
+        rows = service.iter_grep(
+            patterns, path, recursive, ignore_case, jobs, fixed_strings, index,
+            include or (), exclude or (), not no_ignore, text,
+            files_with_matches, count, max_count, quiet, cache
+        )
+        if quiet:
+            raise typer.Exit(code=0 if any(True for _ in rows) else 1)
+        if files_with_matches:
+            found = print_table_in_batches(rows, grep_files_table)
+        elif count:
+            found = print_table_in_batches(rows, grep_count_table)
+        else:
+            found = print_table_in_batches(rows, grep_table)
+        if not found:
+            shown = ", ".join(patterns) if isinstance(patterns, list) else patterns
+            console.print(f"Совпадения не найдены для паттерна '{shown}' в {path}")
+    except (OSError, ValueError) as e:
+        typer.echo(f"Ошибка: {e}")
+
+
+def grep_table(show_header: bool) -> Table:
+    table = Table(show_header=show_header)
+    table.add_column("File", style="cyan")
+    table.add_column("Line", justify="right", style="green")
+    table.add_column("Match", style="yellow")
+    return table
+
+
+def grep_files_table(show_header: bool) -> Table:
+    table = Table(show_header=show_header)
+    table.add_column("File", style="cyan")
+    return table
+
 
-        for row in result:
-            file_path, line_num, match = row
-            table.add_row(str(file_path), str(line_num), match)
+def grep_count_table(show_header: bool) -> Table:
+    table = Table(show_header=show_header)
+    table.add_column("File", style="cyan")
+    table.add_column("Count", justify="right", style="green")
+    return table
+
+
+def print_lines_in_batches(lines: Iterable[str]) -> int:
+    """
+    Выводит текстовые строки пакетами так же, как print_table_in_batches выводит таблицы
+    :param lines: строки для вывода
+    :return: количество выведенных строк
+    """
+    buffer: list[str] = []
+    printed = 0
+    last_flush = time.monotonic()
+    for line in lines:
+        buffer.append(line)
+        if (printed == 0 or len(buffer) >= RENDER_BATCH_SIZE
+                or time.monotonic() - last_flush >= RENDER_INTERVAL):
+            console.print("\n".join(buffer), markup=False, highlight=False)
+            printed += len(buffer)
+            buffer.clear()
+            last_flush = time.monotonic()
+    if buffer:
+        console.print("\n".join(buffer), markup=False, highlight=False)
+        printed += len(buffer)
+    return printed
+
+
+def print_table_in_batches(rows: Iterable[Sequence[object]], make_table: Callable[[bool], Table]) -> int:
+    """
+    Выводит строки по мере поступления: первая строка печатается сразу, остальные -
+    пакетами не больше RENDER_BATCH_SIZE строк или раз в RENDER_INTERVAL секунд,
+    поэтому память не растет с количеством строк
+    :param rows: строки таблицы
+    :param make_table: создает пустую таблицу, флаг - выводить ли заголовок
+    :return: количество выведенных строк
+    """
+    buffer: list[Sequence[object]] = []
+    printed = 0
+    last_flush = time.monotonic()
+    for row in rows:
+        buffer.append(row)
+        if (printed == 0 or len(buffer) >= RENDER_BATCH_SIZE
+                or time.monotonic() - last_flush >= RENDER_INTERVAL):
+            table = make_table(printed == 0)
+            for item in buffer:
+                table.add_row(*map(str, item))
+            console.print(table)
+            printed += len(buffer)
+            buffer.clear()
+            last_flush = time.monotonic()
+    if buffer:
+        table = make_table(printed == 0)
+        for item in buffer:
+            table.add_row(*map(str, item))
         console.print(table)
-    except OSError as e:
-        typer.echo(f"Ошибка: {e}")
+        printed += len(buffer)
+    return printed
 
 if __name__ == "__main__":
     app()
@@ -1,10 +1,63 @@
 from abc import ABC, abstractmethod
 from os import PathLike
-from typing import Union
+from collections.abc import Iterator, Sequence
+from typing import IO, Union
+
+from src.common.config import CP_JOBS, DU_JOBS, FIND_JOBS
+from src.services.grep_result import GrepResult, Row
+from src.services.progress import ProgressCallback
 
 class OSConsoleServiceBase(ABC):
+    _progress_callback: ProgressCallback | None = None
+
+    def set_progress_callback(self, callback: ProgressCallback | None) -> None:
+        """
+        Устанавливает обработчик прогресса долгих операций: cp, mv, rm -r, zip, unzip, tar и untar
+        :param callback: вызывается с Progress (сделано и всего байт и файлов, мгновенная и средняя скорость)
+        по ходу операции и один раз в конце; None - не сообщать о прогрессе
+        """
+        self._progress_callback = callback
+
+    @abstractmethod
+    def ls(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            limit: int | None = None,
+            offset: int = 0,
+            sort: str | None = None,
+            top: int | None = None
+    ) -> Union[list[str], list[list[object]]]:
+        ...
+
     @abstractmethod
-    def ls(self, path: PathLike[str] | str, long: bool) -> Union[list[str], list[list[object]]]:
+    def iter_ls(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            limit: int | None = None,
+            offset: int = 0,
+            sort: str | None = None,
+            top: int | None = None
+    ) -> Iterator[str | list[object]]:
+        ...
+
+    @abstractmethod
+    def iter_ls_recursive(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            max_depth: int | None = None
+    ) -> Iterator[tuple[str, Iterator[str | list[object]]]]:
+        ...
+
+    @abstractmethod
+    def iter_ls_tree(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            max_depth: int | None = None
+    ) -> Iterator[tuple[str, str | list[object]]]:
         ...
 
     @abstractmethod
@@ -16,13 +69,49 @@ class OSConsoleServiceBase(ABC):
         ...
 
 
+    @abstractmethod
+    def cat_stream(self, filenames: Sequence[PathLike[str] | str], output: IO[bytes]) -> int:
+        ...
+
+    @abstractmethod
+    def cat_lines(
+            self,
+            filename: PathLike[str] | str,
+            start: int,
+            end: int | None = None,
+            index: bool = False
+    ) -> Iterator[bytes]:
+        ...
+
+    @abstractmethod
+    def head(self, filename: PathLike[str] | str, lines: int = 10, byte_count: int | None = None) -> bytes:
+        ...
+
+    @abstractmethod
+    def tail(self, filename: PathLike[str] | str, lines: int = 10, byte_count: int | None = None) -> bytes:
+        ...
+
+    @abstractmethod
+    def tail_follow(
+            self,
+            filename: PathLike[str] | str,
+            lines: int = 10,
+            byte_count: int | None = None
+    ) -> Iterator[bytes]:
+        ...
+
     @abstractmethod
     def cp(
             self,
             filename: PathLike[str] | str,
             path: PathLike[str] | str,
-            recursive: bool
-    ) -> None:
+            recursive: bool,
+            reflink: str = "auto",
+            jobs: int = CP_JOBS,
+            compare: str | None = None,
+            delete: bool = False,
+            resume: bool = False
+    ) -> dict[str, int]:
         ...
 
     @abstractmethod
@@ -61,12 +150,84 @@ class OSConsoleServiceBase(ABC):
               filename: PathLike[str] | str) -> None:
         ...
 
+    @abstractmethod
+    def du(
+            self,
+            path: PathLike[str] | str,
+            max_depth: int | None = None,
+            summarize: bool = False,
+            jobs: int = DU_JOBS
+    ) -> list[list[object]]:
+        ...
+
+    @abstractmethod
+    def find(
+            self,
+            path: PathLike[str] | str,
+            name: str | None = None,
+            iname: str | None = None,
+            size: str | None = None,
+            mtime: str | None = None,
+            file_type: str | None = None,
+            max_depth: int | None = None,
+            jobs: int = FIND_JOBS
+    ) -> list[str]:
+        ...
+
+    @abstractmethod
+    def iter_find(
+            self,
+            path: PathLike[str] | str,
+            name: str | None = None,
+            iname: str | None = None,
+            size: str | None = None,
+            mtime: str | None = None,
+            file_type: str | None = None,
+            max_depth: int | None = None,
+            jobs: int = FIND_JOBS
+    ) -> Iterator[str]:
+        ...
+
     @abstractmethod
     def grep(
             self,
-            pattern: str,
+            pattern: str | Sequence[str],
+            path: PathLike[str] | str,
+            recursive: bool,
+            ignore_case: bool,
+            jobs: int = 1,
+            fixed_strings: bool = False,
+            index: bool = False,
+            include: Sequence[str] = (),
+            exclude: Sequence[str] = (),
+            ignore_files: bool = True,
+            binary: bool = False,
+            files_with_matches: bool = False,
+            count: bool = False,
+            max_count: int | None = None,
+            quiet: bool = False,
+            cache: bool = False
+    ) -> GrepResult:
+        ...
+
+    @abstractmethod
+    def iter_grep(
+            self,
+            pattern: str | Sequence[str],
             path: PathLike[str] | str,
             recursive: bool,
-            ignore_case: bool
-    ) -> list[list[str]]:
+            ignore_case: bool,
+            jobs: int = 1,
+            fixed_strings: bool = False,
+            index: bool = False,
+            include: Sequence[str] = (),
+            exclude: Sequence[str] = (),
+            ignore_files: bool = True,
+            binary: bool = False,
+            files_with_matches: bool = False,
+            count: bool = False,
+            max_count: int | None = None,
+            quiet: bool = False,
+            cache: bool = False
+    ) -> Iterator[Row]:
         ...
@@ -0,0 +1,83 @@
+import bz2
+import gzip
+import lzma
+from types import ModuleType
+from typing import IO, cast
+
+zstd: ModuleType | None
+try:
+    from compression import zstd
+except ImportError:  # Python собран без поддержки zstd
+    zstd = None
+
+# Сигнатуры сжатых файлов в их первых байтах. У gzip за сигнатурой идет метод сжатия (8 - deflate)
+MAGIC_NUMBERS = {
+    "gzip": b"\x1f\x8b\x08",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+# bz2: "BZh", размер блока (цифра 1-9) и сигнатура первого блока (или конца потока у пустого файла)
+BZ2_PREFIX = b"BZh"
+BZ2_BLOCK_MAGICS = (b"1AY&SY", b"\x17rE8P\x90")
+# Сколько первых байт нужно compression_kind
+MAGIC_SIZE = len(BZ2_PREFIX) + 1 + len(BZ2_BLOCK_MAGICS[0])
+
+# Ошибки повреждения данных, которые модули сжатия выбрасывают не как OSError
+DECOMPRESSION_ERRORS: tuple[type[Exception], ...] = (EOFError, lzma.LZMAError) + (
+    (zstd.ZstdError,) if zstd is not None else ()
+)
+# Ошибки первого чтения, после которых файл считается несжатым (gzip и bz2 сообщают о неверных данных OSError)
+_HEAD_ERRORS: tuple[type[Exception], ...] = (OSError, *DECOMPRESSION_ERRORS)
+
+
+def compression_kind(head: bytes) -> str | None:
+    """
+    Определяет формат сжатия по первым байтам файла
+    :param head: первые байты файла
+    :return: "gzip", "bz2", "xz", "zstd" или None, если файл не сжат (или формат не поддерживается)
+    """
+    for kind, magic in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            if kind == "zstd" and zstd is None:
+                return None
+            return kind
+    if head.startswith(BZ2_PREFIX):
+        level = head[len(BZ2_PREFIX):len(BZ2_PREFIX) + 1]
+        block = head[len(BZ2_PREFIX) + 1:MAGIC_SIZE]
+        if level.isdigit() and level != b"0" and block in BZ2_BLOCK_MAGICS:
+            return "bz2"
+    return None
+
+
+def read_head(stream: IO[bytes], size: int) -> bytes | None:
+    """
+    Читает начало распакованных данных
+    :param stream: поток из open_decompressed
+    :param size: сколько байт прочитать
+    :return: прочитанные байты; None, если данные не распаковываются с самого начала - значит,
+    файл только начинается как сжатый, и его нужно читать как обычный
+    """
+    try:
+        return stream.read(size)
+    except _HEAD_ERRORS:
+        return None
+
+
+def open_decompressed(kind: str, file: IO[bytes]) -> IO[bytes]:
+    """
+    Оборачивает открытый файл потоком распаковки: данные распаковываются блоками
+    по мере чтения, ни на диск, ни целиком в память файл не разворачивается
+    :param kind: формат сжатия из compression_kind
+    :param file: файл, открытый в бинарном режиме и стоящий на начале
+    :return: поток распакованных данных
+    """
+    # Потоки распаковки читаются как бинарные файлы, хотя и не наследуют typing.IO
+    if kind == "gzip":
+        return cast(IO[bytes], gzip.GzipFile(fileobj=file, mode="rb"))
+    if kind == "bz2":
+        return cast(IO[bytes], bz2.BZ2File(file, mode="rb"))
+    if kind == "xz":
+        return cast(IO[bytes], lzma.LZMAFile(file, mode="rb"))
+    if kind == "zstd" and zstd is not None:
+        return cast(IO[bytes], zstd.ZstdFile(file, mode="rb"))
+    raise ValueError(f"Неподдерживаемый формат сжатия: {kind}")
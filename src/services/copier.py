@@ -0,0 +1,486 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import stat
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import IO
+
+from src.common.config import (
+    CAT_CHUNK,
+    CP_BATCH,
+    CP_COMPARE_BLOCK,
+    CP_RESUME_BLOCK,
+    CP_RESUME_SYNC_BLOCKS,
+)
+from src.services.progress import ProgressTracker
+from src.services.sparse import copy_regions, data_regions, is_sparse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore[assignment]
+
+# Режимы cp --reflink: auto - клон, если файловая система умеет, always - только клон, never - без клонов
+REFLINK_MODES = ("auto", "always", "never")
+# Способы копирования данных в порядке предпочтения (символические ссылки в дереве копируются как ссылки)
+COPY_METHODS = ("reflink", "sparse", "copy_file_range", "sendfile", "read/write", "symlink", "resumed")
+# Режимы сравнения с уже существующей копией: update - по размеру и mtime, checksum - по содержимому
+COMPARE_MODES = ("update", "checksum")
+# ioctl FICLONE из <linux/fs.h>: копия на запись (btrfs, xfs), данные не копируются
+FICLONE = 0x40049409
+# Ошибки, означающие, что способ не поддерживается для этой пары файлов, а не сбой копирования
+_UNSUPPORTED = frozenset(
+    {errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.ENOTSOCK, errno.EBADF}
+)
+CHECKPOINT_VERSION = 1
+# По сколько байт за вызов копируют copy_file_range и sendfile
+_KERNEL_CHUNK = CAT_CHUNK * 64
+
+
+def copy_file(
+        source: Path,
+        destination: Path,
+        reflink: str = "auto",
+        progress: ProgressTracker | None = None
+) -> str:
+    """
+    Копирует файл вместе с правами и временами (как shutil.copy2), выбирая самый быстрый способ:
+    клон FICLONE, копирование только участков с данными для файлов с дырами, os.copy_file_range,
+    os.sendfile и, если ничего не поддерживается, чтение блоками
+    :param source: исходный файл
+    :param destination: путь копии (не директория)
+    :param reflink: режим клонирования из REFLINK_MODES
+    :param progress: счетчик, в который засчитываются скопированные байты и сам файл
+    :return: использованный способ из COPY_METHODS
+    """
+    info = _regular_stat(source)
+    try:
+        existing = os.stat(destination)
+    except FileNotFoundError:
+        created = True
+    else:
+        created = False
+        if os.path.samestat(info, existing):
+            raise shutil.SameFileError(f"{source} и {destination} - один и тот же файл")
+    try:
+        with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+            method = copy_data(source_file, destination_file, reflink, progress)
+    except OSError:
+        # Недописанная копия хуже, чем никакой
+        if created:
+            destination.unlink(missing_ok=True)
+        raise
+    shutil.copystat(source, destination)
+    if progress is not None:
+        progress.add(files_done=1)
+    return method
+
+
+def copy_file_resumable(source: Path, destination: Path, progress: ProgressTracker | None = None) -> str:
+    """
+    Копирует файл так, чтобы прерванное копирование можно было продолжить (cp --resume).
+    Данные пишутся во временный файл .<имя>.part блоками по CP_RESUME_BLOCK, рядом в .<имя>.part.ckpt
+    хранится контрольная точка: хэши блоков, которые уже записаны и сброшены на диск.
+    При повторном запуске последние записанные блоки сверяются с хэшами, копирование продолжается
+    с последнего верного блока, а в конце временный файл атомарно переименовывается в destination
+    :param source: исходный файл
+    :param destination: путь копии (не директория)
+    :param progress: счетчик прогресса: уже скопированная часть засчитывается сразу
+    :return: resumed, если копирование продолжено, иначе read/write
+    """
+    temporary, checkpoint = partial_paths(destination)
+    info = _regular_stat(source)
+    identity = {"source": str(source.resolve()), "size": info.st_size, "mtime_ns": info.st_mtime_ns,
+                "block": CP_RESUME_BLOCK}
+    hashes = _load_checkpoint(checkpoint, identity) if temporary.exists() else []
+    with open(source, "rb") as source_file, open(temporary, "r+b" if hashes else "wb") as partial:
+        done = _verified_blocks(partial, hashes)
+        del hashes[done:]
+        offset = done * CP_RESUME_BLOCK
+        partial.truncate(offset)
+        partial.seek(offset)
+        source_file.seek(offset)
+        if progress is not None:
+            progress.add(bytes_done=offset)
+        while block := source_file.read(CP_RESUME_BLOCK):
+            partial.write(block)
+            hashes.append(_block_hash(block))
+            if progress is not None:
+                progress.add(bytes_done=len(block))
+            if len(hashes) % CP_RESUME_SYNC_BLOCKS == 0:
+                partial.flush()
+                os.fsync(partial.fileno())
+                _save_checkpoint(checkpoint, identity, hashes)
+        partial.flush()
+        os.fsync(partial.fileno())
+    shutil.copystat(source, temporary)
+    os.replace(temporary, destination)
+    checkpoint.unlink(missing_ok=True)
+    if progress is not None:
+        progress.add(files_done=1)
+    return "resumed" if done else "read/write"
+
+
+def partial_paths(destination: Path) -> tuple[Path, Path]:
+    """
+    :return: временный файл и контрольная точка cp --resume для копии destination
+    """
+    temporary = destination.with_name(f".{destination.name}.part")
+    return temporary, temporary.with_name(f"{temporary.name}.ckpt")
+
+
+def copy_tree(
+        source: str,
+        destination: str,
+        reflink: str,
+        jobs: int,
+        on_error: Callable[[str, OSError], None],
+        compare: str | None = None,
+        delete: bool = False,
+        resume: bool = False,
+        progress: ProgressTracker | None = None
+) -> dict[str, int]:
+    """
+    Копирует дерево: вызывающий поток обходит его и создает директории, файлы пачками по CP_BATCH
+    копируются на пуле потоков (copy_file_range, sendfile и чтение отпускают GIL). В работе одновременно
+    не больше 2 * jobs пачек. Права и времена директорий переносятся в конце, от глубоких к корню,
+    чтобы копирование файлов не меняло mtime и не упиралось в права только на чтение.
+    Символические ссылки копируются как ссылки
+    :param source: исходная директория
+    :param destination: директория назначения (может уже существовать)
+    :param reflink: режим клонирования из REFLINK_MODES
+    :param jobs: количество потоков
+    :param on_error: вызывается для файлов и директорий, которые не удалось скопировать (они пропускаются)
+    :param compare: режим из COMPARE_MODES: файлы, совпадающие с копией, не копируются (None - копировать все)
+    :param delete: флаг удаления из назначения записей, которых нет в источнике
+    :param resume: флаг копирования через copy_file_resumable (временные файлы прерванной копии не удаляются)
+    :param progress: счетчик прогресса: общий объем растет по ходу обхода, пока пул уже копирует
+    :return: сколько файлов скопировано каждым способом из COPY_METHODS, а также unchanged - пропущено
+    как совпадающие и deleted - удалено из назначения
+    """
+    methods: dict[str, int] = {}
+    directories: list[tuple[str, str]] = []
+
+    def collect(future: Future[tuple[dict[str, int], list[tuple[str, OSError]]]]) -> None:
+        batch_methods, errors = future.result()
+        for method, count in batch_methods.items():
+            methods[method] = methods.get(method, 0) + count
+        for path, error in errors:
+            on_error(path, error)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        running: set[Future[tuple[dict[str, int], list[tuple[str, OSError]]]]] = set()
+
+        def submit(batch: list[tuple[str, str]]) -> None:
+            nonlocal running
+            while len(running) >= 2 * jobs:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            running.add(executor.submit(_copy_batch, batch, reflink, compare, resume, progress))
+
+        try:
+            batch: list[tuple[str, str]] = []
+            stack = [(source, destination)]
+            while stack:
+                source_directory, destination_directory = stack.pop()
+                try:
+                    os.makedirs(destination_directory, exist_ok=True)
+                    with os.scandir(source_directory) as scanner:
+                        entries = list(scanner)
+                except OSError as e:
+                    if source_directory == source:
+                        raise
+                    on_error(source_directory, e)
+                    continue
+                directories.append((source_directory, destination_directory))
+                if delete:
+                    keep = {entry.name for entry in entries}
+                    if resume:
+                        keep.update(
+                            path.name for entry in entries if not entry.is_dir(follow_symlinks=False)
+                            for path in partial_paths(Path(destination_directory, entry.name))
+                        )
+                    deleted = _delete_extra(destination_directory, keep, on_error)
+                    if deleted:
+                        methods["deleted"] = methods.get("deleted", 0) + deleted
+                if progress is not None:
+                    files = [entry for entry in entries if not entry.is_dir(follow_symlinks=False)]
+                    progress.add_total(_files_size(files), len(files))
+                for entry in entries:
+                    target = os.path.join(destination_directory, entry.name)
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, target))
+                        continue
+                    batch.append((entry.path, target))
+                    if len(batch) >= CP_BATCH:
+                        submit(batch)
+                        batch = []
+            if batch:
+                submit(batch)
+            for future in wait(running).done:
+                collect(future)
+        finally:
+            for future in running:
+                future.cancel()
+    for source_directory, destination_directory in reversed(directories):
+        try:
+            shutil.copystat(source_directory, destination_directory)
+        except OSError as e:
+            on_error(destination_directory, e)
+    return methods
+
+
+def copy_data(
+        source: IO[bytes],
+        destination: IO[bytes],
+        reflink: str = "auto",
+        progress: ProgressTracker | None = None
+) -> str:
+    """
+    Копирует содержимое открытого файла в пустой открытый файл
+    :param progress: счетчик, в который засчитываются скопированные байты
+    :return: использованный способ из COPY_METHODS
+    """
+    in_fd = source.fileno()
+    out_fd = destination.fileno()
+    info = os.fstat(in_fd)
+    if reflink != "never":
+        if _clone(in_fd, out_fd):
+            if progress is not None:
+                progress.add(bytes_done=info.st_size)
+            return "reflink"
+        if reflink == "always":
+            raise OSError(errno.EOPNOTSUPP, "Клонирование (reflink) не поддерживается для этих файлов")
+    if is_sparse(info):
+        regions = data_regions(in_fd, info.st_size)
+        if regions is not None:
+            copy_regions(in_fd, out_fd, regions, info.st_size, progress)
+            return "sparse"
+    if hasattr(os, "copy_file_range") and _copy_file_range_all(in_fd, out_fd, progress):
+        return "copy_file_range"
+    if hasattr(os, "sendfile") and sendfile_all(source, out_fd, progress):
+        return "sendfile"
+    source.seek(0)
+    while chunk := source.read(CAT_CHUNK):
+        destination.write(chunk)
+        if progress is not None:
+            progress.add(bytes_done=len(chunk))
+    return "read/write"
+
+
+def sendfile_all(file: IO[bytes], out_fd: int, progress: ProgressTracker | None = None) -> int:
+    """
+    Копирует файл целиком через os.sendfile, без передачи данных через пространство пользователя
+    :return: сколько байт скопировано; 0, если sendfile для этой пары файлов не поддерживается
+    """
+    in_fd = file.fileno()
+    offset = 0
+    while True:
+        try:
+            sent = os.sendfile(out_fd, in_fd, offset, _KERNEL_CHUNK)
+        except OSError as e:
+            if offset == 0 and e.errno in _UNSUPPORTED:
+                return 0
+            raise
+        if sent == 0:
+            return offset
+        offset += sent
+        if progress is not None:
+            progress.add(bytes_done=sent)
+
+
+def is_unchanged(source: Path, destination: Path, compare: str) -> bool:
+    """
+    Проверяет, совпадает ли уже существующая копия с исходным файлом
+    :param compare: update - совпадают размер и mtime (данные не читаются), checksum - совпадают размер
+    и содержимое (файлы сравниваются блоками по CP_COMPARE_BLOCK до первого различия)
+    """
+    try:
+        existing = os.stat(destination)
+    except FileNotFoundError:
+        return False
+    info = os.stat(source)
+    if info.st_size != existing.st_size or not stat.S_ISREG(info.st_mode) or not stat.S_ISREG(existing.st_mode):
+        return False
+    if compare == "update":
+        return info.st_mtime_ns == existing.st_mtime_ns
+    with open(source, "rb") as source_file, open(destination, "rb") as destination_file:
+        while block := source_file.read(CP_COMPARE_BLOCK):
+            if block != destination_file.read(CP_COMPARE_BLOCK):
+                return False
+    if info.st_mtime_ns != existing.st_mtime_ns:
+        # Содержимое то же - достаточно перенести права и время, чтобы следующий --update его пропустил
+        shutil.copystat(source, destination)
+    return True
+
+
+def _copy_batch(
+        batch: list[tuple[str, str]],
+        reflink: str,
+        compare: str | None,
+        resume: bool = False,
+        progress: ProgressTracker | None = None
+) -> tuple[dict[str, int], list[tuple[str, OSError]]]:
+    """
+    Копирует пачку файлов в потоке пула, ошибки собираются по файлам и не прерывают пачку
+    :return: сколько файлов скопировано каждым способом и ошибки (исходный путь, исключение)
+    """
+    methods: dict[str, int] = {}
+    errors: list[tuple[str, OSError]] = []
+    for source, destination in batch:
+        try:
+            if os.path.islink(source):
+                target = os.readlink(source)
+                if compare is not None and os.path.islink(destination) and os.readlink(destination) == target:
+                    method = "unchanged"
+                else:
+                    if os.path.lexists(destination):
+                        os.remove(destination)
+                    os.symlink(target, destination)
+                    method = "symlink"
+            elif compare is not None and is_unchanged(Path(source), Path(destination), compare):
+                method = "unchanged"
+                if progress is not None:
+                    progress.add(bytes_done=os.stat(source).st_size)
+            elif resume:
+                method = copy_file_resumable(Path(source), Path(destination), progress)
+            else:
+                method = copy_file(Path(source), Path(destination), reflink, progress)
+        except OSError as e:
+            errors.append((source, e))
+            if progress is not None:
+                progress.add(files_done=1)
+            continue
+        if progress is not None and method in ("symlink", "unchanged"):
+            progress.add(files_done=1)
+        methods[method] = methods.get(method, 0) + 1
+    return methods, errors
+
+
+def _regular_stat(source: Path) -> os.stat_result:
+    """
+    Как shutil.copyfile, отказывается копировать не обычные файлы: открытие именованного канала
+    на чтение заблокировалось бы до появления писателя
+    :return: os.stat исходного файла
+    """
+    info = os.stat(source)
+    if not stat.S_ISREG(info.st_mode):
+        raise shutil.SpecialFileError(f"{source} не является обычным файлом")
+    return info
+
+
+def _files_size(entries: list[os.DirEntry[str]]) -> int:
+    """
+    :return: суммарный размер обычных файлов среди записей директории (для общего объема прогресса)
+    """
+    size = 0
+    for entry in entries:
+        try:
+            if entry.is_file(follow_symlinks=False):
+                size += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return size
+
+
+def _delete_extra(directory: str, keep: set[str], on_error: Callable[[str, OSError], None]) -> int:
+    """
+    Удаляет из директории назначения записи, которых нет в исходной директории (cp --delete)
+    :return: сколько записей удалено
+    """
+    deleted = 0
+    try:
+        with os.scandir(directory) as entries:
+            extra = [entry for entry in entries if entry.name not in keep]
+    except OSError as e:
+        on_error(directory, e)
+        return 0
+    for entry in extra:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except OSError as e:
+            on_error(entry.path, e)
+            continue
+        deleted += 1
+    return deleted
+
+
+def _load_checkpoint(checkpoint: Path, identity: dict[str, object]) -> list[str]:
+    """
+    :return: хэши записанных блоков; пустой список, если контрольной точки нет или она от другой версии источника
+    """
+    try:
+        with open(checkpoint, encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return []
+    if data.get("version") != CHECKPOINT_VERSION or any(data.get(key) != value for key, value in identity.items()):
+        return []
+    return list(data.get("hashes", []))
+
+
+def _save_checkpoint(checkpoint: Path, identity: dict[str, object], hashes: list[str]) -> None:
+    temporary = checkpoint.with_name(f"{checkpoint.name}.tmp")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({"version": CHECKPOINT_VERSION, **identity, "hashes": hashes}, file)
+    os.replace(temporary, checkpoint)
+
+
+def _verified_blocks(partial: IO[bytes], hashes: list[str]) -> int:
+    """
+    Ищет с конца последний блок временного файла, совпадающий со своим хэшем. Блоки до него
+    были сброшены на диск раньше контрольной точки, поэтому заново не читаются
+    :return: сколько блоков с начала файла можно не копировать
+    """
+    for count in range(len(hashes), 0, -1):
+        partial.seek((count - 1) * CP_RESUME_BLOCK)
+        if _block_hash(partial.read(CP_RESUME_BLOCK)) == hashes[count - 1]:
+            return count
+    return 0
+
+
+def _block_hash(block: bytes) -> str:
+    return hashlib.blake2b(block, digest_size=16).hexdigest()
+
+
+def _clone(in_fd: int, out_fd: int) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(out_fd, FICLONE, in_fd)
+    except OSError as e:
+        if e.errno in _UNSUPPORTED or e.errno == errno.EPERM:
+            return False
+        raise
+    return True
+
+
+def _copy_file_range_all(in_fd: int, out_fd: int, progress: ProgressTracker | None = None) -> int:
+    """
+    Копирует файл через os.copy_file_range (копирование внутри ядра, на части файловых систем - на стороне сервера)
+    :return: сколько байт скопировано; 0, если способ не поддерживается или файл не сообщает размер (как в /proc)
+    """
+    size = os.fstat(in_fd).st_size
+    offset = 0
+    # Для файлов с известным размером лишний вызов, вернувший бы 0, не нужен
+    while size == 0 or offset < size:
+        try:
+            copied = os.copy_file_range(in_fd, out_fd, _KERNEL_CHUNK)
+        except OSError as e:
+            if offset == 0 and e.errno in _UNSUPPORTED:
+                return 0
+            raise
+        if copied == 0:
+            return offset
+        offset += copied
+        if progress is not None:
+            progress.add(bytes_done=copied)
+    return offset
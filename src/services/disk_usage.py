@@ -0,0 +1,140 @@
+import os
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+
+class DirUsage(NamedTuple):
+    """
+    Размер одной директории без учета поддиректорий
+    """
+    # Суммарный st_size самой директории и файлов в ней
+    apparent: int
+    # Суммарный размер выделенных блоков (st_blocks * 512)
+    allocated: int
+    # Поддиректории (без символических ссылок) в порядке имен
+    children: list[str]
+    # Файлы с несколькими жесткими ссылками: (st_dev, st_ino, размер, выделено) - учитываются один раз на дерево
+    linked: list[tuple[int, int, int, int]]
+
+
+def scan_directory(path: str) -> DirUsage:
+    """
+    Читает одну директорию через os.scandir и суммирует размеры ее файлов
+    :param path: путь к директории
+    :return: размеры директории и список поддиректорий
+    """
+    info = os.lstat(path)
+    apparent = info.st_size
+    allocated = info.st_blocks * 512
+    children: list[str] = []
+    linked: list[tuple[int, int, int, int]] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                children.append(entry.path)
+                continue
+            try:
+                entry_info = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                # Файл удален во время обхода
+                continue
+            if entry_info.st_nlink > 1:
+                linked.append((entry_info.st_dev, entry_info.st_ino, entry_info.st_size, entry_info.st_blocks * 512))
+            else:
+                apparent += entry_info.st_size
+                allocated += entry_info.st_blocks * 512
+    children.sort()
+    return DirUsage(apparent, allocated, children, linked)
+
+
+def scan_tree(
+        root: str,
+        jobs: int,
+        on_error: Callable[[str, OSError], None]
+) -> dict[str, DirUsage]:
+    """
+    Обходит дерево на пуле потоков: каждая поддиректория - отдельная задача,
+    новые задачи отправляются из основного потока по мере завершения предыдущих.
+    В работе одновременно не больше 2 * jobs директорий, остальные ждут в стеке
+    :param root: корневая директория
+    :param jobs: количество потоков
+    :param on_error: вызывается для поддиректорий, которые не удалось прочитать (они пропускаются)
+    :return: размеры каждой прочитанной директории без учета поддиректорий
+    """
+    usage: dict[str, DirUsage] = {}
+    waiting = [root]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        running: dict[Future[DirUsage], str] = {}
+        try:
+            while waiting or running:
+                while waiting and len(running) < 2 * jobs:
+                    path = waiting.pop()
+                    running[executor.submit(scan_directory, path)] = path
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = running.pop(future)
+                    try:
+                        result = future.result()
+                    except OSError as e:
+                        if path == root:
+                            raise
+                        on_error(path, e)
+                        continue
+                    usage[path] = result
+                    waiting.extend(result.children)
+        finally:
+            for future in running:
+                future.cancel()
+    return usage
+
+
+def summarize_usage(
+        root: str,
+        usage: dict[str, DirUsage],
+        max_depth: int | None
+) -> list[list[object]]:
+    """
+    Суммирует размеры поддиректорий. Файл с несколькими жесткими ссылками учитывается
+    один раз - в первой директории, где он встретился при обходе в порядке имен
+    :param root: корневая директория
+    :param usage: размеры директорий из scan_tree
+    :param max_depth: до какой глубины выводить директории (корень - 0), None - все
+    :return: строки [путь, размер, выделено на диске] в порядке du: поддиректории перед родителем
+    """
+    seen_inodes: set[tuple[int, int]] = set()
+    totals: dict[str, list[int]] = {}
+    order: list[str] = []
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        if path not in usage:
+            continue
+        order.append(path)
+        directory = usage[path]
+        apparent, allocated = directory.apparent, directory.allocated
+        for device, inode, size, blocks in directory.linked:
+            if (device, inode) not in seen_inodes:
+                seen_inodes.add((device, inode))
+                apparent += size
+                allocated += blocks
+        totals[path] = [apparent, allocated]
+        stack.extend(reversed(directory.children))
+    # В обратном прямом порядке каждая поддиректория посчитана раньше родителя
+    for path in reversed(order):
+        for child in usage[path].children:
+            if child in totals:
+                totals[path][0] += totals[child][0]
+                totals[path][1] += totals[child][1]
+    rows: list[list[object]] = []
+    walk: list[tuple[str, int, bool]] = [(root, 0, False)]
+    while walk:
+        path, depth, expanded = walk.pop()
+        if expanded:
+            if max_depth is None or depth <= max_depth:
+                rows.append([path, *totals[path]])
+            continue
+        walk.append((path, depth, True))
+        if max_depth is None or depth < max_depth:
+            walk.extend((child, depth + 1, False) for child in reversed(usage[path].children) if child in totals)
+    return rows
@@ -0,0 +1,178 @@
+import math
+import os
+import re
+import stat
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from fnmatch import fnmatchcase
+from typing import NamedTuple
+
+# Единицы -size, как в find: по умолчанию блоки по 512 байт
+SIZE_UNITS = {"b": 512, "c": 1, "w": 2, "k": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+FILE_TYPES = ("f", "d", "l")
+_NUMERIC = re.compile(r"([+-]?)(\d+)([a-zA-Z]?)")
+
+
+class Comparison(NamedTuple):
+    """
+    Числовое условие find: +N - больше N, -N - меньше N, N - ровно N
+    """
+    sign: str
+    value: int
+    unit: int = 1
+
+    def matches(self, value: int) -> bool:
+        if self.sign == "+":
+            return value > self.value
+        if self.sign == "-":
+            return value < self.value
+        return value == self.value
+
+
+class FindQuery(NamedTuple):
+    """
+    Условия find. Имя и тип проверяются по DirEntry, stat вызывается только для size и mtime
+    """
+    name: str | None = None
+    iname: str | None = None
+    size: Comparison | None = None
+    mtime: Comparison | None = None
+    file_type: str | None = None
+    max_depth: int | None = None
+
+    @property
+    def needs_stat(self) -> bool:
+        return self.size is not None or self.mtime is not None
+
+
+def parse_size(value: str) -> Comparison:
+    """
+    Разбирает условие -size: [+-]N[bcwkMG]
+    """
+    match = _NUMERIC.fullmatch(value)
+    if match is None or (match.group(3) and match.group(3) not in SIZE_UNITS):
+        raise ValueError(f"Некорректный размер: {value}")
+    return Comparison(match.group(1), int(match.group(2)), SIZE_UNITS[match.group(3) or "b"])
+
+
+def parse_mtime(value: str) -> Comparison:
+    """
+    Разбирает условие -mtime: [+-]N, возраст файла в полных сутках
+    """
+    match = _NUMERIC.fullmatch(value)
+    if match is None or match.group(3):
+        raise ValueError(f"Некорректное количество суток: {value}")
+    return Comparison(match.group(1), int(match.group(2)))
+
+
+def entry_matches(entry: os.DirEntry[str], query: FindQuery, now: float) -> bool:
+    """
+    Проверяет запись: сначала условия по имени и типу из DirEntry, затем, если нужно, по stat
+    """
+    if query.name is not None and not fnmatchcase(entry.name, query.name):
+        return False
+    if query.iname is not None and not fnmatchcase(entry.name.casefold(), query.iname.casefold()):
+        return False
+    if query.file_type is not None:
+        if query.file_type == "l":
+            if not entry.is_symlink():
+                return False
+        elif query.file_type == "d":
+            if not entry.is_dir(follow_symlinks=False):
+                return False
+        elif not entry.is_file(follow_symlinks=False):
+            return False
+    if not query.needs_stat:
+        return True
+    info = entry.stat(follow_symlinks=False)
+    if query.size is not None and not query.size.matches(math.ceil(info.st_size / query.size.unit)):
+        return False
+    return query.mtime is None or query.mtime.matches(int((now - info.st_mtime) // 86400))
+
+
+def root_matches(path: str, query: FindQuery, now: float) -> bool:
+    """
+    Проверяет сам начальный путь (для него нет DirEntry, поэтому всегда нужен lstat)
+    """
+    info = os.lstat(path)
+    name = os.path.basename(os.path.normpath(path))
+    if query.name is not None and not fnmatchcase(name, query.name):
+        return False
+    if query.iname is not None and not fnmatchcase(name.casefold(), query.iname.casefold()):
+        return False
+    if query.file_type is not None:
+        checks = {"f": stat.S_ISREG, "d": stat.S_ISDIR, "l": stat.S_ISLNK}
+        if not checks[query.file_type](info.st_mode):
+            return False
+    if query.size is not None and not query.size.matches(math.ceil(info.st_size / query.size.unit)):
+        return False
+    return query.mtime is None or query.mtime.matches(int((now - info.st_mtime) // 86400))
+
+
+def scan_directory(path: str, depth: int, query: FindQuery, now: float) -> tuple[list[str], list[str]]:
+    """
+    Читает одну директорию
+    :param path: путь к директории
+    :param depth: глубина ее записей (записи корня - 1)
+    :return: подходящие пути и поддиректории, в которые нужно зайти
+    """
+    found: list[str] = []
+    subdirectories: list[str] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry_matches(entry, query, now):
+                    found.append(entry.path)
+            except FileNotFoundError:
+                # Запись удалена во время обхода
+                continue
+            if entry.is_dir(follow_symlinks=False) and (query.max_depth is None or depth < query.max_depth):
+                subdirectories.append(entry.path)
+    return found, subdirectories
+
+
+def iter_find(
+        root: str,
+        query: FindQuery,
+        jobs: int,
+        on_error: Callable[[str, OSError], None]
+) -> Iterator[str]:
+    """
+    Обходит поддеревья параллельно на ограниченном пуле потоков и отдает найденные пути
+    по мере готовности директорий (порядок между директориями не фиксирован).
+    В работе одновременно не больше 2 * jobs директорий, остальные ждут в стеке
+    :param root: корневая директория
+    :param query: условия поиска
+    :param jobs: количество потоков
+    :param on_error: вызывается для поддиректорий, которые не удалось прочитать (они пропускаются)
+    :return: пути подходящих записей, первым - сам начальный путь, если он подходит
+    """
+    now = time.time()
+    if root_matches(root, query, now):
+        yield root
+    if query.max_depth == 0 or not os.path.isdir(root) or os.path.islink(root):
+        return
+    waiting: list[tuple[str, int]] = [(root, 1)]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        running: dict[Future[tuple[list[str], list[str]]], tuple[str, int]] = {}
+        try:
+            while waiting or running:
+                while waiting and len(running) < 2 * jobs:
+                    path, depth = waiting.pop()
+                    running[executor.submit(scan_directory, path, depth, query, now)] = (path, depth)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, depth = running.pop(future)
+                    try:
+                        found, subdirectories = future.result()
+                    except OSError as e:
+                        if path == root:
+                            raise
+                        on_error(path, e)
+                        continue
+                    waiting.extend((subdirectory, depth + 1) for subdirectory in subdirectories)
+                    yield from found
+        finally:
+            for future in running:
+                future.cancel()
@@ -0,0 +1,119 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from src.common.config import TAIL_BLOCK, TAIL_POLL_INTERVAL
+
+# Флаги inotify из <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVE_SELF = 0x00000800
+IN_DELETE_SELF = 0x00000400
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+
+class FileWatcher:
+    """
+    Ожидание изменений файла. На Linux используется inotify через ctypes: процесс спит,
+    пока ядро не сообщит об изменении. Если inotify недоступен, раз в TAIL_POLL_INTERVAL
+    проверяется только st_size и st_mtime файла
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+        self._last_stat = _size_and_mtime(path)
+        libc = _load_libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        mask = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+        if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+            os.close(fd)
+            return
+        self._fd = fd
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Ждет изменения файла не дольше timeout секунд (по умолчанию TAIL_POLL_INTERVAL)
+        :return: было ли изменение
+        """
+        if timeout is None:
+            timeout = TAIL_POLL_INTERVAL
+        if self._fd is not None:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if not ready:
+                return False
+            # События только будят процесс, сами они не нужны - очередь просто вычитывается
+            try:
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+            return True
+        time.sleep(timeout)
+        current = _size_and_mtime(self.path)
+        changed = current != self._last_stat
+        self._last_stat = current
+        return changed
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def iter_follow(path: Path, position: int, watcher: FileWatcher) -> Iterator[bytes]:
+    """
+    Бесконечно отдает данные, дописанные в файл после position (tail -f).
+    Если файл усечен, чтение продолжается с начала
+    :param path: путь к файлу
+    :param position: с какого байта читать
+    :param watcher: источник уведомлений об изменениях
+    :return: новые данные по мере появления
+    """
+    with open(path, "rb") as file:
+        while True:
+            size = os.fstat(file.fileno()).st_size
+            if size < position:
+                position = 0
+            if size > position:
+                file.seek(position)
+                while chunk := file.read(TAIL_BLOCK):
+                    position += len(chunk)
+                    yield chunk
+                continue
+            watcher.wait()
+
+
+def _size_and_mtime(path: Path) -> tuple[int, int] | None:
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+
+def _load_libc() -> ctypes.CDLL | None:
+    name = ctypes.util.find_library("c")
+    if name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
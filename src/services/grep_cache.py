@@ -0,0 +1,113 @@
+import hashlib
+import os
+import pickle
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, Self
+
+from src.common.config import GREP_CACHE_DIR, GREP_CACHE_MAX_SIZE
+from src.services.grep_result import Row
+
+CACHE_VERSION = 2
+
+
+class GrepCache:
+    """
+    Кэш результатов grep на диске. Один файл кэша хранит результаты одного запроса
+    (дерево, паттерны, флаги): для каждого просмотренного файла - его размер, mtime
+    и строки результата. Файлы, у которых размер и mtime не изменились, повторно
+    не читаются. Общий размер кэша ограничен, первыми удаляются давно не использованные запросы
+    """
+    def __init__(self, key: tuple[Any, ...]):
+        self.key = key
+        self._files: dict[str, tuple[int, int, list[Row]]] = {}
+        self._changed = False
+
+    @staticmethod
+    def location(key: tuple[Any, ...]) -> Path:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return Path(GREP_CACHE_DIR).expanduser() / f"{digest}.cache"
+
+    @classmethod
+    def load(cls, key: tuple[Any, ...]) -> Self:
+        cache = cls(key)
+        try:
+            with open(cls.location(key), "rb") as file:
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return cache
+        if data.get("version") != CACHE_VERSION or data.get("key") != key:
+            return cache
+        cache._files = data["files"]
+        return cache
+
+    def get(self, name: str, size: int, mtime_ns: int) -> list[Row] | None:
+        """
+        Возвращает сохраненные строки результата, если файл не изменился
+        :param name: путь к файлу, как он выводится в результате
+        :param size: текущий размер файла
+        :param mtime_ns: текущее время изменения файла
+        :return: строки результата или None, если файл нужно просмотреть заново
+        """
+        entry = self._files.get(name)
+        if entry is None or entry[:2] != (size, mtime_ns):
+            return None
+        return entry[2]
+
+    def put(self, name: str, size: int, mtime_ns: int, rows: list[Row]) -> None:
+        self._files[name] = (size, mtime_ns, rows)
+        self._changed = True
+
+    def retain(self, names: Iterable[str]) -> None:
+        """
+        Удаляет записи о файлах, которых больше нет в дереве
+        """
+        alive = set(names)
+        for name in [name for name in self._files if name not in alive]:
+            del self._files[name]
+            self._changed = True
+
+    def save(self) -> None:
+        """
+        Сохраняет кэш (или только отмечает его использование) и вытесняет старые запросы,
+        пока общий размер кэша больше GREP_CACHE_MAX_SIZE
+        """
+        location = self.location(self.key)
+        location.parent.mkdir(parents=True, exist_ok=True)
+        if self._changed or not location.is_file():
+            temporary = location.with_suffix(".tmp")
+            with open(temporary, "wb") as file:
+                pickle.dump(
+                    {"version": CACHE_VERSION, "key": self.key, "files": self._files},
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(temporary, location)
+            self._changed = False
+        else:
+            os.utime(location)
+        evict(location.parent, keep=location)
+
+
+def evict(directory: Path, keep: Path | None = None) -> None:
+    """
+    Удаляет самые давно использованные файлы кэша, пока их общий размер больше GREP_CACHE_MAX_SIZE
+    :param directory: директория кэша
+    :param keep: файл кэша текущего запроса, он не удаляется
+    """
+    entries: list[tuple[int, int, Path]] = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".cache") and entry.is_file():
+            info = entry.stat()
+            entries.append((info.st_mtime_ns, info.st_size, Path(entry.path)))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries, key=lambda item: item[0]):
+        if total <= GREP_CACHE_MAX_SIZE:
+            break
+        if keep is not None and path == keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,106 @@
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import overload
+
+# Строка результата grep: [файл, номер строки, совпадение], [файл] или [файл, количество совпадений]
+Row = list[str | int]
+
+_TEXT_PARTS_PER_CHUNK = 4096
+
+
+class GrepResult:
+    """
+    Компактный результат grep. Каждый путь хранится один раз в таблице путей,
+    номера строк (или количества совпадений) - в array('I'), а тексты совпадений -
+    одной общей строкой, от которой запоминаются только смещения. Строки результата
+    собираются при обращении, поэтому результат итерируется и индексируется как list[Row]
+    """
+    def __init__(self, rows: Iterable[Row] = ()):
+        self._paths: list[str] = []
+        self._path_ids: dict[str, int] = {}
+        self._width = 0
+        self._files = array("I")
+        self._numbers = array("I")
+        self._offsets = array("Q", [0])
+        # Тексты совпадений копятся небольшими пакетами и склеиваются в блоки
+        self._text_chunks: list[str] = []
+        self._text_parts: list[str] = []
+        self._text_size = 0
+        self.extend(rows)
+
+    def append(self, row: Row) -> None:
+        if not self._width:
+            self._width = len(row)
+        elif len(row) != self._width:
+            raise ValueError(f"Строка результата должна содержать {self._width} значения: {row}")
+        path = str(row[0])
+        path_id = self._path_ids.get(path)
+        if path_id is None:
+            path_id = self._path_ids[path] = len(self._paths)
+            self._paths.append(path)
+        self._files.append(path_id)
+        if self._width > 1:
+            self._numbers.append(int(row[1]))
+        if self._width > 2:
+            text = str(row[2])
+            self._text_parts.append(text)
+            self._text_size += len(text)
+            self._offsets.append(self._text_size)
+            if len(self._text_parts) >= _TEXT_PARTS_PER_CHUNK:
+                self._text_chunks.append("".join(self._text_parts))
+                self._text_parts.clear()
+
+    def extend(self, rows: Iterable[Row]) -> None:
+        for row in rows:
+            self.append(row)
+
+    @property
+    def paths(self) -> list[str]:
+        """
+        Таблица путей: каждый файл с совпадениями один раз, в порядке появления
+        """
+        return list(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @overload
+    def __getitem__(self, index: int) -> Row: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Row]: ...
+
+    def __getitem__(self, index: int | slice) -> Row | list[Row]:
+        if isinstance(index, slice):
+            return [self._row(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Индекс вне результата grep")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[Row]:
+        for position in range(len(self)):
+            yield self._row(position)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (GrepResult, list)):
+            return len(self) == len(other) and all(row == item for row, item in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"GrepResult({list(self)!r})"
+
+    def _row(self, position: int) -> Row:
+        row: Row = [self._paths[self._files[position]]]
+        if self._width > 1:
+            row.append(self._numbers[position])
+        if self._width > 2:
+            row.append(self._matched_text()[self._offsets[position]:self._offsets[position + 1]])
+        return row
+
+    def _matched_text(self) -> str:
+        if len(self._text_chunks) != 1 or self._text_parts:
+            self._text_chunks = ["".join(self._text_chunks + self._text_parts)]
+            self._text_parts.clear()
+        return self._text_chunks[0]
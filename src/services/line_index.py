@@ -0,0 +1,155 @@
+import hashlib
+import mmap
+import os
+import pickle
+from array import array
+from pathlib import Path
+from typing import IO, Self
+
+from src.common.config import GREP_NEWLINE_CHUNK, LINE_INDEX_DIR, LINE_INDEX_EVERY
+
+INDEX_VERSION = 1
+# По скольким последним проиндексированным байтам проверяется, что файл только дописывался
+_FINGERPRINT_SIZE = 4096
+# Размеры блоков, которыми сужается поиск N-го перевода строки перед поиском по одному
+_COUNT_BLOCKS = (64 * 1024, 2 * 1024)
+
+
+class LineIndex:
+    """
+    Разреженный индекс строк файла: смещение начала каждой LINE_INDEX_EVERY-й строки.
+    Хранится в LINE_INDEX_DIR (по файлу на каждый индексированный файл). Если файл только
+    дописывался, индекс дочитывает новый хвост, иначе строится заново
+    """
+    def __init__(self, path: Path, every: int = LINE_INDEX_EVERY):
+        self.path = path
+        self.every = every
+        # offsets[i] - смещение начала строки с номером i * every (нумерация с 0)
+        self.offsets = array("Q", [0])
+        # Количество переводов строки в проиндексированной части
+        self.newlines = 0
+        # Размер проиндексированной части файла
+        self.size = 0
+        self._fingerprint = b""
+
+    @staticmethod
+    def location(path: Path) -> Path:
+        digest = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()
+        return Path(LINE_INDEX_DIR).expanduser() / f"{digest}.idx"
+
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return cls.location(path).is_file()
+
+    @classmethod
+    def load(cls, path: Path) -> Self:
+        index = cls(path)
+        try:
+            with open(cls.location(path), "rb") as file:
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return index
+        if data.get("version") != INDEX_VERSION or data.get("path") != str(path.resolve()):
+            return index
+        index.every = data["every"]
+        index.offsets = data["offsets"]
+        index.newlines = data["newlines"]
+        index.size = data["size"]
+        index._fingerprint = data["fingerprint"]
+        return index
+
+    def save(self) -> None:
+        location = self.location(self.path)
+        location.parent.mkdir(parents=True, exist_ok=True)
+        temporary = location.with_suffix(".tmp")
+        with open(temporary, "wb") as file:
+            pickle.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "path": str(self.path.resolve()),
+                    "every": self.every,
+                    "offsets": self.offsets,
+                    "newlines": self.newlines,
+                    "size": self.size,
+                    "fingerprint": self._fingerprint,
+                },
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temporary, location)
+
+    def update(self, file: IO[bytes]) -> int:
+        """
+        Доводит индекс до текущего размера файла
+        :param file: файл, открытый на чтение в двоичном режиме
+        :return: сколько байт пришлось просмотреть (0, если индекс актуален)
+        """
+        size = os.fstat(file.fileno()).st_size
+        if size < self.size or _fingerprint(file, self.size) != self._fingerprint:
+            # Файл перезаписан или усечен - дописанным хвостом это не объяснить
+            self.offsets = array("Q", [0])
+            self.newlines = 0
+            self.size = 0
+        start = self.size
+        if size > start:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                self._scan(buffer, start, size)
+            self.size = size
+        self._fingerprint = _fingerprint(file, self.size)
+        return size - start
+
+    def seek_line(self, file: IO[bytes], line: int) -> bool:
+        """
+        Ставит файл на начало строки: один seek к ближайшей точке индекса и чтение не больше every строк
+        :param file: файл, открытый на чтение в двоичном режиме
+        :param line: номер строки, с 0
+        :return: есть ли такая строка в проиндексированной части
+        """
+        if line > self.newlines:
+            return False
+        checkpoint = min(line // self.every, len(self.offsets) - 1)
+        file.seek(self.offsets[checkpoint])
+        for _ in range(line - checkpoint * self.every):
+            file.readline()
+        return True
+
+    def _scan(self, buffer: mmap.mmap, start: int, end: int) -> None:
+        position = start
+        while position < end:
+            chunk = buffer[position:min(end, position + GREP_NEWLINE_CHUNK)]
+            left = chunk.count(b"\n")
+            offset = 0
+            need = self.every - self.newlines % self.every
+            while left >= need:
+                newline = _nth_newline(chunk, offset, need)
+                self.newlines += need
+                left -= need
+                self.offsets.append(position + newline + 1)
+                offset = newline + 1
+                need = self.every
+            self.newlines += left
+            position += len(chunk)
+
+
+def _nth_newline(data: bytes, start: int, count: int) -> int:
+    """
+    Находит count-й перевод строки начиная с start: сначала блоки считаются через bytes.count,
+    и только внутри последнего маленького блока переводы строки ищутся по одному
+    """
+    for block in _COUNT_BLOCKS:
+        while True:
+            end = min(len(data), start + block)
+            found = data.count(b"\n", start, end)
+            if found >= count:
+                break
+            count -= found
+            start = end
+    position = start - 1
+    for _ in range(count):
+        position = data.find(b"\n", position + 1)
+    return position
+
+
+def _fingerprint(file: IO[bytes], size: int) -> bytes:
+    file.seek(max(0, size - _FINGERPRINT_SIZE))
+    return hashlib.sha1(file.read(min(size, _FINGERPRINT_SIZE))).digest()
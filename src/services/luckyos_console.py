@@ -1,22 +1,124 @@
+import codecs
 import datetime
+import heapq
+import io
+import mmap
 import shutil
 import stat
 import os
 import zipfile
 import tarfile
 import re
+from collections import deque
+from collections.abc import Callable, Generator, Iterable, Iterator, Sequence
+from contextlib import closing
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, islice
+from typing import IO, Any, NamedTuple
 from logging import Logger
 from os import PathLike, access, R_OK, remove
 from pathlib import Path
 import typer
 from src.services.base import OSConsoleServiceBase
-from src.errors import NotAZipFileError
+from src.errors import NotAZipFileError, PartialCopyError
+from src.services.disk_usage import scan_tree, summarize_usage
+from src.services.follow import FileWatcher, iter_follow
+from src.services.finder import FILE_TYPES, FindQuery, iter_find, parse_mtime, parse_size
+from src.services.grep_cache import GrepCache
+from src.services.grep_result import GrepResult, Row
+from src.services.line_index import LineIndex
+from src.services.copier import (
+    COMPARE_MODES,
+    REFLINK_MODES,
+    copy_file,
+    copy_file_resumable,
+    copy_tree,
+    is_unchanged,
+    sendfile_all,
+)
+from src.services.compressed import DECOMPRESSION_ERRORS, compression_kind, open_decompressed, read_head
+from src.services.matchers import Matcher, build_matchers
+from src.services.progress import ProgressReader, ProgressTracker, iter_counted, summary
+from src.services.sparse import add_to_tar
+from src.services.trigram_index import TrigramIndex, required_literals
+from src.services.walker import iter_dirs, iter_files, iter_tree
+from src.common.config import (
+    CAT_CHUNK,
+    CP_JOBS,
+    DU_JOBS,
+    FIND_JOBS,
+    GREP_BATCH_SIZE,
+    GREP_BATCHES_PER_JOB,
+    GREP_BINARY_CHECK,
+    GREP_MMAP_THRESHOLD,
+    GREP_NEWLINE_CHUNK,
+    GREP_STREAM_CHUNK,
+    TAIL_BLOCK,
+)
+
+
+class GrepScan(NamedTuple):
+    """
+    Параметры просмотра одного файла в grep
+    """
+    text_matcher: Matcher
+    bytes_matcher: Matcher | None
+    skip_binary: bool
+    # "match" - совпадения, "files" - имена файлов с совпадениями, "count" - количество совпадений
+    mode: str = "match"
+    # Сколько совпадений в файле просматривать, после этого чтение файла прекращается
+    limit: int | None = None
+
+
+# Совпадение в файле: номер строки, текст (str, bytes или mmap), начало и конец совпадения
+Hit = tuple[int, Any, int, int]
 
 
 class LuckyOSConsoleService(OSConsoleServiceBase):
     def __init__(self, logger: Logger):
         self._logger = logger
-    def ls(self, path: PathLike[str] | str, long: bool) -> list[str] | list[list[object]]:
+
+    def _track(self, operation: str, bytes_total: int | None = None, files_total: int | None = None) -> ProgressTracker:
+        return ProgressTracker(operation, self._progress_callback, bytes_total, files_total)
+
+    def _finish(self, tracker: ProgressTracker) -> None:
+        """
+        Завершает отображение прогресса и пишет в лог итоговую скорость операции
+        """
+        self._logger.info(summary(tracker.finish()))
+
+    def ls(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            limit: int | None = None,
+            offset: int = 0,
+            sort: str | None = None,
+            top: int | None = None
+    ) -> list[str] | list[list[object]]:
+        return list(self.iter_ls(path, long, limit, offset, sort, top))  # type: ignore[return-value]
+
+    def iter_ls(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            limit: int | None = None,
+            offset: int = 0,
+            sort: str | None = None,
+            top: int | None = None
+    ) -> Iterator[str | list[object]]:
+        if limit is not None and limit < 0:
+            self._logger.error(f"Некорректное количество записей: {limit}")
+            raise ValueError(f"Количество записей не может быть отрицательным: {limit}")
+        if offset < 0:
+            self._logger.error(f"Некорректное смещение: {offset}")
+            raise ValueError(f"Смещение не может быть отрицательным: {offset}")
+        if top is not None and top < 1:
+            self._logger.error(f"Некорректное количество записей для --top: {top}")
+            raise ValueError(f"Количество записей для --top должно быть положительным: {top}")
+        if sort is not None and sort not in _LS_SORT_KEYS:
+            self._logger.error(f"Неизвестный порядок сортировки: {sort}")
+            raise ValueError(f"Порядок сортировки должен быть одним из: {', '.join(_LS_SORT_KEYS)}")
         path = Path(path)
         if not path.exists():
             self._logger.error(f"Папка на найдена: {path}")
@@ -25,19 +127,64 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
             self._logger.error(f"Введенный путь {path} не является директорией")
             raise NotADirectoryError(path)
         self._logger.info(f"Чтение {path}")
-        if long:
-            entry = []
-            for file in path.iterdir():
-                file_info = file.stat()
-                type_and_access = stat.filemode(file_info.st_mode)
-                count_link = file_info.st_nlink
-                size_file = file_info.st_size
-                change_date = datetime.datetime.fromtimestamp(
-                        file_info.st_mtime).strftime("%b %d %H:%M")
-                entry.append([type_and_access, count_link, size_file, change_date, file.name])
-            return entry
-        else:
-            return [entry.name + "\n" for entry in path.iterdir()]
+        return _iter_ls_rows(path, long, limit, offset, sort, top)
+
+
+    def iter_ls_recursive(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            max_depth: int | None = None
+    ) -> Iterator[tuple[str, Iterator[str | list[object]]]]:
+        path = self._check_ls_tree(path, max_depth)
+        return self._iter_ls_blocks(path, long, max_depth)
+
+    def iter_ls_tree(
+            self,
+            path: PathLike[str] | str,
+            long: bool,
+            max_depth: int | None = None
+    ) -> Iterator[tuple[str, str | list[object]]]:
+        path = self._check_ls_tree(path, max_depth)
+        return _iter_tree_rows(path, long, max_depth)
+
+    def _check_ls_tree(self, path: PathLike[str] | str, max_depth: int | None) -> Path:
+        if max_depth is not None and max_depth < 1:
+            self._logger.error(f"Некорректная глубина: {max_depth}")
+            raise ValueError(f"Глубина должна быть положительной: {max_depth}")
+        path = Path(path)
+        if not path.exists():
+            self._logger.error(f"Папка на найдена: {path}")
+            raise FileNotFoundError(path)
+        if not path.is_dir():
+            self._logger.error(f"Введенный путь {path} не является директорией")
+            raise NotADirectoryError(path)
+        self._logger.info(f"Чтение дерева {path}")
+        return path
+
+    def _iter_ls_blocks(
+            self,
+            path: Path,
+            long: bool,
+            max_depth: int | None
+    ) -> Iterator[tuple[str, Iterator[str | list[object]]]]:
+        """
+        Отдает пары (директория, ленивые строки ее содержимого). Строки нужно прочитать
+        до перехода к следующей директории
+        """
+        with closing(iter_dirs(path, max_depth)) as directories:
+            for depth, directory in directories:
+                rows = _iter_ls_rows(Path(directory), long, None, 0, None, None)
+                try:
+                    first = next(rows, None)
+                except OSError:
+                    # Недоступная поддиректория пропускается, как и при обходе в grep
+                    self._logger.error(f"Ошибка чтения {directory}")
+                    if depth == 0:
+                        raise OSError(f"Ошибка чтения {directory}")
+                    continue
+                with closing(rows):
+                    yield directory, chain([] if first is None else [first], rows)
 
 
     def cd(self, path: PathLike[str] | str) -> None:
@@ -79,11 +226,187 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
             self._logger.exception(f"Ошибка чтения {filename}")
             raise
 
+    def cat_stream(self, filenames: Sequence[PathLike[str] | str], output: IO[bytes]) -> int:
+        paths = [Path(filename) for filename in filenames]
+        for path in paths:
+            if not path.exists():
+                self._logger.error(f"Файл не найден: {path}")
+                raise FileNotFoundError(path)
+            if path.is_dir():
+                self._logger.error(f"Введенный путь {path} не является файлом")
+                raise IsADirectoryError(f"Введенный путь {path} не является файлом")
+        try:
+            output.flush()
+            out_fd: int | None = output.fileno() if hasattr(os, "sendfile") else None
+        except (OSError, ValueError):
+            # Объект без файлового дескриптора (например, BytesIO) - только копирование блоками
+            out_fd = None
+        copied = 0
+        for path in paths:
+            self._logger.info(f"Чтение файла {path} ")
+            try:
+                with open(path, "rb") as file:
+                    sent = sendfile_all(file, out_fd) if out_fd is not None else 0
+                    copied += sent
+                    if sent == 0:
+                        # sendfile не поддерживается для этой пары файлов или ничего не отдал (пустой файл,
+                        # файлы /proc) - копирование блоками. sendfile с явным смещением позицию файла не двигает,
+                        # а ошибка после частичной отправки выбрасывается, поэтому чтение идет с начала
+                        while chunk := file.read(CAT_CHUNK):
+                            output.write(chunk)
+                            copied += len(chunk)
+                        output.flush()
+            except OSError:
+                self._logger.exception(f"Ошибка чтения {path}")
+                raise
+        return copied
+
+    def cat_lines(
+            self,
+            filename: PathLike[str] | str,
+            start: int,
+            end: int | None = None,
+            index: bool = False
+    ) -> Iterator[bytes]:
+        if start < 1:
+            self._logger.error(f"Некорректный номер строки: {start}")
+            raise ValueError(f"Номер строки должен быть положительным: {start}")
+        if end is not None and end < start:
+            self._logger.error(f"Некорректный диапазон строк: {start}:{end}")
+            raise ValueError(f"Конец диапазона строк меньше начала: {start}:{end}")
+        path = Path(filename)
+        if not path.exists():
+            self._logger.error(f"Файл не найден: {filename}")
+            raise FileNotFoundError(filename)
+        if path.is_dir():
+            self._logger.error(f"Введенный путь {filename} не является файлом")
+            raise IsADirectoryError(f"Введенный путь {filename} не является файлом")
+        self._logger.info(f"Чтение строк {start}:{end or ''} файла {filename}")
+        return self._iter_cat_lines(path, start, end, index or LineIndex.exists(path))
+
+    def _iter_cat_lines(self, path: Path, start: int, end: int | None, use_index: bool) -> Iterator[bytes]:
+        try:
+            with open(path, "rb") as file:
+                if use_index:
+                    line_index = LineIndex.load(path)
+                    scanned = line_index.update(file)
+                    if scanned:
+                        try:
+                            line_index.save()
+                            self._logger.info(f"Индекс строк {path} обновлен, просмотрено байт: {scanned}")
+                        except OSError:
+                            self._logger.exception(f"Ошибка сохранения индекса строк {path}")
+                    if not line_index.seek_line(file, start - 1):
+                        return
+                    lines: Iterable[bytes] = iter(file.readline, b"")
+                else:
+                    # Без индекса файл читается с начала, пропущенные строки не хранятся
+                    lines = islice(file, start - 1, None)
+                yield from islice(lines, None if end is None else end - start + 1)
+        except OSError:
+            self._logger.exception(f"Ошибка чтения {path}")
+            raise
 
-    def cp(self,
-           filename: PathLike[str] | str,
-           dct: PathLike[str] | str,
-           recursive: bool) -> None:
+    def head(self, filename: PathLike[str] | str, lines: int = 10, byte_count: int | None = None) -> bytes:
+        path = self._check_head_tail(filename, lines, byte_count)
+        try:
+            with open(path, "rb") as file:
+                if byte_count is not None:
+                    return file.read(byte_count)
+                chunks: list[bytes] = []
+                newlines = 0
+                while newlines < lines and (chunk := file.read(TAIL_BLOCK)):
+                    chunks.append(chunk)
+                    newlines += chunk.count(b"\n")
+        except OSError:
+            self._logger.exception(f"Ошибка чтения {filename}")
+            raise
+        data = b"".join(chunks)
+        end = -1
+        for _ in range(lines):
+            end = data.find(b"\n", end + 1)
+            if end == -1:
+                return data
+        return data[:end + 1]
+
+    def tail(self, filename: PathLike[str] | str, lines: int = 10, byte_count: int | None = None) -> bytes:
+        path = self._check_head_tail(filename, lines, byte_count)
+        try:
+            with open(path, "rb") as file:
+                return _read_tail(file, lines, byte_count)
+        except OSError:
+            self._logger.exception(f"Ошибка чтения {filename}")
+            raise
+
+    def tail_follow(
+            self,
+            filename: PathLike[str] | str,
+            lines: int = 10,
+            byte_count: int | None = None
+    ) -> Iterator[bytes]:
+        path = self._check_head_tail(filename, lines, byte_count)
+        try:
+            with open(path, "rb") as file:
+                data = _read_tail(file, lines, byte_count)
+                position = os.fstat(file.fileno()).st_size
+            watcher = FileWatcher(path)
+        except OSError:
+            self._logger.exception(f"Ошибка чтения {filename}")
+            raise
+        self._logger.info(f"Слежение за {filename} ({'inotify' if watcher.uses_inotify else 'опрос размера'})")
+        return self._iter_tail_follow(path, data, position, watcher)
+
+    def _iter_tail_follow(self, path: Path, data: bytes, position: int, watcher: FileWatcher) -> Iterator[bytes]:
+        try:
+            if data:
+                yield data
+            yield from iter_follow(path, position, watcher)
+        except OSError:
+            self._logger.exception(f"Ошибка чтения {path}")
+            raise OSError(f"Ошибка чтения {path}")
+        finally:
+            watcher.close()
+
+    def _check_head_tail(self, filename: PathLike[str] | str, lines: int, byte_count: int | None) -> Path:
+        if lines < 0:
+            self._logger.error(f"Некорректное количество строк: {lines}")
+            raise ValueError(f"Количество строк не может быть отрицательным: {lines}")
+        if byte_count is not None and byte_count < 0:
+            self._logger.error(f"Некорректное количество байт: {byte_count}")
+            raise ValueError(f"Количество байт не может быть отрицательным: {byte_count}")
+        path = Path(filename)
+        if not path.exists():
+            self._logger.error(f"Файл не найден: {filename}")
+            raise FileNotFoundError(filename)
+        if path.is_dir():
+            self._logger.error(f"Введенный путь {filename} не является файлом")
+            raise IsADirectoryError(f"Введенный путь {filename} не является файлом")
+        self._logger.info(f"Чтение файла {filename} ")
+        return path
+
+    def cp(
+            self,
+            filename: PathLike[str] | str,
+            dct: PathLike[str] | str,
+            recursive: bool,
+            reflink: str = "auto",
+            jobs: int = CP_JOBS,
+            compare: str | None = None,
+            delete: bool = False,
+            resume: bool = False
+    ) -> dict[str, int]:
+        if reflink not in REFLINK_MODES:
+            self._logger.error(f"Некорректный режим reflink: {reflink}")
+            raise ValueError(f"Режим reflink должен быть одним из: {', '.join(REFLINK_MODES)}")
+        if compare is not None and compare not in COMPARE_MODES:
+            self._logger.error(f"Некорректный режим сравнения: {compare}")
+            raise ValueError(f"Режим сравнения должен быть одним из: {', '.join(COMPARE_MODES)}")
+        if delete and not recursive:
+            self._logger.error("Удаление лишних файлов без рекурсивного копирования")
+            raise ValueError("Удаление лишних файлов из назначения возможно только при рекурсивном копировании")
+        if jobs < 1:
+            self._logger.error(f"Некорректное число потоков: {jobs}")
+            raise ValueError(f"Число потоков должно быть положительным: {jobs}")
         dct = Path(dct)
         filename  = Path(filename)
         dct.parent.mkdir(parents=True, exist_ok=True)
@@ -93,23 +416,53 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
         if  not recursive:
             if filename.is_dir():
                 raise IsADirectoryError(f"{filename} директория, используйте --recursive, что скопировать ее")
+            target = dct / filename.name if dct.is_dir() else dct
+            tracker = self._track("cp", filename.stat().st_size, 1)
             try:
-                shutil.copy2(filename, dct)
-                self._logger.info(f"{filename} скопировано в {dct}")
-            except OSError:
+                if compare is not None and is_unchanged(filename, target, compare):
+                    self._logger.info(f"{filename} не изменился относительно {target}")
+                    return {"unchanged": 1}
+                if resume:
+                    method = copy_file_resumable(filename, target, tracker)
+                else:
+                    method = copy_file(filename, target, reflink, tracker)
+                self._logger.info(f"{filename} скопировано в {dct} ({method})")
+            except OSError as e:
                 self._logger.exception(f"Ошибка копирования {filename} в {dct}")
-                raise OSError(f"Ошибка копирования {filename} в {dct}")
-        else:
-            if not filename.is_dir():
-                self._logger.error(f"Введенный путь {filename} не является директорией")
-                raise IsADirectoryError(f"Введенный путь {filename} не является директорией")
-            try:
-                shutil.copytree(filename, dct, dirs_exist_ok=True)
-                self._logger.info(f"{filename} скопировано с рекурсией в {dct}")
-            except OSError:
-                self._logger.exception(f"Ошибка копирования {filename} в {dct}")
-                raise OSError(f"Ошибка копирования {filename} в {dct}")
+                raise OSError(f"Ошибка копирования {filename} в {dct}: {e.strerror or e}")
+            finally:
+                self._finish(tracker)
+            return {method: 1}
+        if not filename.is_dir():
+            self._logger.error(f"Введенный путь {filename} не является директорией")
+            raise IsADirectoryError(f"Введенный путь {filename} не является директорией")
+        if dct.resolve().is_relative_to(filename.resolve()):
+            self._logger.error(f"Нельзя скопировать {filename} внутрь самой себя: {dct}")
+            raise OSError(f"Нельзя скопировать {filename} внутрь самой себя: {dct}")
+        if delete and filename.resolve().is_relative_to(dct.resolve()):
+            # --delete удалил бы из назначения и сам источник до того, как он скопирован
+            self._logger.error(f"Нельзя скопировать {filename} с --delete в содержащую его директорию {dct}")
+            raise OSError(f"Нельзя скопировать {filename} с --delete в содержащую его директорию {dct}")
+        errors: list[tuple[str, OSError]] = []
+
+        def on_error(path: str, error: OSError) -> None:
+            self._logger.error(f"Ошибка копирования {path}: {error}")
+            errors.append((path, error))
 
+        tracker = self._track("cp")
+        try:
+            methods = copy_tree(str(filename), str(dct), reflink, jobs, on_error, compare, delete, resume, tracker)
+        except OSError:
+            self._logger.exception(f"Ошибка копирования {filename} в {dct}")
+            raise OSError(f"Ошибка копирования {filename} в {dct}")
+        finally:
+            self._finish(tracker)
+        self._logger.info(f"{filename} скопировано с рекурсией в {dct} ({_format_methods(methods)})")
+        if errors:
+            raise PartialCopyError(
+                f"Не удалось скопировать путей из {filename}: {len(errors)} (первый - {errors[0][0]})", errors
+            )
+        return methods
 
     def mv(
             self,
@@ -127,12 +480,21 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
         if path2.exists() and not access(path2, R_OK):
             self._logger.error(f"Введенный путь {path2} недоступен для чтения")
             raise PermissionError(f"Введенный путь {path2} недоступен для чтения")
+        tracker = self._track("mv")
+
+        def copy_function(source: str, destination: str) -> None:
+            # Вызывается, только если переименовать не удалось (другая файловая система)
+            tracker.add_total(os.stat(source).st_size, 1)
+            copy_file(Path(source), Path(destination), progress=tracker)
+
         try:
-            shutil.move(path1, path2)
+            shutil.move(path1, path2, copy_function=copy_function)
             self._logger.info(f"Перемещено {path1} -> {path2}")
         except OSError:
             self._logger.exception(f"Ошибка перемещения {path1} в {path2}")
             raise OSError(f"Ошибка перемещения {path1} в {path2}")
+        finally:
+            self._finish(tracker)
 
 
 
@@ -158,7 +520,7 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
             try:
                 conf = typer.prompt("Подтвердите удаление директории [y/n]")
                 if conf == "y":
-                    shutil.rmtree(path)
+                    self._remove_tree(path)
                     self._logger.info(f"Удалено {path}")
             except OSError:
                 self._logger.exception(f"Ошибка удаления {path}")
@@ -182,6 +544,30 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
                 raise OSError(f"Ошибка удаления {path}")
 
 
+    def _remove_tree(self, path: Path) -> None:
+        """
+        Удаляет дерево для rm -r: файлы удаляются по одному с учетом в прогрессе (освобожденные байты),
+        оставшиеся пустые директории - через shutil.rmtree
+        """
+        # is_dir следует по ссылке: без этой проверки обход удалил бы файлы в директории, на которую она указывает
+        if path.is_symlink():
+            raise OSError(f"Путь {path} является символической ссылкой на директорию")
+        files: list[tuple[str, int]] = []
+        for root, dirs, names in os.walk(path):
+            # Ссылки на директории удаляются как файлы, внутрь них обход не заходит
+            names.extend(name for name in dirs if os.path.islink(os.path.join(root, name)))
+            for name in names:
+                file_path = os.path.join(root, name)
+                files.append((file_path, os.lstat(file_path).st_size))
+        tracker = self._track("rm", sum(size for _, size in files), len(files))
+        try:
+            for file_path, size in files:
+                remove(file_path)
+                tracker.add(bytes_done=size, files_done=1)
+            shutil.rmtree(path)
+        finally:
+            self._finish(tracker)
+
     def zip(self, folder: PathLike[str] | str, filename: PathLike[str] | str) -> None:
         folder = Path(folder)
         filename = Path(filename)
@@ -194,16 +580,24 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
         if not access(folder, R_OK):
             self._logger.error(f"Введенная папка {folder} недоступна для чтения")
             raise PermissionError(f"Введенная папка {folder} недоступна для чтения")
+        tracker = self._track("zip")
         try:
+            files = [Path(root, file) for root, dirs, names in os.walk(folder) for file in names]
+            tracker.add_total(sum(file_path.stat().st_size for file_path in files), len(files))
             with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as myzip:
-                for root, dirs, files in os.walk(folder):
-                    for file in files:
-                        file_path = Path(root, file)
-                        myzip.write(file_path, file_path.relative_to(folder))
+                for file_path in files:
+                    info = zipfile.ZipInfo.from_file(file_path, file_path.relative_to(folder))
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    # Как ZipFile.write, но прочитанные байты засчитываются в прогресс по ходу сжатия
+                    with open(file_path, "rb") as source, myzip.open(info, "w") as destination:
+                        shutil.copyfileobj(ProgressReader(source, tracker), destination, CAT_CHUNK)
+                    tracker.add(files_done=1)
             self._logger.info(f"Создан ZIP архив {filename.name} в {filename.parent}")
         except OSError:
             self._logger.exception(f"Ошибка создания ZIP архива {filename} из {folder}")
             raise OSError(f"Ошибка создания ZIP архива {filename} из {folder}")
+        finally:
+            self._finish(tracker)
 
     def unzip(self, filename: PathLike[str] | str) -> None:
         filename = Path(filename)
@@ -216,13 +610,20 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
         if not access(filename, R_OK):
             self._logger.error(f"Введенный файл {filename} недоступен для чтения")
             raise PermissionError(f"Введенный файл {filename} недоступен для чтения")
+        tracker = self._track("unzip")
         try:
             with zipfile.ZipFile(filename, "r") as myzip:
-                myzip.extractall()
+                # Член архива засчитывается целиком, когда extractall его распаковал
+                members: Iterator[zipfile.ZipInfo] = iter_counted(
+                    myzip.infolist(), tracker, _zip_member_size, _zip_member_is_file, known_total=True
+                )
+                myzip.extractall(members=members)
                 self._logger.info(f"Распакован {filename.name} в {Path.cwd()}")
         except (OSError, NotAZipFileError):
             self._logger.exception(f"Ошибка распаковки {filename}")
             raise OSError(f"Ошибка распаковки {filename}")
+        finally:
+            self._finish(tracker)
 
 
     def tar(self,
@@ -239,13 +640,18 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
         if not access(folder, R_OK):
             self._logger.error(f"Введенная папка {folder} недоступна для чтения")
             raise PermissionError(f"Введенная папка {folder} недоступна для чтения")
+        tracker = self._track("tar")
         try:
+            for root, dirs, files in os.walk(folder):
+                tracker.add_total(sum(os.lstat(os.path.join(root, file)).st_size for file in files), len(files))
             with tarfile.open(filename, "w:gz") as tar:
-                tar.add(folder, arcname=folder.name)
+                add_to_tar(tar, folder, folder.name, tracker)
             self._logger.info(f"Создан TAR.GZ архив {filename.name} из {folder}")
         except OSError:
             self._logger.exception(f"Ошибка создания TAR.GZ архива {filename}")
             raise OSError(f"Ошибка создания TAR.GZ архива {filename}")
+        finally:
+            self._finish(tracker)
 
 
     def untar(self,
@@ -258,73 +664,705 @@ class LuckyOSConsoleService(OSConsoleServiceBase):
             self._logger.error(f"Введенный файл {filename} недоступен для чтения")
             raise PermissionError(f"Введенный файл {filename} недоступен для чтения")
 
+        tracker = self._track("untar")
         try:
             with tarfile.open(filename, "r:gz") as tar:
-                tar.extractall()
+                # Общий объем сжатого потока заранее неизвестен: чтобы его узнать, архив пришлось бы распаковать дважды
+                tar.extractall(members=iter_counted(
+                    tar, tracker, _tar_member_size, _tar_member_is_file
+                ))
                 self._logger.info(f"Распакован {filename} в {Path.cwd()}")
         except OSError:
             self._logger.exception(f"Ошибка распаковки {filename}")
             raise OSError(f"Ошибка распаковки {filename}")
+        finally:
+            self._finish(tracker)
+
+
+    def du(
+            self,
+            path: PathLike[str] | str,
+            max_depth: int | None = None,
+            summarize: bool = False,
+            jobs: int = DU_JOBS
+    ) -> list[list[object]]:
+        if jobs < 1:
+            self._logger.error(f"Некорректное число потоков: {jobs}")
+            raise ValueError(f"Число потоков должно быть положительным: {jobs}")
+        if max_depth is not None and max_depth < 0:
+            self._logger.error(f"Некорректная глубина: {max_depth}")
+            raise ValueError(f"Глубина не может быть отрицательной: {max_depth}")
+        if summarize and max_depth is not None:
+            self._logger.error("Опции --summarize и --max-depth несовместимы")
+            raise ValueError("Опции --summarize и --max-depth несовместимы")
+        path = Path(path)
+        if not path.exists():
+            self._logger.error(f"Путь не найден: {path}")
+            raise FileNotFoundError(path)
+        self._logger.info(f"Подсчет места {path}")
+        if not path.is_dir() or path.is_symlink():
+            info = path.lstat()
+            return [[str(path), info.st_size, info.st_blocks * 512]]
+
+        def on_error(directory: str, error: OSError) -> None:
+            self._logger.error(f"Ошибка чтения {directory}: {error}")
 
+        try:
+            usage = scan_tree(str(path), jobs, on_error)
+        except OSError:
+            self._logger.exception(f"Ошибка чтения {path}")
+            raise OSError(f"Ошибка чтения {path}")
+        return summarize_usage(str(path), usage, 0 if summarize else max_depth)
+
+    def find(
+            self,
+            path: PathLike[str] | str,
+            name: str | None = None,
+            iname: str | None = None,
+            size: str | None = None,
+            mtime: str | None = None,
+            file_type: str | None = None,
+            max_depth: int | None = None,
+            jobs: int = FIND_JOBS
+    ) -> list[str]:
+        return list(self.iter_find(path, name, iname, size, mtime, file_type, max_depth, jobs))
+
+    def iter_find(
+            self,
+            path: PathLike[str] | str,
+            name: str | None = None,
+            iname: str | None = None,
+            size: str | None = None,
+            mtime: str | None = None,
+            file_type: str | None = None,
+            max_depth: int | None = None,
+            jobs: int = FIND_JOBS
+    ) -> Iterator[str]:
+        if jobs < 1:
+            self._logger.error(f"Некорректное число потоков: {jobs}")
+            raise ValueError(f"Число потоков должно быть положительным: {jobs}")
+        if max_depth is not None and max_depth < 0:
+            self._logger.error(f"Некорректная глубина: {max_depth}")
+            raise ValueError(f"Глубина не может быть отрицательной: {max_depth}")
+        if file_type is not None and file_type not in FILE_TYPES:
+            self._logger.error(f"Неизвестный тип: {file_type}")
+            raise ValueError(f"Тип должен быть одним из: {', '.join(FILE_TYPES)}")
+        try:
+            query = FindQuery(
+                name, iname,
+                parse_size(size) if size is not None else None,
+                parse_mtime(mtime) if mtime is not None else None,
+                file_type, max_depth
+            )
+        except ValueError as e:
+            self._logger.error(str(e))
+            raise
+        path = Path(path)
+        if not path.exists() and not path.is_symlink():
+            self._logger.error(f"Путь не найден: {path}")
+            raise FileNotFoundError(path)
+        self._logger.info(f"Поиск файлов в {path}")
+
+        def on_error(directory: str, error: OSError) -> None:
+            self._logger.error(f"Ошибка чтения {directory}: {error}")
+
+        return self._iter_find(str(path), query, jobs, on_error)
+
+    def _iter_find(
+            self,
+            root: str,
+            query: FindQuery,
+            jobs: int,
+            on_error: Callable[[str, OSError], None]
+    ) -> Iterator[str]:
+        try:
+            yield from iter_find(root, query, jobs, on_error)
+        except OSError:
+            self._logger.exception(f"Ошибка чтения {root}")
+            raise OSError(f"Ошибка чтения {root}")
 
     def grep(
             self,
-            pattern: str,
+            pattern: str | Sequence[str],
             path: PathLike[str] | str,
             recursive: bool,
-            ignore_case: bool
-    ) -> list[list[str]]:
-
-        def all_files_on_directory(path_now=Path()) -> list[Path]:
-            all_path = []
-            for now_file in path_now.iterdir():
-                if now_file.is_file():
-                    all_path.append(now_file)
-                elif now_file.is_dir():
-                    all_path.extend(all_files_on_directory(now_file))
-            return all_path
+            ignore_case: bool,
+            jobs: int = 1,
+            fixed_strings: bool = False,
+            index: bool = False,
+            include: Sequence[str] = (),
+            exclude: Sequence[str] = (),
+            ignore_files: bool = True,
+            binary: bool = False,
+            files_with_matches: bool = False,
+            count: bool = False,
+            max_count: int | None = None,
+            quiet: bool = False,
+            cache: bool = False
+    ) -> GrepResult:
+        return GrepResult(self.iter_grep(
+            pattern, path, recursive, ignore_case, jobs, fixed_strings, index,
+            include, exclude, ignore_files, binary, files_with_matches, count, max_count, quiet, cache
+        ))
 
+    def iter_grep(
+            self,
+            pattern: str | Sequence[str],
+            path: PathLike[str] | str,
+            recursive: bool,
+            ignore_case: bool,
+            jobs: int = 1,
+            fixed_strings: bool = False,
+            index: bool = False,
+            include: Sequence[str] = (),
+            exclude: Sequence[str] = (),
+            ignore_files: bool = True,
+            binary: bool = False,
+            files_with_matches: bool = False,
+            count: bool = False,
+            max_count: int | None = None,
+            quiet: bool = False,
+            cache: bool = False
+    ) -> Iterator[Row]:
+        if jobs < 1:
+            self._logger.error(f"Некорректное число процессов: {jobs}")
+            raise ValueError(f"Число процессов должно быть положительным: {jobs}")
+        if max_count is not None and max_count < 1:
+            self._logger.error(f"Некорректное максимальное число совпадений: {max_count}")
+            raise ValueError(f"Максимальное число совпадений должно быть положительным: {max_count}")
+        if files_with_matches and count:
+            self._logger.error("Опции вывода имен файлов и количества совпадений несовместимы")
+            raise ValueError("Опции вывода имен файлов и количества совпадений несовместимы")
+        patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+        if not patterns:
+            self._logger.error("Не указан паттерн для поиска")
+            raise ValueError("Не указан паттерн для поиска")
         try:
-            if ignore_case:
-                compiled_pattern = re.compile(pattern, flags=re.IGNORECASE | re.UNICODE)
-            else:
-                compiled_pattern = re.compile(pattern, flags=re.UNICODE)
+            text_matcher, bytes_matcher = build_matchers(patterns, ignore_case, fixed_strings)
         except re.error:
             self._logger.error(f"Ошибка компиляции регулярного выражения {pattern}")
             raise OSError(f"Ошибка компиляции регулярного выражения {pattern}")
         path = Path(path)
-        result: list[list[str]] = []
         if not path.exists():
             self._logger.error(f"Путь не найден: {path}")
             raise FileNotFoundError(path)
+        all_path: Iterable[Path]
+        if path.is_file():
+            all_path = [path]
+        else:
+            all_path = iter_files(path, recursive, include, exclude, ignore_files)
+            if recursive and (index or TrigramIndex.exists(path)):
+                all_path = self._select_with_index(
+                    path, list(all_path), patterns, ignore_case, fixed_strings, index
+                )
+        self._logger.info(f"Поиск {pattern} в {path}")
+        mode = "files" if files_with_matches or quiet else "count" if count else "match"
+        scan = GrepScan(text_matcher, bytes_matcher, not binary, mode, max_count)
         if path.is_file():
+            jobs = 1
+        if cache:
+            key = (
+                str(Path.cwd()), str(path), tuple(patterns), ignore_case, fixed_strings,
+                tuple(include), tuple(exclude), ignore_files, binary, mode, max_count
+            )
+            rows = self._iter_grep_cached(scan, all_path, jobs, GrepCache.load(key))
+        elif jobs == 1:
+            rows = self._iter_grep_serial(scan, all_path)
+        else:
+            rows = self._iter_grep_parallel(scan, all_path, jobs)
+        return _first_row(rows) if quiet else rows
+
+    def _select_with_index(
+            self,
+            root: Path,
+            all_path: list[Path],
+            patterns: list[str],
+            ignore_case: bool,
+            fixed_strings: bool,
+            update: bool
+    ) -> list[Path]:
+        trigram_index = TrigramIndex.load(root)
+        # Архивы сжаты, по их байтам индекс ничего не скажет, поэтому они просматриваются всегда
+        files = [(now_file, now_file.stat()) for now_file in all_path if _archive_kind(now_file) is None]
+        if update:
+            indexed = trigram_index.update(files)
             try:
-                with open(path, "r", encoding="utf-8", errors="ignore") as file:
-                    for number, line in enumerate(file, start=1):
-                        for match in compiled_pattern.finditer(line):
-                            find_line = line[match.start():match.end()]
-                            if find_line:
-                                result.append([str(file.name), str(number), find_line])
+                trigram_index.save()
+                self._logger.info(f"Индекс {root} обновлен, заново прочитано файлов: {indexed}")
             except OSError:
-                self._logger.error(f"Ошибка открытия {path}")
-                raise OSError(f"Ошибка открытия {path}")
+                self._logger.exception(f"Ошибка сохранения индекса {root}")
+        literals = required_literals(patterns, ignore_case, fixed_strings)
+        if literals is None:
+            return all_path
+        candidates = trigram_index.candidates(literals)
+        skipped: set[Path] = set()
+        for now_file, info in files:
+            relative = str(now_file.relative_to(root))
+            # Файлы, изменившиеся после построения индекса, всегда просматриваются
+            if relative not in candidates and trigram_index.is_fresh(relative, info.st_size, info.st_mtime_ns):
+                skipped.add(now_file)
+        selected = [now_file for now_file in all_path if now_file not in skipped]
+        self._logger.info(f"Индекс {root}: просматривается {len(selected)} из {len(all_path)} файлов")
+        return selected
+
+    def _iter_grep_cached(
+            self,
+            scan: GrepScan,
+            all_path: Iterable[Path],
+            jobs: int,
+            cache: GrepCache
+    ) -> Generator[Row]:
+        """
+        Отдает сохраненные результаты для неизменившихся файлов и заново просматривает остальные
+        """
+        files: list[tuple[Path, os.stat_result | None]] = []
+        for now_file in all_path:
+            try:
+                files.append((now_file, now_file.stat()))
+            except OSError:
+                files.append((now_file, None))
+        cached: dict[Path, list[Row]] = {}
+        for now_file, info in files:
+            if info is not None:
+                rows = cache.get(str(now_file), info.st_size, info.st_mtime_ns)
+                if rows is not None:
+                    cached[now_file] = rows
+        stale = [now_file for now_file, _ in files if now_file not in cached]
+        self._logger.info(f"Кэш grep: просматривается {len(stale)} из {len(files)} файлов")
+        if jobs == 1:
+            scanned = self._iter_file_rows_serial(scan, stale)
         else:
-            if recursive:
-                all_path = all_files_on_directory(path)
+            scanned = self._iter_file_rows_parallel(scan, stale, jobs)
+        try:
+            for now_file, info in files:
+                rows = cached.get(now_file)
+                if rows is None:
+                    rows = next(scanned)
+                    if info is not None:
+                        cache.put(str(now_file), info.st_size, info.st_mtime_ns, rows)
+                yield from rows
+        finally:
+            scanned.close()
+            cache.retain(str(now_file) for now_file, _ in files)
+            try:
+                cache.save()
+            except OSError:
+                self._logger.exception("Ошибка сохранения кэша grep")
+
+    def _iter_grep_serial(
+            self,
+            scan: GrepScan,
+            all_path: Iterable[Path]
+    ) -> Generator[Row]:
+        for now_file in all_path:
+            try:
+                yield from _iter_grep_file(now_file, scan)
+            except OSError:
+                self._logger.error(f"Ошибка открытия {now_file}")
+                raise OSError(f"Ошибка открытия {now_file}")
+
+    def _iter_file_rows_serial(
+            self,
+            scan: GrepScan,
+            all_path: Iterable[Path]
+    ) -> Generator[list[Row]]:
+        for now_file in all_path:
+            try:
+                yield list(_iter_grep_file(now_file, scan))
+            except OSError:
+                self._logger.error(f"Ошибка открытия {now_file}")
+                raise OSError(f"Ошибка открытия {now_file}")
+
+    def _iter_grep_parallel(
+            self,
+            scan: GrepScan,
+            all_path: Iterable[Path],
+            jobs: int
+    ) -> Generator[Row]:
+        with closing(self._iter_file_rows_parallel(scan, all_path, jobs)) as scanned:
+            for rows in scanned:
+                yield from rows
+
+    def _iter_file_rows_parallel(
+            self,
+            scan: GrepScan,
+            all_path: Iterable[Path],
+            jobs: int
+    ) -> Generator[list[Row]]:
+        """
+        Просматривает файлы в пуле процессов и отдает строки результата каждого файла по порядку
+        """
+        files = iter(all_path)
+        with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_grep_worker,
+                initargs=scan
+        ) as executor:
+            # Пакеты отдаются строго в порядке отправки, поэтому вывод совпадает с последовательным,
+            # а в работе одновременно держится не больше jobs * GREP_BATCHES_PER_JOB пакетов
+            pending: deque[Future[list[list[Row]]]] = deque()
+            try:
+                while True:
+                    while len(pending) < jobs * GREP_BATCHES_PER_JOB:
+                        batch = list(islice(files, GREP_BATCH_SIZE))
+                        if not batch:
+                            break
+                        pending.append(executor.submit(_grep_files_in_worker, batch))
+                    if not pending:
+                        break
+                    try:
+                        batch_rows = pending.popleft().result()
+                    except OSError as e:
+                        self._logger.error(str(e))
+                        raise
+                    yield from batch_rows
+            finally:
+                for future in pending:
+                    future.cancel()
+
+def _read_tail(file: IO[bytes], lines: int, byte_count: int | None) -> bytes:
+    """
+    Читает конец файла: последние byte_count байт или последние lines строк. Строки ищутся
+    блоками от конца файла, поэтому читается столько, сколько выводится, а не весь файл
+    """
+    size = os.fstat(file.fileno()).st_size
+    if byte_count is not None:
+        file.seek(max(0, size - byte_count))
+        return file.read()
+    if lines == 0 or size == 0:
+        return b""
+    file.seek(size - 1)
+    # Перевод строки в конце файла завершает последнюю строку, а не начинает новую
+    need = lines + 1 if file.read(1) == b"\n" else lines
+    chunks: list[bytes] = []
+    newlines = 0
+    position = size
+    while position > 0 and newlines < need:
+        read = min(TAIL_BLOCK, position)
+        position -= read
+        file.seek(position)
+        chunk = file.read(read)
+        chunks.append(chunk)
+        newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    if newlines < need:
+        return data
+    start = len(data)
+    for _ in range(need):
+        start = data.rindex(b"\n", 0, start)
+    return data[start + 1:]
+
+
+def _format_methods(methods: dict[str, int]) -> str:
+    return ", ".join(f"{method}: {count}" for method, count in methods.items()) or "нет файлов"
+
+
+# Размеры и признак файла для учета членов архива в iter_counted при распаковке
+def _zip_member_size(info: zipfile.ZipInfo) -> int:
+    return info.file_size
+
+
+def _zip_member_is_file(info: zipfile.ZipInfo) -> bool:
+    return not info.is_dir()
+
+
+def _tar_member_size(member: tarfile.TarInfo) -> int:
+    return member.size if member.isreg() else 0
+
+
+def _tar_member_is_file(member: tarfile.TarInfo) -> bool:
+    return not member.isdir()
+
+
+# Ключи сортировки ls и направление: имена по возрастанию, размер и дата - от больших к меньшим
+_LS_SORT_KEYS: dict[str, tuple[Callable[[os.DirEntry[str]], Any], bool]] = {
+    "name": (lambda entry: entry.name, False),
+    "size": (lambda entry: entry.stat().st_size, True),
+    "mtime": (lambda entry: entry.stat().st_mtime_ns, True),
+}
+
+
+def _iter_sorted_entries(
+        path: Path,
+        sort: str | None,
+        top: int | None
+) -> Generator[os.DirEntry[str]]:
+    """
+    Отдает записи директории по мере чтения или, если задан порядок, отсортированными.
+    Для --top в памяти держится не больше top записей (куча heapq), вся директория не сортируется
+    """
+    with os.scandir(path) as scanned:
+        if sort is None and top is None:
+            yield from scanned
+            return
+        key, reverse = _LS_SORT_KEYS[sort or "size"]
+        if top is not None:
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            yield from select(top, scanned, key=key)
+        else:
+            yield from sorted(scanned, key=key, reverse=reverse)
+
+
+def _iter_ls_rows(
+        path: Path,
+        long: bool,
+        limit: int | None,
+        offset: int,
+        sort: str | None,
+        top: int | None
+) -> Generator[str | list[object]]:
+    """
+    Форматирует записи директории: имя или [права, ссылки, размер, дата, имя]
+    """
+    with closing(_iter_sorted_entries(path, sort, top)) as sorted_entries:
+        entries: Iterator[os.DirEntry[str]] = sorted_entries
+        if offset or limit is not None:
+            entries = islice(entries, offset, None if limit is None else offset + limit)
+        if not long:
+            for entry in entries:
+                yield entry.name + "\n"
+            return
+        modes: dict[int, str] = {}
+        dates: dict[int, str] = {}
+        for entry in entries:
+            yield _long_row(entry, modes, dates)
+
+
+def _long_row(entry: os.DirEntry[str], modes: dict[int, str], dates: dict[int, str]) -> list[object]:
+    """
+    Строка ls -l для записи. Права и дата у большинства файлов повторяются,
+    поэтому форматируются один раз на значение и запоминаются в modes и dates
+    """
+    file_info = entry.stat()
+    type_and_access = modes.get(file_info.st_mode)
+    if type_and_access is None:
+        type_and_access = modes[file_info.st_mode] = stat.filemode(file_info.st_mode)
+    minute = int(file_info.st_mtime // 60)
+    change_date = dates.get(minute)
+    if change_date is None:
+        change_date = dates[minute] = datetime.datetime.fromtimestamp(
+            file_info.st_mtime).strftime("%b %d %H:%M")
+    return [type_and_access, file_info.st_nlink, file_info.st_size, change_date, entry.name]
+
+
+def _iter_tree_rows(path: Path, long: bool, max_depth: int | None) -> Iterator[tuple[str, str | list[object]]]:
+    """
+    Строки дерева: префикс с линиями ("│   ├── ") и строка записи, как в ls
+    """
+    # Для каждого уровня текущего пути - продолжается ли он ниже ("│   ") или уже закончился ("    ")
+    branches: list[str] = []
+    modes: dict[int, str] = {}
+    dates: dict[int, str] = {}
+    with closing(iter_tree(path, max_depth)) as entries:
+        for depth, entry, is_last in entries:
+            del branches[depth - 1:]
+            prefix = "".join(branches) + ("└── " if is_last else "├── ")
+            branches.append("    " if is_last else "│   ")
+            if long:
+                yield prefix, _long_row(entry, modes, dates)
             else:
-                all_path = []
-                for now_file in path.iterdir():
-                    if now_file.is_file():
-                        all_path.append(now_file)
-            for now_file in all_path:
-                try:
-                    with open(now_file, "r", encoding="utf-8", errors="ignore") as file:
-                        for number, line in enumerate(file, start=1):
-                            for match in compiled_pattern.finditer(line):
-                                find_line = line[match.start():match.end()]
-                                if find_line:
-                                    result.append([str(now_file), str(number), find_line])
-                except OSError:
-                    self._logger.error(f"Ошибка открытия {now_file}")
-                    raise OSError(f"Ошибка открытия {now_file}")
-        return result
+                yield prefix, entry.name + "\n"
+
+
+def _first_row(rows: Generator[Row]) -> Generator[Row]:
+    """
+    Отдает только первую строку и сразу останавливает весь поиск (grep -q)
+    """
+    with closing(rows):
+        for row in rows:
+            yield row
+            return
+
+
+_worker_scan: GrepScan | None = None
+
+
+def _init_grep_worker(*scan: Any) -> None:
+    """
+    Инициализирует процесс пула: паттерн (или готовый автомат) передается в каждый процесс один раз
+    """
+    global _worker_scan
+    _worker_scan = GrepScan(*scan)
+
+
+def _grep_files_in_worker(paths: list[Path]) -> list[list[Row]]:
+    assert _worker_scan is not None
+    result: list[list[Row]] = []
+    for path in paths:
+        try:
+            result.append(list(_iter_grep_file(path, _worker_scan)))
+        except OSError:
+            raise OSError(f"Ошибка открытия {path}")
+    return result
+
+
+def _iter_grep_file(path: Path, scan: GrepScan) -> Iterator[Row]:
+    """
+    Ищет совпадения паттерна в одном файле (или в каждом файле архива)
+    :param path: путь к файлу
+    :param scan: параметры просмотра
+    :return: строки результата в зависимости от scan.mode: [файл, номер строки, совпадение],
+             [файл] или [файл, количество совпадений]
+    """
+    with closing(_iter_file_hits(path, scan)) as files:
+        for name, all_hits in files:
+            # Недочитанный итератор закрывается сразу, чтобы отпустить mmap до его закрытия
+            with closing(all_hits):
+                hits = islice(all_hits, scan.limit) if scan.limit is not None else all_hits
+                if scan.mode == "files":
+                    if next(hits, None) is not None:
+                        yield [name]
+                elif scan.mode == "count":
+                    yield [name, sum(1 for _ in hits)]
+                else:
+                    for number, haystack, start, end in hits:
+                        find_line = haystack[start:end]
+                        if not isinstance(find_line, str):
+                            find_line = find_line.decode("utf-8", errors="ignore")
+                        yield [name, number, find_line]
+
+
+def _iter_file_hits(path: Path, scan: GrepScan) -> Generator[tuple[str, Generator[Hit]]]:
+    """
+    Отдает пары (имя, ленивый итератор совпадений). Совпадения нужно читать до перехода
+    к следующей паре, а если дальше читать не нужно (-l, -m), файл просто не дочитывается.
+    Большие файлы при подходящем паттерне читаются через mmap, остальные - построчно как текст
+    """
+    if _archive_kind(path) is not None:
+        yield from _iter_archive_hits(scan.text_matcher, path, scan.skip_binary)
+        return
+    with open(path, "rb") as file:
+        head = file.read(GREP_BINARY_CHECK)
+        kind = compression_kind(head)
+        if kind is not None:
+            file.seek(0)
+            with open_decompressed(kind, file) as stream:
+                decompressed = read_head(stream, GREP_BINARY_CHECK)
+                if decompressed is not None:
+                    lines = _iter_decompressed_lines(stream, scan.skip_binary, decompressed)
+                    yield str(path), _iter_line_hits(scan.text_matcher, lines)
+                    return
+            # Не распаковалось с самого начала: начало файла только похоже на сигнатуру, он читается как обычный
+        if scan.skip_binary and b"\0" in head:
+            return
+        bytes_matcher = scan.bytes_matcher
+        if bytes_matcher is not None and os.fstat(file.fileno()).st_size >= GREP_MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                # Текстовый режим считает '\r' переводом строки, такие файлы ищутся построчно
+                if buffer.find(b"\r") == -1:
+                    yield str(path), _iter_buffer_hits(bytes_matcher, buffer)
+                    return
+        file.seek(0)
+        with io.TextIOWrapper(file, encoding="utf-8", errors="ignore") as text:
+            yield str(path), _iter_line_hits(scan.text_matcher, text)
+
+
+def _iter_line_hits(text_matcher: Matcher, lines: Iterable[str]) -> Generator[Hit]:
+    for number, line in enumerate(lines, start=1):
+        for start, end in text_matcher.spans(line):
+            if start != end:
+                yield number, line, start, end
+
+
+def _archive_kind(path: Path) -> str | None:
+    name = path.name.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tar"
+    return None
+
+
+def _iter_archive_hits(
+        text_matcher: Matcher,
+        path: Path,
+        skip_binary: bool
+) -> Iterator[tuple[str, Generator[Hit]]]:
+    """
+    Ищет совпадения в файлах архива без распаковки на диск: каждый файл архива
+    читается потоком, совпадения помечаются как 'архив!файл'. Бинарные файлы архива
+    пропускаются так же, как обычные бинарные файлы
+    """
+    try:
+        if _archive_kind(path) == "zip":
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    with archive.open(info) as member:
+                        head = member.read(GREP_BINARY_CHECK)
+                        if skip_binary and b"\0" in head:
+                            continue
+                        lines = _iter_text_lines(member, head)
+                        yield f"{path}!{info.filename}", _iter_line_hits(text_matcher, lines)
+        else:
+            with tarfile.open(path, "r|gz") as archive:
+                for tar_info in archive:
+                    extracted = archive.extractfile(tar_info) if tar_info.isfile() else None
+                    if extracted is None:
+                        continue
+                    with extracted:
+                        head = extracted.read(GREP_BINARY_CHECK)
+                        if skip_binary and b"\0" in head:
+                            continue
+                        lines = _iter_text_lines(extracted, head)
+                        yield f"{path}!{tar_info.name}", _iter_line_hits(text_matcher, lines)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise OSError(f"Ошибка чтения архива {path}: {e}") from e
+
+
+def _iter_decompressed_lines(stream: IO[bytes], skip_binary: bool, head: bytes) -> Iterator[str]:
+    """
+    Отдает строки сжатого файла, распаковывая его блоками. Бинарность проверяется
+    по первым распакованным байтам
+    :param head: уже распакованное начало (read_head)
+    """
+    try:
+        if skip_binary and b"\0" in head:
+            return
+        yield from _iter_text_lines(stream, head)
+    except DECOMPRESSION_ERRORS as e:
+        raise OSError(f"Ошибка распаковки: {e}") from e
+
+
+def _iter_text_lines(stream: IO[bytes], head: bytes = b"") -> Iterator[str]:
+    """
+    Читает бинарный поток блоками и отдает строки так же, как текстовый режим open
+    (UTF-8 с errors="ignore" и универсальными переводами строк). В памяти держится
+    только блок и незаконченная строка, поток не обязан поддерживать seek
+    :param stream: бинарный поток
+    :param head: уже прочитанное начало потока
+    """
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(errors="ignore"), translate=True
+    )
+    pending = ""
+    final = False
+    while not final:
+        chunk = head or stream.read(GREP_STREAM_CHUNK)
+        head = b""
+        final = not chunk
+        lines = (pending + decoder.decode(chunk, final=final)).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def _iter_buffer_hits(bytes_matcher: Matcher, buffer: mmap.mmap) -> Generator[Hit]:
+    """
+    Ищет паттерн по байтам всего файла сразу. Номер строки считается только для
+    совпадений - по количеству переводов строк с предыдущего совпадения, а
+    декодируется только найденный фрагмент
+    """
+    number = 1
+    last = 0
+    for start, end in bytes_matcher.spans(buffer):
+        if start == end:
+            continue
+        while last < start:
+            stop = min(start, last + GREP_NEWLINE_CHUNK)
+            number += buffer[last:stop].count(b"\n")
+            last = stop
+        yield number, buffer, start, end
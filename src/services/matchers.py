@@ -0,0 +1,215 @@
+import mmap
+import re
+from collections import deque
+from collections.abc import Iterator, Sequence
+from typing import Any, AnyStr
+
+Sliceable = str | bytes | mmap.mmap
+
+
+def compile_bytes_pattern(pattern: str, ignore_case: bool) -> re.Pattern[bytes] | None:
+    """
+    Компилирует паттерн для поиска по сырым байтам всего файла, если результат
+    гарантированно совпадает с построчным поиском по декодированному тексту.
+    Подходят ASCII-паттерны без конструкций, которые зависят от Unicode или могут
+    захватить перевод строки: '.', отрицательные классы '[^...]', буквенные escape-
+    последовательности (\\w, \\s, \\d, \\b, \\x.., обратные ссылки) и inline-флаги.
+    :param pattern: исходное регулярное выражение
+    :param ignore_case: флаг игнорирования регистра (Unicode-регистр байтами не выразить)
+    :return: байтовый паттерн с re.MULTILINE или None, если нужен текстовый поиск
+    """
+    if ignore_case or not pattern.isascii() or not pattern.isprintable():
+        return None
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        following = pattern[index + 1:index + 2]
+        if char == "\\":
+            if not following or following.isalnum():
+                return None
+            index += 2
+            continue
+        if char == ".":
+            return None
+        if char == "[" and following == "^":
+            return None
+        if char == "(" and following == "?":
+            flag = pattern[index + 2:index + 3]
+            if flag.isalpha() and flag != "P":
+                return None
+        index += 1
+    try:
+        return re.compile(pattern.encode("ascii"), flags=re.MULTILINE)
+    except re.error:
+        return None
+
+
+class RegexMatcher:
+    """
+    Поиск по регулярному выражению
+    """
+    def __init__(self, pattern: re.Pattern[AnyStr]):
+        # Один класс для текстовых и байтовых паттернов: тип данных задает сам паттерн
+        self._pattern: re.Pattern[Any] = pattern
+
+    def spans(self, haystack: Sliceable) -> Iterator[tuple[int, int]]:
+        for match in self._pattern.finditer(haystack):
+            yield match.span()
+
+
+class LiteralMatcher:
+    """
+    Поиск одной фиксированной строки в тексте через str.find
+    """
+    def __init__(self, needle: str):
+        self._needle = needle
+
+    def spans(self, haystack: Sliceable) -> Iterator[tuple[int, int]]:
+        if not isinstance(haystack, str):
+            raise TypeError("LiteralMatcher ищет только в тексте, для байтов используется BytesLiteralMatcher")
+        needle = self._needle
+        start = haystack.find(needle)
+        while start != -1:
+            end = start + len(needle)
+            yield start, end
+            start = haystack.find(needle, end)
+
+
+class BytesLiteralMatcher:
+    """
+    Поиск одной фиксированной строки в байтах или mmap через bytes.find / mmap.find
+    """
+    def __init__(self, needle: bytes):
+        self._needle = needle
+
+    def spans(self, haystack: Sliceable) -> Iterator[tuple[int, int]]:
+        if isinstance(haystack, str):
+            raise TypeError("BytesLiteralMatcher ищет только в байтах, для текста используется LiteralMatcher")
+        needle = self._needle
+        start = haystack.find(needle)
+        while start != -1:
+            end = start + len(needle)
+            yield start, end
+            start = haystack.find(needle, end)
+
+
+class AhoCorasickMatcher:
+    """
+    Автомат Ахо-Корасик: все фиксированные строки ищутся за один проход по данным.
+    Возвращаются самые левые (при равном начале - самые длинные) непересекающиеся вхождения
+    """
+    def __init__(self, needles: Sequence[str] | Sequence[bytes]):
+        self._goto: list[dict[str | int, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._lengths: list[tuple[int, ...]] = [()]
+        for needle in needles:
+            state = 0
+            for symbol in needle:
+                next_state = self._goto[state].get(symbol)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][symbol] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._lengths.append(())
+                state = next_state
+            self._lengths[state] = (len(needle),)
+        self._max_length = max(len(needle) for needle in needles)
+        first_symbols = "".join(re.escape(str(symbol)) for symbol in self._goto[0] if isinstance(symbol, str))
+        if first_symbols:
+            self._first_symbols: re.Pattern = re.compile(f"[{first_symbols}]")
+        else:
+            self._first_symbols = re.compile(b"[" + b"".join(
+                re.escape(bytes([symbol])) for symbol in self._goto[0] if isinstance(symbol, int)
+            ) + b"]")
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and symbol not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(symbol, 0)
+                # Строки, заканчивающиеся в состоянии, включают строки его суффиксной ссылки
+                self._lengths[child] = tuple(
+                    sorted(set(self._lengths[child] + self._lengths[self._fail[child]]), reverse=True)
+                )
+
+    def spans(self, haystack: Sliceable) -> Iterator[tuple[int, int]]:
+        goto, fail, lengths = self._goto, self._fail, self._lengths
+        state = 0
+        floor = 0
+        candidates: list[tuple[int, int]] = []
+        index = 0
+        size = len(haystack)
+        while index < size:
+            if not state and not candidates:
+                # Из корня автомата можно сразу перейти к ближайшему первому символу строк
+                found = self._first_symbols.search(haystack, index)
+                if found is None:
+                    break
+                index = found.start()
+            symbol = haystack[index]
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            for length in lengths[state]:
+                if index + 1 - length >= floor:
+                    candidates.append((index + 1 - length, index + 1))
+            if candidates:
+                # Следующие вхождения начнутся не раньше index + 2 - max_length
+                for span in self._take_decided(candidates, index + 2 - self._max_length):
+                    floor = span[1]
+                    yield span
+            index += 1
+        yield from self._take_decided(candidates, size + 1)
+
+    @staticmethod
+    def _take_decided(candidates: list[tuple[int, int]], decided: int) -> Iterator[tuple[int, int]]:
+        while candidates:
+            start, end = min(candidates, key=lambda span: (span[0], -span[1]))
+            if start >= decided:
+                return
+            candidates[:] = [span for span in candidates if span[0] >= end]
+            yield start, end
+
+
+Matcher = RegexMatcher | LiteralMatcher | BytesLiteralMatcher | AhoCorasickMatcher
+
+
+def build_matchers(
+        patterns: Sequence[str],
+        ignore_case: bool,
+        fixed_strings: bool
+) -> tuple[Matcher, Matcher | None]:
+    """
+    Строит объекты поиска для grep
+    :param patterns: регулярные выражения или фиксированные строки (-e можно повторять)
+    :param ignore_case: флаг игнорирования регистра
+    :param fixed_strings: флаг поиска фиксированных строк (-F)
+    :return: пару (поиск по строкам текста, поиск по байтам всего файла или None)
+    :raises re.error: если регулярное выражение некорректно
+    """
+    if not fixed_strings:
+        pattern = patterns[0] if len(patterns) == 1 else "|".join(f"(?:{item})" for item in patterns)
+        flags = re.IGNORECASE | re.UNICODE if ignore_case else re.UNICODE
+        bytes_pattern = compile_bytes_pattern(pattern, ignore_case)
+        return (
+            RegexMatcher(re.compile(pattern, flags=flags)),
+            RegexMatcher(bytes_pattern) if bytes_pattern is not None else None
+        )
+    needles = sorted({needle for needle in patterns if needle}, key=len, reverse=True)
+    if ignore_case or not needles:
+        alternation = "|".join(map(re.escape, needles)) or "(?!)"
+        return RegexMatcher(re.compile(alternation, flags=re.IGNORECASE | re.UNICODE)), None
+    text_matcher: Matcher
+    bytes_matcher: Matcher | None
+    encoded = [needle.encode("utf-8") for needle in needles]
+    if len(needles) == 1:
+        text_matcher, bytes_matcher = LiteralMatcher(needles[0]), BytesLiteralMatcher(encoded[0])
+    else:
+        text_matcher, bytes_matcher = AhoCorasickMatcher(needles), AhoCorasickMatcher(encoded)
+    if any("\n" in needle or "\r" in needle for needle in needles):
+        bytes_matcher = None
+    return text_matcher, bytes_matcher
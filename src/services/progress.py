@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from typing import IO, NamedTuple
+
+from src.common.config import PROGRESS_INTERVAL, PROGRESS_WINDOW
+
+
+class Progress(NamedTuple):
+    """
+    Состояние долгой операции для отображения
+    """
+    # Название операции (cp, mv, rm, zip, unzip, tar, untar)
+    operation: str
+    bytes_done: int
+    # None - общий объем заранее неизвестен
+    bytes_total: int | None
+    files_done: int
+    files_total: int | None
+    # Скорость за последние PROGRESS_WINDOW секунд, байт/с
+    rate: float
+    # Средняя скорость с начала операции, байт/с
+    average_rate: float
+    elapsed: float
+    finished: bool = False
+    # Оценка оставшегося времени по мгновенной скорости, с (None - общий объем неизвестен или скорость нулевая)
+    eta: float | None = None
+
+
+ProgressCallback = Callable[[Progress], None]
+
+
+class ProgressTracker:
+    """
+    Счетчик прогресса операции. Его можно пополнять из нескольких потоков; обработчик вызывается
+    не чаще раза в PROGRESS_INTERVAL секунд и один раз в конце
+    """
+    def __init__(
+            self,
+            operation: str,
+            callback: ProgressCallback | None = None,
+            bytes_total: int | None = None,
+            files_total: int | None = None
+    ):
+        self.operation = operation
+        self.bytes_total = bytes_total
+        self.files_total = files_total
+        self.bytes_done = 0
+        self.files_done = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_report = 0.0
+        # (момент, байт сделано) за последние PROGRESS_WINDOW секунд - для мгновенной скорости
+        self._samples: deque[tuple[float, int]] = deque([(self._started, 0)])
+
+    def add(self, bytes_done: int = 0, files_done: int = 0) -> None:
+        with self._lock:
+            self.bytes_done += bytes_done
+            self.files_done += files_done
+            self._maybe_report()
+
+    def add_total(self, bytes_total: int = 0, files_total: int = 0) -> None:
+        """
+        Увеличивает общий объем - для операций, которые узнают его по ходу обхода
+        """
+        with self._lock:
+            self.bytes_total = (self.bytes_total or 0) + bytes_total
+            self.files_total = (self.files_total or 0) + files_total
+            self._maybe_report()
+
+    def snapshot(self, finished: bool = False) -> Progress:
+        now = time.monotonic()
+        elapsed = now - self._started
+        # Остается последний замер не позже начала окна, чтобы скорость считалась и при редких отчетах
+        while len(self._samples) > 1 and now - self._samples[1][0] >= PROGRESS_WINDOW:
+            self._samples.popleft()
+        since, bytes_then = self._samples[0]
+        rate = (self.bytes_done - bytes_then) / (now - since) if now > since else 0.0
+        average_rate = self.bytes_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if finished:
+            eta = 0.0
+        elif self.bytes_total is not None and rate > 0:
+            eta = max(self.bytes_total - self.bytes_done, 0) / rate
+        return Progress(
+            self.operation, self.bytes_done, self.bytes_total, self.files_done, self.files_total,
+            rate, average_rate, elapsed, finished, eta
+        )
+
+    def finish(self) -> Progress:
+        """
+        Сообщает обработчику о завершении
+        :return: итоговое состояние (для сводки в лог)
+        """
+        with self._lock:
+            progress = self.snapshot(finished=True)
+        if self._callback is not None:
+            self._callback(progress)
+        return progress
+
+    def _maybe_report(self) -> None:
+        if self._callback is None:
+            return
+        now = time.monotonic()
+        if now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        self._samples.append((now, self.bytes_done))
+        self._callback(self.snapshot())
+
+
+class ProgressReader:
+    """
+    Обертка над файлом для чтения: прочитанные байты засчитываются в прогресс
+    """
+    def __init__(self, file: IO[bytes], tracker: ProgressTracker):
+        self._file = file
+        self._tracker = tracker
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self._tracker.add(bytes_done=len(data))
+        return data
+
+
+def summary(progress: Progress) -> str:
+    """
+    Строка итогов операции для лога
+    """
+    return (
+        f"{progress.operation}: файлов {progress.files_done}, {format_size(progress.bytes_done)} "
+        f"за {progress.elapsed:.1f} с, средняя скорость {format_size(progress.average_rate)}/с"
+    )
+
+
+def format_size(size: float) -> str:
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "Б" else f"{int(size)} {unit}"
+        size /= 1024
+    return f"{size:.1f} ТБ"
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+def iter_counted[T](
+        items: Iterable[T],
+        tracker: ProgressTracker,
+        size: Callable[[T], int],
+        is_file: Callable[[T], bool],
+        known_total: bool = False
+) -> Iterator[T]:
+    """
+    Отдает элементы дальше (например, членов архива в extractall) и засчитывает каждый,
+    когда его обработали и попросили следующий
+    :param size: размер элемента в байтах
+    :param is_file: засчитывается ли элемент как файл (директории не считаются)
+    :param known_total: флаг того, что элементы можно перечислить заранее и сообщить общий объем
+    """
+    if known_total:
+        items = list(items)
+        tracker.add_total(sum(size(item) for item in items), sum(map(is_file, items)))
+    for item in items:
+        yield item
+        tracker.add(bytes_done=size(item), files_done=int(is_file(item)))
@@ -0,0 +1,246 @@
+import copy
+import errno
+import os
+import tarfile
+from pathlib import Path
+
+from src.common.config import CAT_CHUNK
+from src.services.progress import ProgressReader, ProgressTracker
+
+# Ошибки lseek(SEEK_DATA), означающие, что файловая система не сообщает о дырах
+_UNSUPPORTED = frozenset({errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS})
+# Записей карты разреженного файла в заголовке GNU tar и в каждом дополнительном блоке
+_HEADER_ENTRIES = 4
+_EXTENSION_ENTRIES = 21
+# Поля TarInfo, из которых строится заголовок записи
+_HEADER_FIELDS = ("mode", "uid", "gid", "mtime", "linkname", "uname", "gname", "devmajor", "devminor")
+
+
+def is_sparse(info: os.stat_result) -> bool:
+    """
+    Проверяет по stat, что под файлом выделено меньше места, чем его размер, то есть в нем есть дыры
+    """
+    return info.st_blocks * 512 < info.st_size
+
+
+def data_regions(fd: int, size: int) -> list[tuple[int, int]] | None:
+    """
+    Находит участки файла с данными через lseek(SEEK_DATA/SEEK_HOLE), не читая сам файл
+    :param fd: дескриптор файла
+    :param size: размер файла
+    :return: участки (смещение, длина) по возрастанию; None, если файловая система не сообщает о дырах
+    """
+    if not hasattr(os, "SEEK_DATA"):
+        return None
+    regions: list[tuple[int, int]] = []
+    offset = 0
+    try:
+        while offset < size:
+            try:
+                start = os.lseek(fd, offset, os.SEEK_DATA)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    # Дальше до конца файла одна дыра
+                    break
+                raise
+            if start >= size:
+                break
+            end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+            regions.append((start, end - start))
+            offset = end
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            return None
+        raise
+    finally:
+        os.lseek(fd, 0, os.SEEK_SET)
+    return regions
+
+
+def copy_regions(
+        in_fd: int,
+        out_fd: int,
+        regions: list[tuple[int, int]],
+        size: int,
+        progress: ProgressTracker | None = None
+) -> None:
+    """
+    Копирует только участки с данными на те же смещения, остальное в копии остается дырами
+    :param size: размер файла: копия дополняется до него дырой
+    :param progress: счетчик прогресса: данные засчитываются по мере копирования, дыры - в конце
+    """
+    use_copy_file_range = hasattr(os, "copy_file_range")
+    for start, length in regions:
+        offset = start
+        end = start + length
+        while offset < end:
+            if use_copy_file_range:
+                try:
+                    copied = os.copy_file_range(in_fd, out_fd, end - offset, offset, offset)
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF):
+                        raise
+                    use_copy_file_range = False
+                    continue
+            else:
+                chunk = os.pread(in_fd, min(CAT_CHUNK, end - offset), offset)
+                copied = os.pwrite(out_fd, chunk, offset) if chunk else 0
+            if copied == 0:
+                # Файл укоротили во время копирования
+                break
+            offset += copied
+            if progress is not None:
+                progress.add(bytes_done=copied)
+    os.ftruncate(out_fd, size)
+    if progress is not None:
+        progress.add(bytes_done=size - sum(length for _, length in regions))
+
+
+def add_to_tar(tar: tarfile.TarFile, path: Path, arcname: str, progress: ProgressTracker | None = None) -> None:
+    """
+    Добавляет файл или дерево в архив как TarFile.add, но разреженные файлы записываются
+    записями GNU sparse: в архив попадают только участки с данными и их карта
+    :param tar: архив, открытый на запись
+    :param path: файл или директория
+    :param arcname: имя в архиве
+    :param progress: счетчик прогресса: засчитываются прочитанные байты и добавленные файлы
+    """
+    stack = [(str(path), arcname)]
+    while stack:
+        name, arc = stack.pop()
+        if tar.name is not None and os.path.abspath(name) == tar.name:
+            # Сам создаваемый архив в него не добавляется
+            continue
+        tarinfo = tar.gettarinfo(name, arc)
+        if tarinfo is None:
+            # Сокеты и прочие неподдерживаемые типы пропускаются, как в TarFile.add
+            continue
+        if tarinfo.isreg():
+            with open(name, "rb") as file:
+                info = os.fstat(file.fileno())
+                regions = data_regions(file.fileno(), info.st_size) if is_sparse(info) else None
+                if regions is None:
+                    tar.addfile(tarinfo, file if progress is None else ProgressReader(file, progress))
+                else:
+                    _add_sparse(tar, tarinfo, file.fileno(), regions)
+                    if progress is not None:
+                        progress.add(bytes_done=tarinfo.size)
+        elif tarinfo.isdir():
+            tar.addfile(tarinfo)
+            stack.extend(
+                (os.path.join(name, child), os.path.join(arc, child)) for child in sorted(os.listdir(name), reverse=True)
+            )
+        else:
+            tar.addfile(tarinfo)
+        if progress is not None and not tarinfo.isdir():
+            progress.add(files_done=1)
+
+
+def _add_sparse(tar: tarfile.TarFile, tarinfo: tarfile.TarInfo, fd: int, regions: list[tuple[int, int]]) -> None:
+    """
+    Записывает разреженный файл через обычный TarFile.addfile: заголовок с картой участков
+    подставляет _SparseTarInfo, а данными записи служат участки файла подряд
+    """
+    sparse = _SparseTarInfo(tarinfo.name)
+    for field in _HEADER_FIELDS:
+        setattr(sparse, field, getattr(tarinfo, field))
+    sparse.type = tarfile.GNUTYPE_SPARSE
+    sparse.size = sum(length for _, length in regions)
+    sparse.header = _sparse_header(tar, tarinfo, regions)
+    tar.addfile(sparse, _RegionReader(fd, regions, tarinfo.name))
+
+
+class _SparseTarInfo(tarfile.TarInfo):
+    """
+    Запись старого формата GNU sparse (тип S). tarfile умеет такие записи читать, но не писать,
+    поэтому заголовок строится заранее (_sparse_header) и отдается из tobuf, через который
+    его записывает TarFile.addfile. size - объем сохраненных данных, а не размер файла
+    """
+    __slots__ = ("header",)
+    header: bytes
+
+    def tobuf(
+            self,
+            format: int | None = tarfile.DEFAULT_FORMAT,
+            encoding: str | None = tarfile.ENCODING,
+            errors: str = "surrogateescape"
+    ) -> bytes:
+        return self.header
+
+
+class _RegionReader:
+    """
+    Читает участки файла с данными подряд, как будто дыр в нем нет
+    """
+    def __init__(self, fd: int, regions: list[tuple[int, int]], name: str):
+        self._fd = fd
+        self._regions = list(reversed(regions))
+        self._name = name
+
+    def read(self, size: int = -1) -> bytes:
+        chunks: list[bytes] = []
+        left = CAT_CHUNK if size < 0 else size
+        while left and self._regions:
+            start, length = self._regions[-1]
+            chunk = os.pread(self._fd, min(length, left), start)
+            if not chunk:
+                raise OSError(errno.EIO, f"Файл {self._name} укорочен во время архивации")
+            chunks.append(chunk)
+            left -= len(chunk)
+            if len(chunk) == length:
+                self._regions.pop()
+            else:
+                self._regions[-1] = (start + len(chunk), length - len(chunk))
+        return b"".join(chunks)
+
+
+def _sparse_header(tar: tarfile.TarFile, tarinfo: tarfile.TarInfo, regions: list[tuple[int, int]]) -> bytes:
+    """
+    Собирает заголовок старого формата GNU sparse (тип S): первые 4 записи карты - в самом заголовке,
+    остальные - в дополнительных блоках по 21 записи. Если файл кончается дырой, карта завершается
+    записью (размер, 0), как у GNU tar
+    """
+    real_size = tarinfo.size
+    entries = list(regions)
+    if not entries or sum(entries[-1]) < real_size:
+        entries.append((real_size, 0))
+    base = copy.copy(tarinfo)
+    base.type = tarfile.GNUTYPE_SPARSE
+    base.size = sum(length for _, length in regions)
+    buffer = bytearray(base.tobuf(tarfile.GNU_FORMAT, tar.encoding, tar.errors))
+    # Перед самим заголовком могут быть блоки длинного имени GNU
+    start = len(buffer) - tarfile.BLOCKSIZE
+    for number, entry in enumerate(entries[:_HEADER_ENTRIES]):
+        _put_entry(buffer, start + 386 + number * 24, entry)
+    extensions = entries[_HEADER_ENTRIES:]
+    buffer[start + 482] = 1 if extensions else 0
+    buffer[start + 483:start + 495] = _number_field(real_size, 12)
+    buffer[start + 148:start + 156] = b" " * 8
+    # Контрольная сумма - сумма байт блока, в котором поле самой суммы заполнено пробелами
+    checksum = sum(buffer[start:start + tarfile.BLOCKSIZE])
+    buffer[start + 148:start + 156] = b"%06o\0 " % checksum
+    for first in range(0, len(extensions), _EXTENSION_ENTRIES):
+        block = bytearray(tarfile.BLOCKSIZE)
+        for number, entry in enumerate(extensions[first:first + _EXTENSION_ENTRIES]):
+            _put_entry(block, number * 24, entry)
+        block[504] = 1 if first + _EXTENSION_ENTRIES < len(extensions) else 0
+        buffer += block
+    return bytes(buffer)
+
+
+def _put_entry(buffer: bytearray, position: int, entry: tuple[int, int]) -> None:
+    offset, length = entry
+    buffer[position:position + 12] = _number_field(offset, 12)
+    buffer[position + 12:position + 24] = _number_field(length, 12)
+
+
+def _number_field(value: int, digits: int) -> bytes:
+    """
+    Числовое поле заголовка GNU: восьмеричное число с завершающим NUL, а если не помещается -
+    двоичное big-endian с установленным старшим битом первого байта (base-256)
+    """
+    if value < 8 ** (digits - 1):
+        return b"%0*o\0" % (digits - 1, value)
+    if value >= 256 ** (digits - 1):
+        raise ValueError(f"Число {value} не помещается в поле заголовка tar")
+    return b"\x80" + value.to_bytes(digits - 1, "big")
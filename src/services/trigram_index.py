@@ -0,0 +1,290 @@
+import hashlib
+import os
+import pickle
+import re
+from array import array
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from re import _constants as sre_constants  # type: ignore[attr-defined]
+from re import _parser as sre_parser  # type: ignore[attr-defined]
+from typing import IO, Self
+
+from src.common.config import GREP_INDEX_CHUNK, GREP_INDEX_DIR
+from src.services.compressed import (
+    DECOMPRESSION_ERRORS,
+    MAGIC_SIZE,
+    compression_kind,
+    open_decompressed,
+    read_head,
+)
+
+INDEX_VERSION = 1
+
+_TRIGRAM = re.compile(b"...", flags=re.DOTALL)
+# ASCII-символы, которым при re.IGNORECASE соответствуют еще и не-ASCII символы (K, ſ, ı)
+_UNSAFE_IGNORECASE = frozenset("iksIKS")
+# Больше вариантов альтернативы не раскрывается, такая альтернатива просто не сужает поиск
+_MAX_ALTERNATIVES = 64
+
+
+class TrigramIndex:
+    """
+    Индекс триграмм дерева файлов для grep. Хранится на диске, для каждого файла
+    запоминаются относительный путь, размер и mtime, поэтому при обновлении заново
+    читаются только изменившиеся файлы. Триграммы строятся по байтам с ASCII-буквами
+    в нижнем регистре, так что индекс подходит и для поиска с -i
+    """
+    def __init__(self, root: Path):
+        self.root = root
+        self._files: list[tuple[str, int, int] | None] = []
+        self._ids: dict[str, int] = {}
+        self._postings: dict[bytes, array] = {}
+
+    @staticmethod
+    def location(root: Path) -> Path:
+        digest = hashlib.sha1(str(root.resolve()).encode("utf-8")).hexdigest()
+        return Path(GREP_INDEX_DIR).expanduser() / f"{digest}.idx"
+
+    @classmethod
+    def exists(cls, root: Path) -> bool:
+        return cls.location(root).is_file()
+
+    @classmethod
+    def load(cls, root: Path) -> Self:
+        index = cls(root)
+        location = cls.location(root)
+        if not location.is_file():
+            return index
+        try:
+            with open(location, "rb") as file:
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return index
+        if data.get("version") != INDEX_VERSION or data.get("root") != str(root.resolve()):
+            return index
+        index._files = data["files"]
+        index._postings = data["postings"]
+        index._ids = {item[0]: file_id for file_id, item in enumerate(index._files) if item is not None}
+        return index
+
+    def save(self) -> None:
+        location = self.location(self.root)
+        location.parent.mkdir(parents=True, exist_ok=True)
+        temporary = location.with_suffix(".tmp")
+        with open(temporary, "wb") as file:
+            pickle.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "root": str(self.root.resolve()),
+                    "files": self._files,
+                    "postings": self._postings,
+                },
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temporary, location)
+
+    def is_fresh(self, relative: str, size: int, mtime_ns: int) -> bool:
+        file_id = self._ids.get(relative)
+        return file_id is not None and self._files[file_id] == (relative, size, mtime_ns)
+
+    def update(self, files: Iterable[tuple[Path, os.stat_result]]) -> int:
+        """
+        Добавляет в индекс новые и изменившиеся файлы, удаляет пропавшие
+        :param files: все файлы дерева вместе с их stat
+        :return: количество заново прочитанных файлов
+        """
+        seen: set[str] = set()
+        indexed = 0
+        for path, info in files:
+            relative = str(path.relative_to(self.root))
+            seen.add(relative)
+            if self.is_fresh(relative, info.st_size, info.st_mtime_ns):
+                continue
+            self._forget(relative)
+            try:
+                trigrams = file_trigrams(path)
+            except OSError:
+                continue
+            file_id = len(self._files)
+            self._files.append((relative, info.st_size, info.st_mtime_ns))
+            self._ids[relative] = file_id
+            for trigram in trigrams:
+                posting = self._postings.get(trigram)
+                if posting is None:
+                    self._postings[trigram] = posting = array("I")
+                posting.append(file_id)
+            indexed += 1
+        for relative in set(self._ids) - seen:
+            self._forget(relative)
+        if len(self._files) > 2 * len(self._ids):
+            self._compact()
+        return indexed
+
+    def candidates(self, literals: Sequence[Sequence[bytes]]) -> set[str]:
+        """
+        Выбирает проиндексированные файлы, в которых могут быть совпадения
+        :param literals: варианты (ИЛИ) наборов строк, каждая из которых обязана быть в файле (И)
+        :return: относительные пути файлов-кандидатов
+        """
+        found: set[int] = set()
+        for group in literals:
+            ids: set[int] | None = None
+            for literal in group:
+                for trigram in {literal[i:i + 3] for i in range(len(literal) - 2)}:
+                    posting = self._postings.get(trigram, ())
+                    ids = set(posting) if ids is None else ids.intersection(posting)
+                    if not ids:
+                        break
+                if not ids:
+                    break
+            if ids:
+                found |= ids
+        return {item[0] for file_id in found if (item := self._files[file_id]) is not None}
+
+    def _forget(self, relative: str) -> None:
+        file_id = self._ids.pop(relative, None)
+        if file_id is not None:
+            self._files[file_id] = None
+
+    def _compact(self) -> None:
+        remap: dict[int, int] = {}
+        files: list[tuple[str, int, int] | None] = []
+        for file_id, item in enumerate(self._files):
+            if item is not None:
+                remap[file_id] = len(files)
+                files.append(item)
+        postings: dict[bytes, array] = {}
+        for trigram, posting in self._postings.items():
+            alive = array("I", (remap[file_id] for file_id in posting if file_id in remap))
+            if alive:
+                postings[trigram] = alive
+        self._files = files
+        self._postings = postings
+        self._ids = {item[0]: file_id for file_id, item in enumerate(files) if item is not None}
+
+
+def file_trigrams(path: Path) -> set[bytes]:
+    """
+    Читает файл блоками и собирает все его триграммы (ASCII-буквы в нижнем регистре).
+    Сжатые файлы индексируются по распакованному содержимому, как их и читает grep
+    """
+    with open(path, "rb") as file:
+        kind = compression_kind(file.read(MAGIC_SIZE))
+        file.seek(0)
+        if kind is None:
+            return _stream_trigrams(file)
+        try:
+            with open_decompressed(kind, file) as stream:
+                head = read_head(stream, GREP_INDEX_CHUNK)
+                if head is not None:
+                    return _stream_trigrams(stream, head)
+        except DECOMPRESSION_ERRORS as e:
+            raise OSError(f"Ошибка распаковки {path}: {e}") from e
+        # Как и grep, файл, который не распаковывается с самого начала, индексируется как обычный
+        file.seek(0)
+        return _stream_trigrams(file)
+
+
+def _stream_trigrams(stream: IO[bytes], head: bytes = b"") -> set[bytes]:
+    trigrams: set[bytes] = set()
+    tail = b""
+    while chunk := head or stream.read(GREP_INDEX_CHUNK):
+        head = b""
+        data = tail + chunk.lower()
+        for shift in range(3):
+            trigrams.update(_TRIGRAM.findall(data, shift))
+        tail = data[-2:]
+    return trigrams
+
+
+def required_literals(
+        patterns: Sequence[str],
+        ignore_case: bool,
+        fixed_strings: bool
+) -> list[list[bytes]] | None:
+    """
+    Находит строки, без которых совпадение невозможно
+    :param patterns: паттерны grep (совпадение с любым из них)
+    :param ignore_case: флаг игнорирования регистра
+    :param fixed_strings: флаг поиска фиксированных строк
+    :return: варианты (ИЛИ) наборов обязательных строк (И) длиной от 3 байт
+             или None, если хотя бы для одного паттерна их нет и индекс не поможет
+    """
+    groups: list[list[bytes]] = []
+    for pattern in patterns:
+        alternatives: list[list[tuple[str, bool]]]
+        if fixed_strings:
+            alternatives = [[(pattern, ignore_case)]]
+        else:
+            try:
+                parsed = sre_parser.parse(pattern, re.IGNORECASE if ignore_case else 0)
+            except re.error:
+                return None
+            alternatives = _sequence_literals(list(parsed), bool(parsed.state.flags & re.IGNORECASE))
+        for alternative in alternatives:
+            useful = [
+                encoded
+                for literal, insensitive in alternative
+                for part in _case_safe_parts(literal, insensitive)
+                if len(encoded := part.encode("utf-8").lower()) >= 3
+            ]
+            if not useful:
+                return None
+            groups.append(useful)
+    return groups
+
+
+def _case_safe_parts(literal: str, insensitive: bool) -> list[str]:
+    """
+    Части строки, которые без учета регистра совпадают только с самими собой в ASCII
+    """
+    if not insensitive:
+        return [literal]
+    if not literal.isascii():
+        return []
+    return [part for part in re.split(f"[{''.join(_UNSAFE_IGNORECASE)}]", literal) if part]
+
+
+def _sequence_literals(items: list, ignore_case: bool) -> list[list[tuple[str, bool]]]:
+    """
+    Обходит разобранное регулярное выражение и собирает его обязательные строки
+    :return: варианты (ИЛИ) наборов строк (И) с флагом регистронезависимости
+    """
+    groups: list[list[tuple[str, bool]]] = [[]]
+    run: list[str] = []
+
+    def flush() -> None:
+        if run:
+            for group in groups:
+                group.append(("".join(run), ignore_case))
+            run.clear()
+
+    def combine(alternatives: list[list[tuple[str, bool]]]) -> None:
+        nonlocal groups
+        if len(groups) * len(alternatives) <= _MAX_ALTERNATIVES:
+            groups = [group + alternative for group in groups for alternative in alternatives]
+
+    for op, value in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(value))
+            continue
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, subpattern = value
+            nested = (ignore_case or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE
+            combine(_sequence_literals(list(subpattern), nested))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT):
+            low, _, item = value
+            if low >= 1:
+                combine(_sequence_literals(list(item), ignore_case))
+        elif op is sre_constants.ATOMIC_GROUP:
+            combine(_sequence_literals(list(value), ignore_case))
+        elif op is sre_constants.BRANCH:
+            alternatives: list[list[tuple[str, bool]]] = []
+            for branch in value[1]:
+                alternatives.extend(_sequence_literals(list(branch), ignore_case))
+            if all(alternatives):
+                combine(alternatives)
+    flush()
+    return groups
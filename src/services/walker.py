@@ -0,0 +1,199 @@
+import os
+from collections.abc import Generator, Iterator, Sequence
+from contextlib import closing
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Self
+
+from src.common.config import IGNORE_FILE_NAMES, VCS_DIR_NAMES, WALK_MAX_OPEN_DIRS
+
+
+class IgnoreRules:
+    """
+    Правила из файла в стиле .gitignore: '#' - комментарий, '!' - отмена правила,
+    '/' в конце - только директории, '/' в начале или середине - путь от директории
+    файла правил, иначе шаблон сравнивается с именем на любой глубине
+    """
+    def __init__(self, base: str, lines: Sequence[str]):
+        self._base = base
+        self._rules: list[tuple[str, bool, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if line:
+                self._rules.append((line, negate, dir_only, anchored))
+
+    @classmethod
+    def load(cls, directory: str) -> Self | None:
+        lines: list[str] = []
+        for name in IGNORE_FILE_NAMES:
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8", errors="ignore") as file:
+                    lines.extend(file)
+            except OSError:
+                continue
+        rules = cls(directory, lines)
+        return rules if rules._rules else None
+
+    def match(self, path: str, is_dir: bool) -> bool | None:
+        """
+        :return: True - путь игнорируется, False - явно не игнорируется ('!'), None - правила не подошли
+        """
+        relative = os.path.relpath(path, self._base).replace(os.sep, "/")
+        name = relative.rsplit("/", 1)[-1]
+        decision = None
+        for pattern, negate, dir_only, anchored in self._rules:
+            if dir_only and not is_dir:
+                continue
+            if anchored:
+                matched = fnmatchcase(relative, pattern) or (
+                    pattern.startswith("**/") and fnmatchcase(relative, pattern[3:])
+                )
+            else:
+                matched = fnmatchcase(name, pattern)
+            if matched:
+                decision = not negate
+        return decision
+
+
+def iter_files(
+        root: Path,
+        recursive: bool = True,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        ignore_files: bool = True
+) -> Iterator[Path]:
+    """
+    Итеративно обходит директорию через os.scandir, используя закешированный тип
+    записей DirEntry, и отдает файлы по мере обхода. Глубина дерева не ограничена
+    стеком Python, в памяти - только записи директорий на текущем пути
+    :param root: корневая директория
+    :param recursive: заходить ли в поддиректории
+    :param include: шаблоны имен файлов, которые нужно обходить (если пусто - все)
+    :param exclude: шаблоны имен файлов и директорий, которые нужно пропускать
+    :param ignore_files: учитывать ли .gitignore/.ignore и пропускать ли служебные директории VCS
+    :return: пути к файлам
+    """
+    root_rules = IgnoreRules.load(str(root)) if ignore_files else None
+    stack: list[tuple[Iterator[os.DirEntry[str]], list[IgnoreRules]]] = []
+    with os.scandir(root) as entries:
+        stack.append((iter(list(entries)), [root_rules] if root_rules else []))
+    while stack:
+        entries_left, rules = stack[-1]
+        entry = next(entries_left, None)
+        if entry is None:
+            stack.pop()
+            continue
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if any(fnmatchcase(entry.name, pattern) for pattern in exclude):
+            continue
+        if ignore_files and _is_ignored(entry.path, is_dir, rules):
+            continue
+        if is_dir:
+            if not recursive or (ignore_files and entry.name in VCS_DIR_NAMES):
+                continue
+            try:
+                with os.scandir(entry.path) as children:
+                    child_entries = list(children)
+            except OSError:
+                continue
+            child_rules = IgnoreRules.load(entry.path) if ignore_files else None
+            stack.append((iter(child_entries), rules + [child_rules] if child_rules else rules))
+        elif entry.is_file():
+            if include and not any(fnmatchcase(entry.name, pattern) for pattern in include):
+                continue
+            yield Path(entry.path)
+
+
+class _DirReader:
+    """
+    Записи одной директории с просмотром на одну запись вперед. Пока глубина небольшая,
+    записи читаются из открытого os.scandir по одной, глубже - сразу в список
+    """
+    def __init__(self, path: str, depth: int):
+        self._scandir: Iterator[os.DirEntry[str]] | None = None
+        if depth < WALK_MAX_OPEN_DIRS:
+            self._scandir = os.scandir(path)
+            self._entries: Iterator[os.DirEntry[str]] = self._scandir
+        else:
+            with os.scandir(path) as entries:
+                self._entries = iter(list(entries))
+        self._next = next(self._entries, None)
+
+    def pop(self) -> tuple[os.DirEntry[str] | None, bool]:
+        """
+        :return: следующая запись (None, если записей больше нет) и признак того, что она последняя
+        """
+        entry = self._next
+        if entry is not None:
+            self._next = next(self._entries, None)
+        if self._next is None:
+            self.close()
+        return entry, self._next is None
+
+    def close(self) -> None:
+        if self._scandir is not None:
+            self._scandir.close()  # type: ignore[attr-defined]
+            self._scandir = None
+
+
+def iter_tree(root: Path, max_depth: int | None = None) -> Generator[tuple[int, os.DirEntry[str], bool]]:
+    """
+    Итеративно обходит дерево в глубину (запись, затем ее содержимое). В памяти держится
+    по одной записи на уровень текущего пути, поэтому память растет с глубиной, а не с размером дерева.
+    Директории по символическим ссылкам не обходятся, недоступные директории пропускаются
+    :param root: корневая директория
+    :param max_depth: максимальная глубина (записи корня - глубина 1), None - без ограничения
+    :return: глубина, запись, признак последней записи в своей директории
+    """
+    stack = [_DirReader(str(root), 0)]
+    try:
+        while stack:
+            entry, is_last = stack[-1].pop()
+            if entry is None:
+                stack.pop()
+                continue
+            depth = len(stack)
+            yield depth, entry, is_last
+            if entry.is_dir(follow_symlinks=False) and (max_depth is None or depth < max_depth):
+                try:
+                    stack.append(_DirReader(entry.path, depth))
+                except OSError:
+                    continue
+    finally:
+        for reader in stack:
+            reader.close()
+
+
+def iter_dirs(root: Path, max_depth: int | None = None) -> Generator[tuple[int, str]]:
+    """
+    Отдает директории дерева в прямом порядке, как их выводит ls -R: директория,
+    затем по очереди каждая поддиректория со всем ее содержимым
+    :param root: корневая директория
+    :param max_depth: максимальная глубина выводимых записей (записи корня - глубина 1)
+    :return: глубина (корень - 0) и путь директории
+    """
+    yield 0, str(root)
+    if max_depth is not None and max_depth <= 1:
+        return
+    with closing(iter_tree(root, None if max_depth is None else max_depth - 1)) as entries:
+        for depth, entry, _ in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield depth, entry.path
+
+
+def _is_ignored(path: str, is_dir: bool, rules: list[IgnoreRules]) -> bool:
+    # Правила из более глубоких директорий важнее
+    for ignore_rules in reversed(rules):
+        decision = ignore_rules.match(path, is_dir)
+        if decision is not None:
+            return decision
+    return False
@@ -1,8 +1,12 @@
+import errno
+import io
 import os.path
 import pytest
 from pyfakefs.fake_filesystem import FakeFilesystem
 from pytest_mock import MockerFixture
+from src.services import line_index, luckyos_console
 from src.services.base import OSConsoleServiceBase
+from src.services.line_index import LineIndex
 
 
 def test_cat_for_nonexisted_file(service: OSConsoleServiceBase, fs: FakeFilesystem):
@@ -60,3 +64,147 @@ def test_cat_read_error(service: OSConsoleServiceBase, fs: FakeFilesystem, mocke
 
     with pytest.raises(OSError):
         service.cat("file.txt")
+
+
+def test_cat_stream_multiple_files(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест потокового cat для нескольких файлов: байты копируются как есть, по очереди"""
+    fs.create_file("a.txt", contents="первый [b]файл[/b]\n")
+    fs.create_file("b.bin", contents=b"\x00\x01\x02" * 1000)
+    output = io.BytesIO()
+
+    copied = service.cat_stream(["a.txt", "b.bin"], output)
+
+    expected = "первый [b]файл[/b]\n".encode() + b"\x00\x01\x02" * 1000
+    assert output.getvalue() == expected
+    assert copied == len(expected)
+
+
+def test_cat_stream_copies_in_chunks(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест потокового cat без файлового дескриптора: файл читается блоками фиксированного размера"""
+    mocker.patch.object(luckyos_console, "CAT_CHUNK", 1000)
+    fs.create_file("big.txt", contents="x" * 4500)
+    output = mocker.Mock(wraps=io.BytesIO())
+
+    service.cat_stream(["big.txt"], output)
+
+    assert [len(call.args[0]) for call in output.write.call_args_list] == [1000, 1000, 1000, 1000, 500]
+
+
+def test_cat_stream_checks_all_files_first(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест потокового cat: при отсутствии одного из файлов ничего не выводится"""
+    fs.create_file("a.txt", contents="text")
+    fs.create_dir("data")
+    output = io.BytesIO()
+
+    with pytest.raises(FileNotFoundError):
+        service.cat_stream(["a.txt", "missing.txt"], output)
+    with pytest.raises(IsADirectoryError):
+        service.cat_stream(["a.txt", "data"], output)
+    assert output.getvalue() == b""
+
+
+def test_cat_stream_uses_sendfile(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест потокового cat в файл: данные копируются через os.sendfile"""
+    (tmp_path / "a.txt").write_bytes(b"a" * 100_000)
+    (tmp_path / "b.txt").write_bytes(b"b" * 10)
+    sendfile = mocker.spy(luckyos_console.os, "sendfile")
+
+    with open(tmp_path / "out.txt", "wb") as output:
+        output.write(b"head\n")
+        service.cat_stream([tmp_path / "a.txt", tmp_path / "b.txt"], output)
+
+    assert (tmp_path / "out.txt").read_bytes() == b"head\n" + b"a" * 100_000 + b"b" * 10
+    assert sendfile.call_count >= 2
+
+
+def test_cat_stream_falls_back_without_sendfile(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест потокового cat: если sendfile не поддерживается, файл копируется блоками"""
+    (tmp_path / "a.txt").write_bytes(b"data" * 1000)
+    mocker.patch.object(luckyos_console.os, "sendfile", side_effect=OSError(errno.EINVAL, "Invalid argument"))
+
+    with open(tmp_path / "out.txt", "wb") as output:
+        service.cat_stream([tmp_path / "a.txt"], output)
+
+    assert (tmp_path / "out.txt").read_bytes() == b"data" * 1000
+
+
+def make_lines(count: int) -> bytes:
+    return b"".join(f"line {number}\n".encode() for number in range(1, count + 1))
+
+
+def test_cat_lines_without_index(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест cat --lines без индекса: диапазон включительно, открытые границы"""
+    fs.create_file("file.txt", contents=make_lines(20).decode())
+
+    assert b"".join(service.cat_lines("file.txt", 3, 5)) == b"line 3\nline 4\nline 5\n"
+    assert b"".join(service.cat_lines("file.txt", 19)) == b"line 19\nline 20\n"
+    assert b"".join(service.cat_lines("file.txt", 25, 30)) == b""
+
+
+@pytest.mark.parametrize("start, end", [(0, 5), (5, 4)])
+def test_cat_lines_invalid_range(service: OSConsoleServiceBase, fs: FakeFilesystem, start: int, end: int):
+    """Тест cat --lines с некорректным диапазоном"""
+    fs.create_file("file.txt", contents="text\n")
+
+    with pytest.raises(ValueError):
+        service.cat_lines("file.txt", start, end)
+
+
+def test_cat_lines_with_index(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест cat --lines --line-index: индекс строится один раз, затем используется без флага"""
+    mocker.patch.object(line_index, "LINE_INDEX_DIR", str(tmp_path / "index"))
+    path = tmp_path / "file.txt"
+    path.write_bytes(make_lines(5000))
+
+    assert b"".join(service.cat_lines(path, 2500, 2502, index=True)) == b"line 2500\nline 2501\nline 2502\n"
+    assert LineIndex.exists(path)
+    scan = mocker.spy(LineIndex, "_scan")
+    seek_line = mocker.spy(LineIndex, "seek_line")
+
+    assert b"".join(service.cat_lines(path, 4999)) == b"line 4999\nline 5000\n"
+    assert b"".join(service.cat_lines(path, 1, 1)) == b"line 1\n"
+    assert b"".join(service.cat_lines(path, 5001)) == b""
+    scan.assert_not_called()
+    assert seek_line.call_count == 3
+
+
+def test_line_index_offsets(tmp_path, mocker: MockerFixture):
+    """Тест индекса строк: смещения каждой K-й строки, в том числе на границе блоков чтения"""
+    mocker.patch.object(line_index, "GREP_NEWLINE_CHUNK", 7)
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"a\nbb\nccc\ndddd\ne\nf\ng")
+    index = LineIndex(path, every=2)
+
+    with open(path, "rb") as file:
+        index.update(file)
+        assert index.offsets.tolist() == [0, 5, 14, 18]
+        assert index.newlines == 6
+        for line, expected in enumerate([b"a\n", b"bb\n", b"ccc\n", b"dddd\n", b"e\n", b"f\n", b"g"]):
+            assert index.seek_line(file, line)
+            assert file.readline() == expected
+        assert not index.seek_line(file, 7)
+
+
+def test_line_index_extends_when_file_grows(tmp_path, mocker: MockerFixture):
+    """Тест индекса строк: дописанный файл дочитывается с конца индекса, перезаписанный индексируется заново"""
+    mocker.patch.object(line_index, "LINE_INDEX_DIR", str(tmp_path / "index"))
+    path = tmp_path / "file.txt"
+    path.write_bytes(make_lines(10))
+    index = LineIndex(path, every=4)
+    with open(path, "rb") as file:
+        index.update(file)
+    index.save()
+    size = path.stat().st_size
+    with open(path, "ab") as file:
+        file.write(b"line 11\nline 12\n")
+
+    index = LineIndex.load(path)
+    with open(path, "rb") as file:
+        assert index.update(file) == path.stat().st_size - size
+        assert index.newlines == 12
+        assert index.offsets.tolist() == [0, len(make_lines(4)), len(make_lines(8)), len(make_lines(12))]
+
+    path.write_bytes(b"x\n" * 12)
+    with open(path, "rb") as file:
+        assert index.update(file) == 24
+        assert index.offsets.tolist() == [0, 8, 16, 24]
@@ -1,9 +1,15 @@
+import errno
 import os.path
+import shutil
+from pathlib import Path
 import pytest
 from pyfakefs.fake_filesystem import FakeFilesystem
 from pytest_mock import MockerFixture
 
+from src.services import copier
+from src.errors import PartialCopyError
 from src.services.base import OSConsoleServiceBase
+from src.services.progress import Progress, ProgressTracker, summary
 
 
 def test_cp_for_nonexisted_file(service: OSConsoleServiceBase, fs: FakeFilesystem):
@@ -23,11 +29,11 @@ def test_cp_file_to_directory(service: OSConsoleServiceBase, fs: FakeFilesystem,
     source_file = os.path.join("data", "source.txt")
     fs.create_file(source_file, contents=content)
 
-    mock_copy2 = mocker.patch("src.services.luckyos_console.shutil.copy2")
+    mock_copy_file = mocker.patch("src.services.luckyos_console.copy_file", return_value="copy_file_range")
 
-    service.cp(source_file, "dest/", False)
+    assert service.cp(source_file, "dest/", False) == {"copy_file_range": 1}
 
-    mock_copy2.assert_called_once()
+    mock_copy_file.assert_called_once_with(Path(source_file), Path("dest", "source.txt"), "auto", mocker.ANY)
 
 
 def test_cp_directory_without_recursive(service: OSConsoleServiceBase, fs: FakeFilesystem):
@@ -45,30 +51,30 @@ def test_cp_directory_with_recursive(service: OSConsoleServiceBase, fs: FakeFile
     fs.create_file(os.path.join("data", "file.txt"), contents="test")
     fs.create_dir("dest")
 
-    mock_copytree = mocker.patch("src.services.luckyos_console.shutil.copytree")
+    mock_copy_tree = mocker.patch("src.services.luckyos_console.copy_tree", return_value={"sendfile": 1})
 
-    service.cp("data", "dest/", True)
+    assert service.cp("data", "dest/", True, jobs=2) == {"sendfile": 1}
 
-    mock_copytree.assert_called_once()
+    assert mock_copy_tree.call_args.args[:4] == ("data", "dest", "auto", 2)
 
 
 def test_cp_os_error_file(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
-    """Тест cp для случая когда shutil.copy2 вызывает OSError"""
+    """Тест cp для случая когда копирование файла вызывает OSError"""
     fs.create_file("source.txt", contents="test")
     fs.create_dir("dest")
 
-    mocker.patch("src.services.luckyos_console.shutil.copy2", side_effect=OSError("Copy failed"))
+    mocker.patch("src.services.luckyos_console.copy_file", side_effect=OSError("Copy failed"))
 
     with pytest.raises(OSError):
         service.cp("source.txt", "dest/", False)
 
 
 def test_cp_os_error_directory(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
-    """Тест cp для случая когда shutil.copytree вызывает OSError"""
+    """Тест cp для случая когда обход дерева вызывает OSError"""
     fs.create_dir("data")
     fs.create_dir("dest")
 
-    mocker.patch("src.services.luckyos_console.shutil.copytree", side_effect=OSError("Copy failed"))
+    mocker.patch("src.services.luckyos_console.copy_tree", side_effect=OSError("Copy failed"))
 
     with pytest.raises(OSError):
         service.cp("data", "dest/", True)
@@ -88,3 +94,385 @@ def test_cp_recursive_not_directory(service: OSConsoleServiceBase, fs: FakeFiles
 
     with pytest.raises(IsADirectoryError):
         service.cp("source.txt", "dest/", True)
+
+
+def test_cp_copies_data_and_metadata(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp: содержимое, права и время изменения копируются, способ копирования сообщается"""
+    source = tmp_path / "source.bin"
+    source.write_bytes(os.urandom(300_000))
+    source.chmod(0o640)
+    os.utime(source, ns=(1_000_000_000, 2_000_000_000))
+
+    methods = service.cp(source, tmp_path / "copy.bin", False)
+
+    copy = tmp_path / "copy.bin"
+    assert copy.read_bytes() == source.read_bytes()
+    assert copy.stat().st_mode == source.stat().st_mode
+    assert copy.stat().st_mtime_ns == 2_000_000_000
+    assert list(methods.values()) == [1]
+    assert set(methods) <= set(copier.COPY_METHODS)
+
+
+def test_cp_recursive_reports_methods(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp -r: файлы дерева копируются движком, способы суммируются"""
+    (tmp_path / "data" / "sub").mkdir(parents=True)
+    (tmp_path / "data" / "a.txt").write_text("a")
+    (tmp_path / "data" / "sub" / "b.txt").write_text("b")
+
+    methods = service.cp(tmp_path / "data", tmp_path / "dest", True, reflink="never")
+
+    assert (tmp_path / "dest" / "sub" / "b.txt").read_text() == "b"
+    assert sum(methods.values()) == 2
+    assert "reflink" not in methods
+
+
+@pytest.mark.parametrize(
+    "failing, expected",
+    [(["ioctl"], "copy_file_range"), (["ioctl", "copy_file_range"], "sendfile"),
+     (["ioctl", "copy_file_range", "sendfile"], "read/write")]
+)
+def test_copy_file_falls_back(tmp_path, mocker: MockerFixture, failing: list[str], expected: str):
+    """Тест движка копирования: неподдерживаемые способы пропускаются по очереди"""
+    source = tmp_path / "source.txt"
+    source.write_bytes(b"data" * 10_000)
+    unsupported = OSError(errno.EXDEV, "Invalid cross-device link")
+    if "ioctl" in failing:
+        mocker.patch.object(copier.fcntl, "ioctl", side_effect=OSError(errno.EOPNOTSUPP, "Operation not supported"))
+    if "copy_file_range" in failing:
+        mocker.patch.object(copier.os, "copy_file_range", side_effect=unsupported)
+    if "sendfile" in failing:
+        mocker.patch.object(copier.os, "sendfile", side_effect=OSError(errno.EINVAL, "Invalid argument"))
+
+    assert copier.copy_file(source, tmp_path / "copy.txt") == expected
+    assert (tmp_path / "copy.txt").read_bytes() == b"data" * 10_000
+
+
+def test_copy_file_reflink_modes(tmp_path, mocker: MockerFixture):
+    """Тест --reflink: always без поддержки клонов - ошибка, never - клонирование не пробуется"""
+    source = tmp_path / "source.txt"
+    source.write_text("data")
+    ioctl = mocker.patch.object(copier.fcntl, "ioctl", side_effect=OSError(errno.EOPNOTSUPP, "Operation not supported"))
+
+    with pytest.raises(OSError):
+        copier.copy_file(source, tmp_path / "copy.txt", reflink="always")
+    assert not (tmp_path / "copy.txt").exists()
+    ioctl.reset_mock()
+    assert copier.copy_file(source, tmp_path / "copy.txt", reflink="never") != "reflink"
+    ioctl.assert_not_called()
+    ioctl.side_effect = None
+    assert copier.copy_file(source, tmp_path / "clone.txt", reflink="always") == "reflink"
+    assert ioctl.call_args.args[1] == copier.FICLONE
+
+
+def test_cp_invalid_reflink_and_same_file(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp: неизвестный режим --reflink и копирование файла в самого себя"""
+    source = tmp_path / "source.txt"
+    source.write_text("data")
+
+    with pytest.raises(ValueError):
+        service.cp(source, tmp_path / "copy.txt", False, reflink="sometimes")
+    with pytest.raises(OSError):
+        service.cp(source, tmp_path, False)
+    assert source.read_text() == "data"
+
+
+def make_tree(root: Path) -> None:
+    for number in range(150):
+        path = root / f"dir{number % 3}" / f"sub{number % 2}" / f"file{number}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"content {number}")
+    (root / "link.txt").symlink_to("dir0/sub0/file0.txt")
+
+
+def test_cp_recursive_parallel(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест cp -r --jobs: файлы копируются пачками на пуле, ссылки остаются ссылками"""
+    make_tree(tmp_path / "data")
+    copy_batch = mocker.spy(copier, "_copy_batch")
+
+    methods = service.cp(tmp_path / "data", tmp_path / "dest", True, jobs=4)
+
+    for number in range(150):
+        relative = Path(f"dir{number % 3}", f"sub{number % 2}", f"file{number}.txt")
+        assert (tmp_path / "dest" / relative).read_text() == f"content {number}"
+    assert os.readlink(tmp_path / "dest" / "link.txt") == "dir0/sub0/file0.txt"
+    assert sum(methods.values()) == 151
+    assert methods["symlink"] == 1
+    assert copy_batch.call_count > 1
+
+
+def test_cp_recursive_fixes_directory_metadata(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp -r: права и mtime директорий переносятся после копирования файлов"""
+    make_tree(tmp_path / "data")
+    readonly = tmp_path / "data" / "dir1"
+    os.utime(readonly, ns=(1_000_000_000, 3_000_000_000))
+    readonly.chmod(0o555)
+    try:
+        service.cp(tmp_path / "data", tmp_path / "dest", True, jobs=2)
+    finally:
+        readonly.chmod(0o755)
+
+    copied = tmp_path / "dest" / "dir1"
+    assert copied.stat().st_mode & 0o777 == 0o555
+    assert copied.stat().st_mtime_ns == 3_000_000_000
+    assert (copied / "sub1" / "file1.txt").read_text() == "content 1"
+    copied.chmod(0o755)
+
+
+def test_cp_recursive_collects_errors(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест cp -r: ошибка одного файла не останавливает копирование остальных"""
+    make_tree(tmp_path / "data")
+    copy_file = copier.copy_file
+
+    def fail_for_seven(source: Path, destination: Path, reflink: str, progress=None) -> str:
+        if source.name == "file7.txt":
+            raise PermissionError(13, "Permission denied", str(source))
+        return copy_file(source, destination, reflink, progress)
+
+    mocker.patch.object(copier, "copy_file", side_effect=fail_for_seven)
+
+    with pytest.raises(PartialCopyError) as error:
+        service.cp(tmp_path / "data", tmp_path / "dest", True, jobs=3)
+
+    assert [Path(path).name for path, _ in error.value.errors] == ["file7.txt"]
+    assert (tmp_path / "dest" / "dir2" / "sub0" / "file8.txt").exists()
+    assert not (tmp_path / "dest" / "dir1" / "sub1" / "file7.txt").exists()
+
+
+def test_cp_recursive_reports_fifo(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp -r: именованный канал не копируется и попадает в ошибки, остальные файлы копируются"""
+    make_tree(tmp_path / "data")
+    os.mkfifo(tmp_path / "data" / "pipe")
+
+    with pytest.raises(PartialCopyError) as error:
+        service.cp(tmp_path / "data", tmp_path / "dest", True, jobs=2)
+
+    assert [(Path(path).name, type(e)) for path, e in error.value.errors] == [("pipe", shutil.SpecialFileError)]
+    assert not (tmp_path / "dest" / "pipe").exists()
+    assert (tmp_path / "dest" / "dir2" / "sub0" / "file8.txt").exists()
+
+
+def test_cp_fifo_error(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp: копирование именованного канала - ошибка, а не ожидание писателя"""
+    os.mkfifo(tmp_path / "pipe")
+
+    with pytest.raises(OSError):
+        service.cp(tmp_path / "pipe", tmp_path / "copy", False)
+
+    assert not (tmp_path / "copy").exists()
+
+
+def test_cp_recursive_into_itself(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp -r: копирование директории внутрь самой себя запрещено"""
+    (tmp_path / "data").mkdir()
+
+    with pytest.raises(OSError):
+        service.cp(tmp_path / "data", tmp_path / "data" / "copy", True)
+
+
+def test_cp_delete_into_parent_forbidden(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp -r --delete: копирование в директорию, содержащую источник, запрещено и ничего не удаляет"""
+    make_tree(tmp_path / "data")
+
+    with pytest.raises(OSError):
+        service.cp(tmp_path / "data" / "dir0", tmp_path / "data", True, delete=True)
+
+    assert (tmp_path / "data" / "dir0" / "sub0" / "file0.txt").exists()
+    assert (tmp_path / "data" / "dir1").exists()
+
+
+def test_cp_update_skips_unchanged(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест cp -r --update: повторное копирование без изменений не читает и не пишет данные"""
+    make_tree(tmp_path / "data")
+    service.cp(tmp_path / "data", tmp_path / "dest", True)
+    (tmp_path / "data" / "dir0" / "sub0" / "file0.txt").write_text("changed")
+    copy_file = mocker.spy(copier, "copy_file")
+
+    methods = service.cp(tmp_path / "data", tmp_path / "dest", True, compare="update")
+
+    assert methods["unchanged"] == 150
+    assert sum(methods.values()) == 151
+    assert copy_file.call_count == 1
+    assert (tmp_path / "dest" / "dir0" / "sub0" / "file0.txt").read_text() == "changed"
+
+
+def test_cp_checksum_compares_content(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест cp --checksum: файл с другим mtime, но тем же содержимым не копируется, измененный - копируется"""
+    mocker.patch.object(copier, "CP_COMPARE_BLOCK", 4)
+    source = tmp_path / "source.txt"
+    source.write_text("same content")
+    service.cp(source, tmp_path / "copy.txt", False)
+    os.utime(source, ns=(5_000_000_000, 5_000_000_000))
+
+    assert service.cp(source, tmp_path / "copy.txt", False, compare="checksum") == {"unchanged": 1}
+    assert (tmp_path / "copy.txt").stat().st_mtime_ns == 5_000_000_000
+
+    source.write_text("same contenT")
+    os.utime(source, ns=(5_000_000_000, 5_000_000_000))
+    assert service.cp(source, tmp_path / "copy.txt", False, compare="update") == {"unchanged": 1}
+    assert "unchanged" not in service.cp(source, tmp_path / "copy.txt", False, compare="checksum")
+    assert (tmp_path / "copy.txt").read_text() == "same contenT"
+
+
+def test_cp_delete_removes_extra(service: OSConsoleServiceBase, tmp_path):
+    """Тест cp -r --delete: файлы и директории, которых нет в источнике, удаляются из назначения"""
+    make_tree(tmp_path / "data")
+    service.cp(tmp_path / "data", tmp_path / "dest", True)
+    (tmp_path / "dest" / "extra.txt").write_text("extra")
+    (tmp_path / "dest" / "dir1" / "old" / "deep").mkdir(parents=True)
+    (tmp_path / "data" / "dir2" / "sub1" / "file5.txt").unlink()
+
+    methods = service.cp(tmp_path / "data", tmp_path / "dest", True, compare="update", delete=True)
+
+    assert methods["deleted"] == 3
+    assert not (tmp_path / "dest" / "extra.txt").exists()
+    assert not (tmp_path / "dest" / "dir1" / "old").exists()
+    assert not (tmp_path / "dest" / "dir2" / "sub1" / "file5.txt").exists()
+    assert (tmp_path / "dest" / "dir2" / "sub1" / "file11.txt").exists()
+
+
+@pytest.mark.parametrize("options", [{"compare": "mtime"}, {"delete": True}, {"jobs": 0}])
+def test_cp_invalid_options(service: OSConsoleServiceBase, fs: FakeFilesystem, options: dict):
+    """Тест cp с некорректными параметрами"""
+    fs.create_file("source.txt", contents="test")
+
+    with pytest.raises(ValueError):
+        service.cp("source.txt", "copy.txt", False, **options)
+
+
+def interrupt_after(mocker: MockerFixture, checkpoints: int) -> None:
+    """Прерывает cp --resume после сохранения заданного числа контрольных точек (блоки по 100 байт)"""
+    mocker.stopall()
+    mocker.patch.object(copier, "CP_RESUME_BLOCK", 100)
+    mocker.patch.object(copier, "CP_RESUME_SYNC_BLOCKS", 2)
+    save_checkpoint = copier._save_checkpoint
+    calls = []
+
+    def save_and_interrupt(*args):
+        save_checkpoint(*args)
+        calls.append(args)
+        if len(calls) == checkpoints:
+            raise KeyboardInterrupt
+
+    mocker.patch.object(copier, "_save_checkpoint", side_effect=save_and_interrupt)
+
+
+def continue_copy(mocker: MockerFixture) -> None:
+    mocker.stopall()
+    mocker.patch.object(copier, "CP_RESUME_BLOCK", 100)
+
+
+def test_cp_resume_continues_from_checkpoint(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест cp --resume: прерванная копия продолжается с контрольной точки и атомарно переименовывается"""
+    source = tmp_path / "image.bin"
+    source.write_bytes(os.urandom(1050))
+    interrupt_after(mocker, 2)
+
+    with pytest.raises(KeyboardInterrupt):
+        service.cp(source, tmp_path / "copy.bin", False, resume=True)
+
+    temporary, checkpoint = copier.partial_paths(tmp_path / "copy.bin")
+    assert not (tmp_path / "copy.bin").exists()
+    assert temporary.stat().st_size == 400
+    continue_copy(mocker)
+    block_hash = mocker.spy(copier, "_block_hash")
+
+    assert service.cp(source, tmp_path / "copy.bin", False, resume=True) == {"resumed": 1}
+
+    assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+    assert not temporary.exists() and not checkpoint.exists()
+    # Один проверенный блок временного файла и 7 оставшихся блоков источника
+    assert block_hash.call_count == 8
+
+
+def test_cp_resume_rejects_bad_blocks(tmp_path, mocker: MockerFixture):
+    """Тест cp --resume: испорченный хвост временного файла копируется заново, измененный источник - целиком"""
+    source = tmp_path / "image.bin"
+    source.write_bytes(os.urandom(1000))
+    interrupt_after(mocker, 3)
+    with pytest.raises(KeyboardInterrupt):
+        copier.copy_file_resumable(source, tmp_path / "copy.bin")
+    temporary, _ = copier.partial_paths(tmp_path / "copy.bin")
+    with open(temporary, "r+b") as file:
+        file.seek(550)
+        file.write(b"corrupted")
+    continue_copy(mocker)
+    block_hash = mocker.spy(copier, "_block_hash")
+
+    assert copier.copy_file_resumable(source, tmp_path / "copy.bin") == "resumed"
+    assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+    # Проверены 6-й (испорчен) и 5-й блоки, заново скопированы блоки с 6-го по 10-й
+    assert block_hash.call_count == 2 + 5
+
+    interrupt_after(mocker, 1)
+    with pytest.raises(KeyboardInterrupt):
+        copier.copy_file_resumable(source, tmp_path / "second.bin")
+    source.write_bytes(os.urandom(1000))
+    continue_copy(mocker)
+    assert copier.copy_file_resumable(source, tmp_path / "second.bin") == "read/write"
+    assert (tmp_path / "second.bin").read_bytes() == source.read_bytes()
+
+
+def make_sparse(path: Path, size: int, chunks: dict[int, bytes]) -> None:
+    with open(path, "wb") as file:
+        for offset, data in chunks.items():
+            file.seek(offset)
+            file.write(data)
+        file.truncate(size)
+
+
+def test_cp_keeps_holes(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест cp разреженного файла: копируются только участки с данными, дыры остаются дырами"""
+    source = tmp_path / "disk.img"
+    make_sparse(source, 64 * 1024 * 1024, {0: b"boot" * 1024, 32 * 1024 * 1024: b"data" * 4096})
+    if not copier.is_sparse(source.stat()):
+        pytest.skip("Файловая система не поддерживает разреженные файлы")
+    copy_regions = mocker.spy(copier, "copy_regions")
+
+    assert service.cp(source, tmp_path / "copy.img", False, reflink="never") == {"sparse": 1}
+
+    copy = tmp_path / "copy.img"
+    assert copy.read_bytes() == source.read_bytes()
+    assert copy.stat().st_blocks <= source.stat().st_blocks
+    regions = copy_regions.call_args.args[2]
+    assert sum(length for _, length in regions) < 1024 * 1024
+
+
+def test_cp_recursive_reports_progress(service: OSConsoleServiceBase, logger, tmp_path, mocker: MockerFixture):
+    """Тест cp -r: обработчик получает прогресс по байтам и файлам, итог пишется в лог"""
+    make_tree(tmp_path / "data")
+    mocker.patch("src.services.progress.PROGRESS_INTERVAL", 0)
+    reports: list[Progress] = []
+    service.set_progress_callback(reports.append)
+
+    service.cp(tmp_path / "data", tmp_path / "dest", True, jobs=3)
+
+    size = sum(path.stat().st_size for path in (tmp_path / "data").rglob("*.txt") if not path.is_symlink())
+    final = reports[-1]
+    assert final.finished and not any(report.finished for report in reports[:-1])
+    assert (final.bytes_done, final.bytes_total) == (size, size)
+    assert (final.files_done, final.files_total) == (151, 151)
+    assert [report.bytes_done for report in reports] == sorted(report.bytes_done for report in reports)
+    logger.info.assert_any_call(summary(final))
+
+
+def test_progress_tracker_rates(mocker: MockerFixture):
+    """Тест счетчика прогресса: мгновенная скорость - за последние PROGRESS_WINDOW секунд, средняя - с начала"""
+    clock = [100.0]
+    mocker.patch("src.services.progress.time.monotonic", side_effect=lambda: clock[0])
+    reports: list[Progress] = []
+    tracker = ProgressTracker("cp", reports.append, bytes_total=10000, files_total=2)
+
+    clock[0] = 101.0
+    tracker.add(bytes_done=1000)
+    clock[0] = 104.0
+    tracker.add(bytes_done=6000, files_done=1)
+    clock[0] = 104.1
+    tracker.add(bytes_done=3000, files_done=1)
+    final = tracker.finish()
+
+    assert reports[0].rate == 1000
+    assert reports[1].rate == 2000 and reports[1].average_rate == 1750
+    assert reports[0].eta == 9 and reports[1].eta == 1.5
+    assert len(reports) == 3 and reports[-1] is final
+    assert (final.bytes_done, final.files_done, final.finished, final.eta) == (10000, 2, True, 0)
+    assert summary(final) == "cp: файлов 2, 9.8 КБ за 4.1 с, средняя скорость 2.4 КБ/с"
@@ -0,0 +1,119 @@
+import os.path
+import pytest
+from pytest_mock import MockerFixture
+from pyfakefs.fake_filesystem import FakeFilesystem
+from src.services import disk_usage
+from src.services.base import OSConsoleServiceBase
+
+
+def make_tree(fs: FakeFilesystem) -> None:
+    fs.create_file(os.path.join("data", "a.txt"), contents="a" * 100)
+    fs.create_file(os.path.join("data", "sub", "b.txt"), contents="b" * 5000)
+    fs.create_file(os.path.join("data", "sub", "deep", "c.txt"), contents="c" * 10)
+
+
+def directory_size(path: str) -> int:
+    return os.lstat(path).st_size
+
+
+def test_du_for_nonexisted_path(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест du для несуществующего пути"""
+    with pytest.raises(FileNotFoundError):
+        service.du("nonexistent")
+
+
+def test_du_directory_totals(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест du: итоги поддиректорий перед родителем, каждая директория читается одной задачей"""
+    make_tree(fs)
+    scan = mocker.spy(disk_usage, "scan_directory")
+    deep = os.path.join("data", "sub", "deep")
+    sub = os.path.join("data", "sub")
+
+    result = service.du("data")
+
+    assert [row[0] for row in result] == [deep, sub, "data"]
+    deep_size = directory_size(deep) + 10
+    sub_size = deep_size + directory_size(sub) + 5000
+    assert [row[1] for row in result] == [deep_size, sub_size, sub_size + directory_size("data") + 100]
+    assert result[-1][2] == sum(
+        os.lstat(name).st_blocks * 512
+        for name in ["data", sub, deep, os.path.join("data", "a.txt"),
+                     os.path.join(sub, "b.txt"), os.path.join(deep, "c.txt")]
+    )
+    assert sorted(call.args[0] for call in scan.call_args_list) == ["data", sub, deep]
+
+
+def test_du_counts_hard_links_once(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест du: файл с несколькими жесткими ссылками учитывается один раз"""
+    make_tree(fs)
+    before = service.du("data", summarize=True)[0][1]
+    os.link(os.path.join("data", "sub", "b.txt"), os.path.join("data", "b-link.txt"))
+    os.link(os.path.join("data", "sub", "b.txt"), os.path.join("data", "sub", "deep", "b-link.txt"))
+
+    result = service.du("data")
+
+    assert result[-1][1] == before
+    assert result[0] == [os.path.join("data", "sub", "deep"), directory_size(os.path.join("data", "sub", "deep")) + 10,
+                         result[0][2]]
+
+
+def test_du_max_depth_and_summarize(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест du --max-depth и --summarize: глубже выводимых директорий размеры все равно учитываются"""
+    make_tree(fs)
+    full = service.du("data")
+
+    assert service.du("data", max_depth=1) == [full[1], full[2]]
+    assert service.du("data", max_depth=0) == [full[2]]
+    assert service.du("data", summarize=True) == [full[2]]
+
+
+def test_du_for_file(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест du для файла"""
+    fs.create_file("file.txt", contents="x" * 42)
+
+    assert service.du("file.txt") == [["file.txt", 42, os.lstat("file.txt").st_blocks * 512]]
+
+
+def test_du_skips_unreadable_subdirectory(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест du: недоступная поддиректория пропускается, остальное дерево считается"""
+    make_tree(fs)
+    scan_directory = disk_usage.scan_directory
+
+    def fail_for_deep(path: str) -> disk_usage.DirUsage:
+        if path.endswith("deep"):
+            raise PermissionError(path)
+        return scan_directory(path)
+
+    mocker.patch.object(disk_usage, "scan_directory", side_effect=fail_for_deep)
+
+    result = service.du("data")
+
+    assert [row[0] for row in result] == [os.path.join("data", "sub"), "data"]
+
+
+def test_du_bounds_running_directories(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест du: в работе одновременно не больше 2 * jobs директорий, даже если дерево широкое"""
+    for number in range(100):
+        fs.create_file(os.path.join("data", f"dir{number}", "file.txt"), contents="x")
+    wait = disk_usage.wait
+    running: list[int] = []
+
+    def record(futures, **kwargs):
+        running.append(len(futures))
+        return wait(futures, **kwargs)
+
+    mocker.patch.object(disk_usage, "wait", side_effect=record)
+
+    result = service.du("data", jobs=2)
+
+    assert len(result) == 101
+    assert max(running) <= 4
+
+
+@pytest.mark.parametrize("options", [{"jobs": 0}, {"max_depth": -1}, {"summarize": True, "max_depth": 1}])
+def test_du_invalid_options(service: OSConsoleServiceBase, fs: FakeFilesystem, options: dict):
+    """Тест du с некорректными параметрами"""
+    fs.create_dir("data")
+
+    with pytest.raises(ValueError):
+        service.du("data", **options)
@@ -0,0 +1,152 @@
+import os.path
+import time
+import pytest
+from pytest_mock import MockerFixture
+from pyfakefs.fake_filesystem import FakeFilesystem
+from src.services import finder
+from src.services.base import OSConsoleServiceBase
+from src.services.finder import FindQuery, parse_mtime, parse_size
+
+
+def make_tree(fs: FakeFilesystem) -> None:
+    fs.create_file(os.path.join("data", "app.log"), contents="x" * 2000)
+    fs.create_file(os.path.join("data", "README.md"), contents="readme")
+    fs.create_file(os.path.join("data", "logs", "old.LOG"), contents="x" * 10)
+    fs.create_file(os.path.join("data", "logs", "deep", "new.log"), contents="")
+    fs.create_symlink(os.path.join("data", "link.log"), os.path.join("data", "app.log"))
+    day_ago = time.time() - 3 * 86400
+    os.utime(os.path.join("data", "logs", "old.LOG"), (day_ago, day_ago))
+
+
+def test_find_for_nonexisted_path(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест find для несуществующего пути"""
+    with pytest.raises(FileNotFoundError):
+        service.find("nonexistent")
+
+
+def test_find_all(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест find без условий: сам путь и все записи дерева"""
+    make_tree(fs)
+
+    result = service.find("data", jobs=2)
+
+    assert sorted(result) == sorted([
+        "data",
+        os.path.join("data", "app.log"),
+        os.path.join("data", "README.md"),
+        os.path.join("data", "link.log"),
+        os.path.join("data", "logs"),
+        os.path.join("data", "logs", "old.LOG"),
+        os.path.join("data", "logs", "deep"),
+        os.path.join("data", "logs", "deep", "new.log"),
+    ])
+
+
+def test_find_name_and_type(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест find -name, -iname и -type"""
+    make_tree(fs)
+
+    assert sorted(service.find("data", name="*.log")) == sorted([
+        os.path.join("data", "app.log"),
+        os.path.join("data", "link.log"),
+        os.path.join("data", "logs", "deep", "new.log"),
+    ])
+    assert len(service.find("data", iname="*.log")) == 4
+    assert sorted(service.find("data", name="*.log", file_type="f")) == sorted([
+        os.path.join("data", "app.log"),
+        os.path.join("data", "logs", "deep", "new.log"),
+    ])
+    assert service.find("data", file_type="l") == [os.path.join("data", "link.log")]
+    assert sorted(service.find("data", file_type="d")) == sorted([
+        "data", os.path.join("data", "logs"), os.path.join("data", "logs", "deep")
+    ])
+
+
+def test_find_size_and_mtime(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест find -size и -mtime"""
+    make_tree(fs)
+
+    assert service.find("data", size="+1k", file_type="f") == [os.path.join("data", "app.log")]
+    assert service.find("data", size="0", file_type="f") == [os.path.join("data", "logs", "deep", "new.log")]
+    assert service.find("data", size="-1", file_type="f") == [os.path.join("data", "logs", "deep", "new.log")]
+    assert service.find("data", size="6c") == [os.path.join("data", "README.md")]
+    assert service.find("data", mtime="+2") == [os.path.join("data", "logs", "old.LOG")]
+    assert service.find("data", mtime="3") == [os.path.join("data", "logs", "old.LOG")]
+    assert os.path.join("data", "logs", "old.LOG") not in service.find("data", mtime="-1")
+
+
+def test_find_max_depth(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест find -maxdepth: глубже заданной глубины директории не читаются"""
+    make_tree(fs)
+    scan = mocker.spy(finder, "scan_directory")
+
+    assert service.find("data", max_depth=0) == ["data"]
+    assert sorted(service.find("data", max_depth=2, name="*.log")) == sorted([
+        os.path.join("data", "app.log"), os.path.join("data", "link.log")
+    ])
+    assert sorted(call.args[0] for call in scan.call_args_list) == ["data", os.path.join("data", "logs")]
+
+
+def test_find_checks_name_before_stat(mocker: MockerFixture):
+    """Тест find: условия по имени и типу проверяются до stat, stat - только для -size и -mtime"""
+    entry = mocker.Mock(spec=os.DirEntry)
+    entry.name = "app.log"
+    entry.is_file.return_value = True
+    entry.stat.return_value = mocker.Mock(st_size=100, st_mtime=time.time())
+    now = time.time()
+
+    assert not finder.entry_matches(entry, FindQuery(name="*.txt", size=parse_size("+1c")), now)
+    assert finder.entry_matches(entry, FindQuery(name="*.log", file_type="f"), now)
+    entry.stat.assert_not_called()
+    assert finder.entry_matches(entry, FindQuery(name="*.log", size=parse_size("100c")), now)
+    entry.stat.assert_called_once_with(follow_symlinks=False)
+
+
+def test_iter_find_stops_early(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест iter_find: результаты отдаются по мере обхода, недочитанный поиск не обходит остальное дерево"""
+    for number in range(50):
+        fs.create_file(os.path.join("data", f"dir{number}", "file.txt"))
+    scan = mocker.spy(finder, "scan_directory")
+
+    results = service.iter_find("data", name="file.txt", jobs=1)
+    first = next(results)
+    results.close()
+
+    assert first.endswith("file.txt")
+    assert scan.call_count < 10
+
+
+def test_find_skips_unreadable_subdirectory(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест find: недоступная поддиректория пропускается"""
+    make_tree(fs)
+    scan_directory = finder.scan_directory
+
+    def fail_for_logs(path: str, *args):
+        if path.endswith("logs"):
+            raise PermissionError(path)
+        return scan_directory(path, *args)
+
+    mocker.patch.object(finder, "scan_directory", side_effect=fail_for_logs)
+
+    assert sorted(service.find("data", file_type="f")) == sorted([
+        os.path.join("data", "app.log"), os.path.join("data", "README.md")
+    ])
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"size": "10x"}, {"size": "big"}, {"mtime": "1k"}, {"file_type": "s"}, {"max_depth": -1}, {"jobs": 0}]
+)
+def test_find_invalid_options(service: OSConsoleServiceBase, fs: FakeFilesystem, options: dict):
+    """Тест find с некорректными условиями"""
+    fs.create_dir("data")
+
+    with pytest.raises(ValueError):
+        service.find("data", **options)
+
+
+def test_parse_size_units():
+    """Тест разбора -size: единицы как в find"""
+    assert parse_size("+10k") == finder.Comparison("+", 10, 1024)
+    assert parse_size("3") == finder.Comparison("", 3, 512)
+    assert parse_mtime("-2") == finder.Comparison("-", 2)
@@ -1,8 +1,19 @@
+import bz2
+import gzip
+import lzma
+import sys
+import io
+import tarfile
+import zipfile
 import os.path
 import pytest
 from pytest_mock import MockerFixture
 from pyfakefs.fake_filesystem import FakeFilesystem
+from src.services import grep_cache, luckyos_console, trigram_index
 from src.services.base import OSConsoleServiceBase
+from src.services.grep_result import GrepResult
+from src.services.matchers import BytesLiteralMatcher, LiteralMatcher, build_matchers, compile_bytes_pattern
+from src.services.trigram_index import required_literals
 
 
 def test_grep_for_nonexisted_path(service: OSConsoleServiceBase, fs: FakeFilesystem):
@@ -88,3 +99,532 @@ def test_grep_os_error_reading_file(service: OSConsoleServiceBase, fs: FakeFiles
 
     with pytest.raises(OSError):
         service.grep("pattern", file_path, False, False)
+
+
+def test_grep_jobs_matches_serial(service: OSConsoleServiceBase, tmp_path):
+    """Тест grep --jobs: результаты совпадают с последовательным поиском"""
+    for number in range(6):
+        subdir = tmp_path / f"dir{number % 2}"
+        subdir.mkdir(exist_ok=True)
+        (subdir / f"file{number}.txt").write_text(f"pattern {number}\nnone\npattern again\n")
+
+    serial = service.grep("pattern", tmp_path, True, False)
+    parallel = service.grep("pattern", tmp_path, True, False, jobs=2)
+
+    assert len(serial) == 12
+    assert parallel == serial
+
+
+def test_grep_invalid_jobs(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep с неположительным числом процессов"""
+    fs.create_file("file.txt", contents="pattern")
+
+    with pytest.raises(ValueError):
+        service.grep("pattern", "file.txt", False, False, jobs=0)
+
+
+def test_iter_grep_is_lazy(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест iter_grep: совпадения отдаются до того, как прочитаны остальные файлы"""
+    fs.create_dir("data")
+    fs.create_file(os.path.join("data", "a.txt"), contents="pattern a")
+    fs.create_file(os.path.join("data", "b.txt"), contents="pattern b")
+    spy_scan = mocker.spy(luckyos_console, "_iter_grep_file")
+
+    matches = service.iter_grep("pattern", "data", False, False)
+    first = next(matches)
+
+    assert first[2] == "pattern"
+    assert spy_scan.call_count == 1
+    assert len(list(matches)) == 1
+
+
+def test_grep_mmap_matches_text_path(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест grep: поиск через mmap дает те же результаты, что и построчный"""
+    file_path = tmp_path / "big.log"
+    file_path.write_text("".join(f"line {n} id=req-{n:04d} ёжик\n" for n in range(500)), encoding="utf-8")
+    expected = service.grep(r"req-00[0-9]+", file_path, False, False)
+    spy_buffer = mocker.spy(luckyos_console, "_iter_buffer_hits")
+    mocker.patch("src.services.luckyos_console.GREP_MMAP_THRESHOLD", 1)
+    mocker.patch("src.services.luckyos_console.GREP_NEWLINE_CHUNK", 64)
+
+    result = service.grep(r"req-00[0-9]+", file_path, False, False)
+
+    assert spy_buffer.call_count == 1
+    assert len(result) == 100
+    assert result == expected
+
+
+@pytest.mark.parametrize("pattern, ignore_case", [
+    ("a.b", False),
+    (r"\w+", False),
+    ("[^a]", False),
+    ("(?i)abc", False),
+    ("абв", False),
+    ("abc", True),
+])
+def test_compile_bytes_pattern_falls_back_to_text(pattern: str, ignore_case: bool):
+    """Тест: паттерны, зависящие от Unicode или перевода строки, ищутся как текст"""
+    assert compile_bytes_pattern(pattern, ignore_case) is None
+
+
+def test_compile_bytes_pattern_for_simple_pattern():
+    """Тест: простой ASCII-паттерн компилируется в байтовый"""
+    bytes_pattern = compile_bytes_pattern(r"^error: [0-9]+\.", False)
+
+    assert bytes_pattern is not None
+    assert bytes_pattern.findall(b"ok\nerror: 42. done") == [b"error: 42."]
+
+
+def test_grep_fixed_strings(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -F: метасимволы ищутся как обычные символы"""
+    fs.create_file("file.txt", contents="a.b a+b\naxb")
+
+    result = service.grep("a.b", "file.txt", False, False, fixed_strings=True)
+
+    assert [row[2] for row in result] == ["a.b"]
+
+
+def test_grep_multiple_fixed_strings(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -F -e ... -e ...: самые левые и самые длинные вхождения без пересечений"""
+    fs.create_file("file.txt", contents="id=req-1 id=req-12\nerror E42\n")
+
+    result = service.grep(["req-1", "req-12", "E42"], "file.txt", False, False, fixed_strings=True)
+
+    assert [(row[1], row[2]) for row in result] == [(1, "req-1"), (1, "req-12"), (2, "E42")]
+
+
+def test_grep_multiple_regexps(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -e ... -e ...: совпадение с любым из паттернов"""
+    fs.create_file("file.txt", contents="warn 1\nerror 2\ninfo 3")
+
+    result = service.grep([r"warn \d", r"error \d"], "file.txt", False, False)
+
+    assert [row[2] for row in result] == ["warn 1", "error 2"]
+
+
+def test_grep_fixed_strings_ignore_case(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -F -i"""
+    fs.create_file("file.txt", contents="Ошибка E42\nошибка e42")
+
+    result = service.grep(["ошибка", "e42"], "file.txt", False, True, fixed_strings=True)
+
+    assert len(result) == 4
+
+
+def test_grep_fixed_strings_mmap(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест grep -F: поиск автоматом по mmap совпадает с построчным"""
+    file_path = tmp_path / "big.log"
+    file_path.write_text("".join(f"{n} id=req-{n} ёж\n" for n in range(300)), encoding="utf-8")
+    needles = ["req-7", "req-77", "ёж"]
+    expected = service.grep(needles, file_path, False, False, fixed_strings=True)
+    mocker.patch("src.services.luckyos_console.GREP_MMAP_THRESHOLD", 1)
+
+    result = service.grep(needles, file_path, False, False, fixed_strings=True)
+
+    assert len(expected) == 300 + 11
+    assert result == expected
+
+
+def test_grep_index_selects_candidates(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест grep --index: открываются только файлы, в которых есть обязательные строки"""
+    fs.create_dir("logs")
+    for number in range(5):
+        fs.create_file(os.path.join("logs", f"file{number}.log"), contents=f"request {number} ok\n")
+    fs.create_file(os.path.join("logs", "bad.log"), contents="request 7 failed: timeout\n")
+    expected = service.grep(r"fail\w+: time", "logs", True, False)
+
+    service.grep("unused", "logs", True, False, index=True)
+    spy_scan = mocker.spy(luckyos_console, "_iter_grep_file")
+    result = service.grep(r"fail\w+: time", "logs", True, False)
+
+    assert result == expected
+    assert len(result) == 1
+    assert spy_scan.call_count == 1
+
+
+def test_grep_index_scans_changed_files(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep с индексом: новые и изменившиеся файлы просматриваются всегда"""
+    fs.create_dir("logs")
+    fs.create_file(os.path.join("logs", "a.log"), contents="nothing here\n")
+    service.grep("nothing", "logs", True, False, index=True)
+    with open(os.path.join("logs", "a.log"), "a") as file:
+        file.write("timeout happened\n")
+    fs.create_file(os.path.join("logs", "b.log"), contents="another timeout\n")
+
+    result = service.grep("timeout", "logs", True, False)
+
+    assert len(result) == 2
+
+
+def test_grep_index_incremental_update(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест grep --index: при обновлении читаются только изменившиеся файлы"""
+    fs.create_dir("logs")
+    fs.create_file(os.path.join("logs", "a.log"), contents="alpha\n")
+    fs.create_file(os.path.join("logs", "b.log"), contents="beta\n")
+    service.grep("alpha", "logs", True, False, index=True)
+    os.remove(os.path.join("logs", "a.log"))
+    fs.create_file(os.path.join("logs", "c.log"), contents="gamma\n")
+    spy_trigrams = mocker.spy(trigram_index, "file_trigrams")
+
+    result = service.grep("gamma", "logs", True, False, index=True)
+
+    assert spy_trigrams.call_count == 1
+    assert [row[2] for row in result] == ["gamma"]
+
+
+@pytest.mark.parametrize("patterns, ignore_case, fixed_strings, expected", [
+    (["foo.*bar"], False, False, [[b"foo", b"bar"]]),
+    (["(error|warn)ing"], False, False, [[b"error", b"ing"], [b"warn", b"ing"]]),
+    (["ERR(?:OR)?_CODE"], False, False, [[b"err", b"_code"]]),
+    (["ab+"], False, False, None),
+    (["ошибка"], True, False, None),
+    (["req-1", "Kernel"], True, True, [[b"req-1"], [b"ernel"]]),
+])
+def test_required_literals(patterns, ignore_case, fixed_strings, expected):
+    """Тест выделения обязательных строк паттерна для индекса"""
+    assert required_literals(patterns, ignore_case, fixed_strings) == expected
+
+
+def test_grep_in_zip_archive(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep по файлам внутри zip архива без распаковки"""
+    with zipfile.ZipFile("logs.zip", "w") as archive:
+        archive.writestr("app/a.log", "ok\nerror 1\n")
+        archive.writestr("b.log", "error 2\n")
+
+    result = service.grep(r"error \d", "logs.zip", False, False)
+
+    assert result == [["logs.zip!app/a.log", 2, "error 1"], ["logs.zip!b.log", 1, "error 2"]]
+
+
+def test_grep_recursive_into_tar_archive(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -r: поиск заходит в tar.gz архивы внутри директории"""
+    fs.create_file(os.path.join("data", "plain.txt"), contents="error plain")
+    content = b"line\nerror packed\n"
+    with tarfile.open(os.path.join("data", "old.tar.gz"), "w:gz") as archive:
+        info = tarfile.TarInfo("old/app.log")
+        info.size = len(content)
+        archive.addfile(info, io.BytesIO(content))
+
+    result = service.grep("error", "data", True, False)
+
+    assert sorted(row[0] for row in result) == [
+        os.path.join("data", "old.tar.gz") + "!old/app.log",
+        os.path.join("data", "plain.txt"),
+    ]
+
+
+def test_grep_skips_binary_archive_members(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep: бинарные файлы внутри zip и tar.gz пропускаются, с опцией binary - нет"""
+    with zipfile.ZipFile("logs.zip", "w") as archive:
+        archive.writestr("text.log", "error text\n")
+        archive.writestr("image.png", b"\x89PNG\x00error\n")
+    content = b"\x7fELF\x00error\n"
+    with tarfile.open("bin.tar.gz", "w:gz") as archive:
+        info = tarfile.TarInfo("app.bin")
+        info.size = len(content)
+        archive.addfile(info, io.BytesIO(content))
+
+    assert service.grep("error", "logs.zip", False, False) == [["logs.zip!text.log", 1, "error"]]
+    assert service.grep("error", "bin.tar.gz", False, False) == []
+    assert len(service.grep("error", "logs.zip", False, False, binary=True)) == 2
+
+
+def test_grep_broken_archive(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep для поврежденного архива"""
+    fs.create_file("broken.zip", contents="not a zip")
+
+    with pytest.raises(OSError):
+        service.grep("error", "broken.zip", False, False)
+
+
+def test_grep_skips_binary_files(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep: файлы с NUL-байтом пропускаются, с опцией binary - нет"""
+    fs.create_dir("data")
+    fs.create_file(os.path.join("data", "text.txt"), contents="pattern")
+    fs.create_file(os.path.join("data", "image.png"), contents=b"\x89PNG\x00pattern")
+
+    result = service.grep("pattern", "data", True, False)
+    with_binary = service.grep("pattern", "data", True, False, binary=True)
+
+    assert [row[0] for row in result] == [os.path.join("data", "text.txt")]
+    assert len(with_binary) == 2
+
+
+def test_grep_include_exclude(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep --include/--exclude"""
+    fs.create_file(os.path.join("src", "a.py"), contents="pattern")
+    fs.create_file(os.path.join("src", "a.txt"), contents="pattern")
+    fs.create_file(os.path.join("src", "build", "b.py"), contents="pattern")
+
+    result = service.grep("pattern", "src", True, False, include=["*.py"], exclude=["build"])
+
+    assert [row[0] for row in result] == [os.path.join("src", "a.py")]
+
+
+def test_grep_respects_gitignore(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep: правила .gitignore и пропуск .git"""
+    fs.create_file(os.path.join("repo", ".gitignore"), contents="*.log\n/build/\n!keep.log\n")
+    fs.create_file(os.path.join("repo", ".git", "config"), contents="pattern")
+    fs.create_file(os.path.join("repo", "build", "out.txt"), contents="pattern")
+    fs.create_file(os.path.join("repo", "app", "build", "src.txt"), contents="pattern")
+    fs.create_file(os.path.join("repo", "app", "debug.log"), contents="pattern")
+    fs.create_file(os.path.join("repo", "app", "keep.log"), contents="pattern")
+
+    result = service.grep("pattern", "repo", True, False)
+    everything = service.grep("pattern", "repo", True, False, ignore_files=False)
+
+    assert sorted(row[0] for row in result) == [
+        os.path.join("repo", "app", "build", "src.txt"),
+        os.path.join("repo", "app", "keep.log"),
+    ]
+    assert len(everything) == 5
+
+
+def test_grep_deep_tree(service: OSConsoleServiceBase, tmp_path):
+    """Тест grep -r: глубина дерева не ограничена лимитом рекурсии"""
+    levels = [tmp_path]
+    for _ in range(sys.getrecursionlimit() + 100):
+        levels.append(levels[-1] / "d")
+        levels[-1].mkdir()
+    (levels[-1] / "file.txt").write_text("pattern")
+
+    try:
+        result = service.grep("pattern", tmp_path, True, False)
+    finally:
+        (levels[-1] / "file.txt").unlink()
+        for level in reversed(levels[1:]):
+            level.rmdir()
+
+    assert len(result) == 1
+
+
+def test_grep_files_with_matches(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -l: только имена файлов с совпадениями"""
+    fs.create_file(os.path.join("data", "a.txt"), contents="pattern\npattern\n")
+    fs.create_file(os.path.join("data", "b.txt"), contents="nothing")
+
+    result = service.grep("pattern", "data", True, False, files_with_matches=True)
+
+    assert result == [[os.path.join("data", "a.txt")]]
+
+
+def test_grep_count(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -c: количество совпадений в каждом файле"""
+    fs.create_file(os.path.join("data", "a.txt"), contents="pattern pattern\npattern\n")
+    fs.create_file(os.path.join("data", "b.txt"), contents="nothing")
+
+    result = service.grep("pattern", "data", True, False, count=True)
+
+    assert sorted(result) == [[os.path.join("data", "a.txt"), 3], [os.path.join("data", "b.txt"), 0]]
+
+
+def test_grep_max_count(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep -m N: не больше N совпадений в файле"""
+    fs.create_file("file.txt", contents="pattern 1\npattern 2\npattern 3\n")
+
+    result = service.grep("pattern", "file.txt", False, False, max_count=2)
+
+    assert [row[1] for row in result] == [1, 2]
+
+
+def test_grep_max_count_mmap(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест grep -m N при чтении через mmap: недочитанный файл закрывается без ошибок"""
+    big_file = tmp_path / "big.txt"
+    big_file.write_text("pattern\n" * 100)
+    mocker.patch("src.services.luckyos_console.GREP_MMAP_THRESHOLD", 1)
+
+    result = service.grep("pattern", big_file, False, False, max_count=5)
+
+    assert [row[1] for row in result] == [1, 2, 3, 4, 5]
+
+
+def test_grep_quiet_stops_at_first_match(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест grep -q: поиск останавливается на первом совпадении"""
+    for name in ("a.txt", "b.txt", "c.txt"):
+        fs.create_file(os.path.join("data", name), contents="pattern")
+    spy_hits = mocker.spy(luckyos_console, "_iter_file_hits")
+
+    result = service.grep("pattern", "data", True, False, quiet=True)
+
+    assert len(result) == 1
+    assert spy_hits.call_count == 1
+
+
+def test_grep_invalid_output_options(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep с несовместимыми или некорректными опциями вывода"""
+    fs.create_file("file.txt", contents="pattern")
+
+    with pytest.raises(ValueError):
+        service.grep("pattern", "file.txt", False, False, files_with_matches=True, count=True)
+    with pytest.raises(ValueError):
+        service.grep("pattern", "file.txt", False, False, max_count=0)
+
+
+@pytest.mark.parametrize("name, compress", [
+    ("app.log.gz", gzip.compress),
+    ("app.log.bz2", bz2.compress),
+    ("app.log.xz", lzma.compress),
+    ("rotated.1", gzip.compress),
+])
+def test_grep_compressed_file(service: OSConsoleServiceBase, fs: FakeFilesystem, name, compress):
+    """Тест grep по сжатому файлу: формат определяется по сигнатуре, файл распаковывается потоком"""
+    fs.create_file(name, contents=compress(b"ok\nerror 1\nok\nerror 2\n"))
+
+    result = service.grep(r"error \d", name, False, False)
+
+    assert result == [[name, 2, "error 1"], [name, 4, "error 2"]]
+
+
+def test_grep_zstd_file(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep по файлу, сжатому zstd"""
+    zstd = pytest.importorskip("compression.zstd")
+    fs.create_file("app.log.zst", contents=zstd.compress(b"error 1\n"))
+
+    result = service.grep("error", "app.log.zst", False, False)
+
+    assert result == [["app.log.zst", 1, "error"]]
+
+
+def test_grep_corrupted_compressed_file(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep для сжатого файла, поврежденного после начала"""
+    data = lzma.compress("".join(f"error {number}\n" for number in range(200000)).encode())
+    fs.create_file("app.log.xz", contents=data[:len(data) // 2])
+
+    with pytest.raises(OSError):
+        service.grep("error", "app.log.xz", False, False)
+
+
+@pytest.mark.parametrize("contents", [
+    "BZhello world\n",
+    "BZh9 hello world\n",
+    "\x1f\x8bhello world\n",
+])
+def test_grep_text_file_with_compression_like_start(service: OSConsoleServiceBase, fs: FakeFilesystem, contents):
+    """Тест grep -r: текстовый файл, начало которого похоже на сигнатуру сжатия, ищется как текст"""
+    fs.create_file(os.path.join("data", "notes.txt"), contents=contents)
+    fs.create_file(os.path.join("data", "other.txt"), contents="hello again\n")
+
+    result = service.grep("hello", "data", True, False)
+
+    assert sorted(row[0] for row in result) == [os.path.join("data", "notes.txt"), os.path.join("data", "other.txt")]
+
+
+def test_grep_reads_undecompressable_file_as_text(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep: файл с сигнатурой xz, который не распаковывается с самого начала, читается как обычный"""
+    fs.create_file("app.log.xz", contents=lzma.compress(b"error\n" * 100)[:40])
+
+    assert service.grep("error", "app.log.xz", False, False) == []
+
+
+def test_grep_index_uses_decompressed_content(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест grep --index: сжатые файлы индексируются по распакованному содержимому"""
+    fs.create_file(os.path.join("logs", "old.log.gz"), contents=gzip.compress(b"timeout happened\n"))
+    fs.create_file(os.path.join("logs", "new.log"), contents="all good\n")
+
+    service.grep("timeout", "logs", True, False, index=True)
+    result = service.grep("timeout", "logs", True, False)
+
+    assert [row[0] for row in result] == [os.path.join("logs", "old.log.gz")]
+
+
+def test_grep_cache_rescans_only_changed_files(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест grep --cache: неизменившиеся файлы берутся из кэша, измененные просматриваются заново"""
+    fs.create_file(os.path.join("logs", "a.log"), contents="ERROR a\n")
+    fs.create_file(os.path.join("logs", "b.log"), contents="ok\n")
+    first = service.grep("ERROR", "logs", True, False, cache=True)
+    fs.remove_object(os.path.join("logs", "b.log"))
+    fs.create_file(os.path.join("logs", "b.log"), contents="ok\nERROR b\n")
+    spy = mocker.spy(luckyos_console, "_iter_grep_file")
+
+    second = service.grep("ERROR", "logs", True, False, cache=True)
+
+    assert first == [[os.path.join("logs", "a.log"), 1, "ERROR"]]
+    assert second == [*first, [os.path.join("logs", "b.log"), 2, "ERROR"]]
+    assert [str(call.args[0]) for call in spy.call_args_list] == [os.path.join("logs", "b.log")]
+
+
+def test_grep_cache_is_per_query(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест grep --cache: другой паттерн или флаги не используют чужие результаты, без --cache кэш не читается"""
+    fs.create_file("file.txt", contents="Error\nerror\n")
+    service.grep("error", "file.txt", False, False, cache=True)
+    spy = mocker.spy(luckyos_console, "_iter_grep_file")
+
+    assert len(service.grep("error", "file.txt", False, True, cache=True)) == 2
+    assert len(service.grep("error", "file.txt", False, False)) == 1
+    assert spy.call_count == 2
+
+
+def test_grep_cache_evicts_least_recently_used(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест grep --cache: при превышении размера удаляются давно не использованные запросы"""
+    fs.create_file("file.txt", contents="x" * 1000 + "\n")
+    service.grep("x+", "file.txt", False, False, cache=True)
+    cache_dir = grep_cache.GrepCache.location(("any",)).parent
+    (oldest,) = os.listdir(cache_dir)
+    os.utime(cache_dir / oldest, ns=(0, 0))
+    mocker.patch.object(grep_cache, "GREP_CACHE_MAX_SIZE", 1500)
+
+    service.grep("x", "file.txt", False, False, cache=True)
+
+    assert len(os.listdir(cache_dir)) == 1
+    assert oldest not in os.listdir(cache_dir)
+
+
+def test_grep_cache_with_jobs(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture):
+    """Тест grep --cache --jobs: результаты из кэша и пула процессов собираются в исходном порядке"""
+    mocker.patch.object(grep_cache, "GREP_CACHE_DIR", str(tmp_path / "cache"))
+    data = tmp_path / "data"
+    data.mkdir()
+    for number in range(40):
+        (data / f"file{number:02}.txt").write_text(f"pattern {number}\n")
+    serial = list(service.grep("pattern", data, True, False))
+    service.grep("pattern", data, True, False, jobs=2, cache=True)
+    (data / "file07.txt").write_text("changed\npattern 7 again\n")
+    os.utime(data / "file07.txt", ns=(0, 0))
+
+    cached = service.grep("pattern", data, True, False, jobs=2, cache=True)
+
+    changed = [row[0] for row in serial].index(str(data / "file07.txt"))
+    serial[changed] = [str(data / "file07.txt"), 2, "pattern"]
+    assert cached == serial
+
+
+def test_grep_result_is_compact(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест результата grep: путь хранится один раз, строки собираются при обращении"""
+    fs.create_file(os.path.join("data", "a.txt"), contents="error 1\nok\nerror 22\n")
+    fs.create_file(os.path.join("data", "b.txt"), contents="error 333\n")
+
+    result = service.grep(r"error \d+", "data", True, False)
+
+    assert isinstance(result, GrepResult)
+    assert sorted(result.paths) == [os.path.join("data", "a.txt"), os.path.join("data", "b.txt")]
+    assert sorted(result) == [
+        [os.path.join("data", "a.txt"), 1, "error 1"],
+        [os.path.join("data", "a.txt"), 3, "error 22"],
+        [os.path.join("data", "b.txt"), 1, "error 333"],
+    ]
+    assert result[-1] == list(result)[-1]
+    assert result[:2] == list(result)[:2]
+    with pytest.raises(IndexError):
+        result[3]
+
+
+def test_grep_result_appends_after_read():
+    """Тест GrepResult: строки можно добавлять после чтения, тексты не смещаются"""
+    result = GrepResult([["a.txt", 1, "first"]])
+    assert result[0] == ["a.txt", 1, "first"]
+
+    result.extend([["b.txt", 2, ""], ["a.txt", 7, "третий"]])
+
+    assert result == [["a.txt", 1, "first"], ["b.txt", 2, ""], ["a.txt", 7, "третий"]]
+    assert result.paths == ["a.txt", "b.txt"]
+
+
+def test_build_matchers_fixed_string_types():
+    """Тест grep -F с одной строкой: для текста и для байтов строятся отдельные объекты поиска"""
+    text_matcher, bytes_matcher = build_matchers(["ab"], ignore_case=False, fixed_strings=True)
+
+    assert isinstance(text_matcher, LiteralMatcher) and isinstance(bytes_matcher, BytesLiteralMatcher)
+    assert list(text_matcher.spans("xabab")) == [(1, 3), (3, 5)]
+    assert list(bytes_matcher.spans(b"xabab")) == [(1, 3), (3, 5)]
+    with pytest.raises(TypeError):
+        list(text_matcher.spans(b"ab"))
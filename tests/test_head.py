@@ -0,0 +1,56 @@
+import os.path
+import pytest
+from pyfakefs.fake_filesystem import FakeFilesystem
+from pytest_mock import MockerFixture
+from src.services import luckyos_console
+from src.services.base import OSConsoleServiceBase
+
+
+def test_head_for_nonexisted_file(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест head для несуществующего файла"""
+    with pytest.raises(FileNotFoundError):
+        service.head("missing.txt")
+
+
+def test_head_for_folder(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест head для директории"""
+    fs.create_dir("data")
+
+    with pytest.raises(IsADirectoryError):
+        service.head("data")
+
+
+@pytest.mark.parametrize("lines", [0, 1, 3, 10, 20])
+def test_head_lines(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture, lines: int):
+    """Тест head -n: первые строки, файл читается блоками до нужного количества строк"""
+    mocker.patch.object(luckyos_console, "TAIL_BLOCK", 7)
+    content = "".join(f"line {number}\n" for number in range(12))
+    fs.create_file(os.path.join("data", "file.txt"), contents=content)
+
+    result = service.head(os.path.join("data", "file.txt"), lines)
+
+    assert result == "".join(content.splitlines(keepends=True)[:lines]).encode()
+
+
+def test_head_without_trailing_newline(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест head -n для файла без перевода строки в конце"""
+    fs.create_file("file.txt", contents="a\nb")
+
+    assert service.head("file.txt", 5) == b"a\nb"
+
+
+def test_head_bytes(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест head -c"""
+    fs.create_file("file.txt", contents=b"\x00\x01abc\n")
+
+    assert service.head("file.txt", byte_count=3) == b"\x00\x01a"
+    assert service.head("file.txt", byte_count=100) == b"\x00\x01abc\n"
+
+
+@pytest.mark.parametrize("options", [{"lines": -1}, {"byte_count": -5}])
+def test_head_invalid_options(service: OSConsoleServiceBase, fs: FakeFilesystem, options: dict):
+    """Тест head с отрицательным количеством"""
+    fs.create_file("file.txt", contents="text")
+
+    with pytest.raises(ValueError):
+        service.head("file.txt", **options)
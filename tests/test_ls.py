@@ -1,9 +1,13 @@
+import datetime
+import os
+import stat
 from pathlib import Path
 from unittest.mock import Mock
 import pytest
 from pyfakefs.fake_filesystem import FakeFilesystem
 from pytest_mock import MockerFixture
 
+from src.services import luckyos_console, walker
 from src.services.base import OSConsoleServiceBase
 
 
@@ -42,62 +46,44 @@ def test_ls_for_file(
     path_object.exists.assert_called_once()
 
 
-def test_ls_for_existing_directory(
-    service: OSConsoleServiceBase,
-    fake_pathlib_path_class: Mock,
-    mocker: MockerFixture,
-):
+def test_ls_for_existing_directory(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
     """Тест ls для существующей директории без опции -l"""
-    path_obj = mocker.create_autospec(Path, instance=True, spec_set=True)
-    path_obj.exists.return_value = True
-    path_obj.is_dir.return_value = True
-
-    entry = mocker.Mock()
-    entry.name = "file.txt"
-    path_obj.iterdir.return_value = [entry]
-
-    fake_pathlib_path_class.return_value = path_obj
+    fs.create_file(os.path.join("dir", "file.txt"))
+    scandir = mocker.spy(luckyos_console.os, "scandir")
 
-    result = service.ls("/fake/dir", False)
+    result = service.ls("dir", False)
 
-    fake_pathlib_path_class.assert_called_once_with("/fake/dir")
-    path_obj.exists.assert_called_once_with()
-    path_obj.is_dir.assert_called_once_with()
-    path_obj.iterdir.assert_called_once_with()
+    scandir.assert_called_once()
     assert result == ["file.txt\n"]
 
 
-def test_ls_long_format(
-    service: OSConsoleServiceBase,
-    fake_pathlib_path_class: Mock,
-    mocker: MockerFixture,
-):
+def test_ls_long_format(service: OSConsoleServiceBase, fs: FakeFilesystem):
     """Тест ls для директории с опцией -l"""
-    import datetime
-    import stat
+    fs.create_file(os.path.join("dir", "file.txt"), st_mode=stat.S_IFREG | 0o644, contents="x" * 100)
+    mtime = datetime.datetime(2024, 5, 17, 9, 30).timestamp()
+    os.utime(os.path.join("dir", "file.txt"), (mtime, mtime))
+
+    result = service.ls("dir", True)
 
-    path_obj = mocker.create_autospec(Path, instance=True, spec_set=True)
-    path_obj.exists.return_value = True
-    path_obj.is_dir.return_value = True
+    assert result == [["-rw-r--r--", 1, 100, "May 17 09:30", "file.txt"]]
 
-    entry = mocker.Mock()
-    entry.name = "file.txt"
-    file_info = mocker.Mock()
-    file_info.st_mode = stat.S_IFREG | 0o644
-    file_info.st_nlink = 1
-    file_info.st_size = 100
-    file_info.st_mtime = datetime.datetime.now().timestamp()
-    entry.stat.return_value = file_info
 
-    path_obj.iterdir.return_value = [entry]
-    fake_pathlib_path_class.return_value = path_obj
+def test_ls_long_format_caches_formatting(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест ls -l: права и дата форматируются один раз на каждое различающееся значение"""
+    mtime = datetime.datetime(2024, 5, 17, 9, 30).timestamp()
+    for number in range(10):
+        name = os.path.join("dir", f"file{number}.txt")
+        fs.create_file(name, st_mode=stat.S_IFREG | (0o644 if number % 2 else 0o600))
+        os.utime(name, (mtime + number, mtime + number))
+    fs.create_dir(os.path.join("dir", "subdir"), perm_bits=0o755)
+    filemode = mocker.spy(luckyos_console.stat, "filemode")
 
-    result = service.ls("/fake/dir", True)
+    result = service.ls("dir", True)
 
-    assert len(result) == 1
-    assert len(result[0]) == 5  # права, ссылки, размер, дата, имя
-    assert result[0][4] == "file.txt"
-    entry.stat.assert_called_once()
+    assert len(result) == 11
+    assert sorted({row[0] for row in result}) == ["-rw-------", "-rw-r--r--", "drwxr-xr-x"]
+    assert filemode.call_count == 3
+    assert {row[3] for row in result if row[4] != "subdir"} == {"May 17 09:30"}
 
 
 def test_ls_empty_directory(service: OSConsoleServiceBase, fs: FakeFilesystem):
@@ -116,3 +102,117 @@ def test_ls_empty_directory_long(service: OSConsoleServiceBase, fs: FakeFilesyst
     result = service.ls("empty_dir", True)
 
     assert result == []
+
+
+def test_ls_sort_and_paging(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест ls с сортировкой и постраничным выводом"""
+    for number, name in enumerate(["c.txt", "a.txt", "d.txt", "b.txt"]):
+        fs.create_file(os.path.join("dir", name), contents="x" * (number + 1) * 10)
+        os.utime(os.path.join("dir", name), (1_700_000_000 + number * 60, 1_700_000_000 + number * 60))
+
+    assert service.ls("dir", False, sort="name") == ["a.txt\n", "b.txt\n", "c.txt\n", "d.txt\n"]
+    assert service.ls("dir", False, sort="name", offset=1, limit=2) == ["b.txt\n", "c.txt\n"]
+    assert [row[4] for row in service.ls("dir", True, sort="size")] == ["b.txt", "d.txt", "a.txt", "c.txt"]
+    assert service.ls("dir", False, sort="mtime", limit=1) == ["b.txt\n"]
+    assert service.ls("dir", False, sort="name", offset=10) == []
+    assert len(service.ls("dir", False, limit=3)) == 3
+
+
+def test_ls_top_uses_bounded_heap(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест ls --top: самые большие файлы выбираются кучей, без сортировки всей директории"""
+    for number in range(20):
+        fs.create_file(os.path.join("dir", f"file{number:02}"), contents="x" * ((number * 7) % 20))
+    nlargest = mocker.spy(luckyos_console.heapq, "nlargest")
+    sort = mocker.patch.object(luckyos_console, "sorted", create=True, side_effect=sorted)
+
+    result = service.ls("dir", True, top=3)
+
+    assert [row[2] for row in result] == [19, 18, 17]
+    nlargest.assert_called_once()
+    assert nlargest.call_args.args[0] == 3
+    sort.assert_not_called()
+    assert service.ls("dir", False, sort="name", top=2) == ["file00\n", "file01\n"]
+
+
+@pytest.mark.parametrize("options", [{"limit": -1}, {"offset": -1}, {"top": 0}, {"sort": "color"}])
+def test_ls_invalid_options(service: OSConsoleServiceBase, fs: FakeFilesystem, options: dict):
+    """Тест ls с некорректными параметрами вывода"""
+    fs.create_dir("dir")
+
+    with pytest.raises(ValueError):
+        service.ls("dir", False, **options)
+
+
+def test_iter_ls_is_lazy(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест iter_ls: записи форматируются по мере чтения, а не после чтения всей директории"""
+    for number in range(5):
+        fs.create_file(os.path.join("dir", f"file{number}"))
+    filemode = mocker.spy(luckyos_console.stat, "filemode")
+
+    rows = service.iter_ls("dir", True)
+    next(rows)
+
+    assert filemode.call_count == 1
+
+
+def make_tree(fs: FakeFilesystem) -> None:
+    fs.create_file(os.path.join("root", "a", "b", "deep.txt"))
+    fs.create_file(os.path.join("root", "a", "a.txt"))
+    fs.create_file(os.path.join("root", "top.txt"))
+
+
+def test_ls_recursive(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест ls -R: блок каждой директории, поддиректории в прямом порядке"""
+    make_tree(fs)
+
+    result = [(directory, list(rows)) for directory, rows in service.iter_ls_recursive("root", False)]
+
+    assert result == [
+        ("root", ["a\n", "top.txt\n"]),
+        (os.path.join("root", "a"), ["b\n", "a.txt\n"]),
+        (os.path.join("root", "a", "b"), ["deep.txt\n"]),
+    ]
+
+
+def test_ls_recursive_max_depth(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест ls -R --max-depth: выводятся только записи до заданной глубины"""
+    make_tree(fs)
+
+    result = [directory for directory, rows in service.iter_ls_recursive("root", True, max_depth=2) if list(rows)]
+
+    assert result == ["root", os.path.join("root", "a")]
+
+
+def test_ls_tree(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест ls --tree: префиксы с линиями дерева"""
+    make_tree(fs)
+
+    result = [prefix + str(row).strip() for prefix, row in service.iter_ls_tree("root", False)]
+
+    assert result == [
+        "├── a",
+        "│   ├── b",
+        "│   │   └── deep.txt",
+        "│   └── a.txt",
+        "└── top.txt",
+    ]
+    assert [prefix for prefix, _ in service.iter_ls_tree("root", True, max_depth=1)] == ["├── ", "└── "]
+
+
+def test_ls_tree_beyond_open_dir_limit(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест ls --tree: глубже WALK_MAX_OPEN_DIRS директории читаются в список, результат тот же"""
+    make_tree(fs)
+    expected = list(service.iter_ls_tree("root", False))
+    mocker.patch.object(walker, "WALK_MAX_OPEN_DIRS", 1)
+    scandir = mocker.spy(walker.os, "scandir")
+
+    assert list(service.iter_ls_tree("root", False)) == expected
+    assert scandir.call_count == 3
+
+
+def test_ls_tree_invalid_depth(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест ls --tree с неположительной глубиной"""
+    fs.create_dir("root")
+
+    with pytest.raises(ValueError):
+        service.iter_ls_tree("root", False, max_depth=0)
@@ -137,3 +137,35 @@ def test_rm_file_not_found_error(service: OSConsoleServiceBase, fs: FakeFilesyst
 
     with pytest.raises(FileNotFoundError):
         service.rm("nonexistent.txt", False)
+
+
+def test_rm_recursive_reports_progress(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест rm -r: файлы удаляются с учетом в прогрессе, затем удаляются пустые директории"""
+    fs.create_file(os.path.join("data", "file.txt"), contents="x" * 100)
+    fs.create_file(os.path.join("data", "sub", "deep", "other.txt"), contents="y" * 50)
+    fs.create_symlink(os.path.join("data", "link"), os.path.join("data", "sub"))
+    mocker.patch("src.services.luckyos_console.access", return_value=True)
+    mocker.patch("src.services.luckyos_console.typer.prompt", return_value="y")
+    reports = []
+    service.set_progress_callback(reports.append)
+
+    service.rm("data", True)
+
+    assert not os.path.exists("data")
+    final = reports[-1]
+    assert final.finished and final.operation == "rm"
+    assert final.files_done == final.files_total == 3
+    assert final.bytes_done == final.bytes_total == 150 + len(os.path.join("data", "sub"))
+
+
+def test_rm_recursive_symlink_to_directory(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест rm -r для ссылки на директорию: ошибка, файлы в целевой директории не трогаются"""
+    fs.create_file(os.path.join("data", "file.txt"), contents="test")
+    fs.create_symlink("link", "data")
+    mocker.patch("src.services.luckyos_console.typer.prompt", return_value="y")
+
+    with pytest.raises(OSError):
+        service.rm("link", True)
+
+    assert os.path.exists(os.path.join("data", "file.txt"))
+    assert os.path.islink("link")
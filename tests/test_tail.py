@@ -0,0 +1,94 @@
+import os
+import random
+import pytest
+from pyfakefs.fake_filesystem import FakeFilesystem
+from pytest_mock import MockerFixture
+from src.services import follow, luckyos_console
+from src.services.base import OSConsoleServiceBase
+
+
+def test_tail_for_nonexisted_file(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест tail для несуществующего файла"""
+    with pytest.raises(FileNotFoundError):
+        service.tail("missing.txt")
+
+
+def test_tail_lines_matches_reference(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест tail -n: совпадает с последними строками для разных файлов и размеров блока"""
+    mocker.patch.object(luckyos_console, "TAIL_BLOCK", 5)
+    generator = random.Random(7)
+    for attempt in range(200):
+        content = "".join(generator.choice(["a", "bc", "\n", "\n\n", "ёж"]) for _ in range(generator.randint(0, 30)))
+        lines = generator.randint(0, 8)
+        name = f"file{attempt}.txt"
+        fs.create_file(name, contents=content.encode())
+
+        expected = b"".join(content.encode().splitlines(keepends=True)[-lines:]) if lines else b""
+
+        assert service.tail(name, lines) == expected, (content, lines)
+
+
+def test_tail_bytes(service: OSConsoleServiceBase, fs: FakeFilesystem):
+    """Тест tail -c"""
+    fs.create_file("file.txt", contents=b"0123456789")
+
+    assert service.tail("file.txt", byte_count=3) == b"789"
+    assert service.tail("file.txt", byte_count=100) == b"0123456789"
+    assert service.tail("file.txt", byte_count=0) == b""
+
+
+def test_tail_reads_only_the_end(service: OSConsoleServiceBase, tmp_path):
+    """Тест tail -n: читается только конец файла, а не весь файл"""
+    path = tmp_path / "huge.log"
+    with open(path, "wb") as file:
+        # Разреженный файл на 64 ГБ: чтение целиком заняло бы минуты
+        file.truncate(64 * 1024 ** 3)
+        file.seek(0, os.SEEK_END)
+        file.write(b"first\nsecond\nthird\n")
+
+    assert service.tail(path, 2) == b"second\nthird\n"
+
+
+def follow_until(chunks, expected: bytes) -> bytes:
+    data = b""
+    while len(data) < len(expected):
+        data += next(chunks)
+    return data
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_tail_follow(service: OSConsoleServiceBase, tmp_path, mocker: MockerFixture, inotify: bool):
+    """Тест tail -f: после последних строк выводятся дописанные данные, в том числе после усечения файла"""
+    mocker.patch.object(follow, "TAIL_POLL_INTERVAL", 0.01)
+    if not inotify:
+        mocker.patch.object(follow, "_load_libc", return_value=None)
+    path = tmp_path / "app.log"
+    path.write_bytes(b"1\n2\n3\n")
+
+    chunks = service.tail_follow(path, 2)
+    try:
+        assert next(chunks) == b"2\n3\n"
+        with open(path, "ab") as file:
+            file.write(b"4\n")
+        assert follow_until(chunks, b"4\n") == b"4\n"
+        with open(path, "wb") as file:
+            file.write(b"new\n")
+        assert follow_until(chunks, b"new\n") == b"new\n"
+    finally:
+        chunks.close()
+
+
+def test_file_watcher_uses_inotify_on_linux(tmp_path):
+    """Тест FileWatcher: на Linux изменения отслеживаются через inotify"""
+    path = tmp_path / "app.log"
+    path.write_bytes(b"")
+    watcher = follow.FileWatcher(path)
+    try:
+        if os.uname().sysname != "Linux":
+            pytest.skip("inotify есть только в Linux")
+        assert watcher.uses_inotify
+        assert not watcher.wait(0.01)
+        path.write_bytes(b"data")
+        assert watcher.wait(1)
+    finally:
+        watcher.close()
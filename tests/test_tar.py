@@ -83,3 +83,63 @@ def test_untar_os_error(service: OSConsoleServiceBase, fs: FakeFilesystem, mocke
 
     with pytest.raises(OSError):
         service.untar(archive_path)
+
+
+def test_tar_writes_sparse_entries(
+        service: OSConsoleServiceBase, tmp_path, monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture
+):
+    """Тест tar: разреженный файл записывается записью GNU sparse, в архив попадают только данные"""
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "plain.txt").write_text("plain")
+    chunks = {offset: bytes([number + 1]) * 3000 for number, offset in enumerate(range(0, 40 * 65536, 65536 * 4))}
+    with open(data / "disk.img", "wb") as file:
+        for offset, chunk in chunks.items():
+            file.seek(offset)
+            file.write(chunk)
+        file.truncate(48 * 65536)
+    if (data / "disk.img").stat().st_blocks * 512 >= (data / "disk.img").stat().st_size:
+        pytest.skip("Файловая система не поддерживает разреженные файлы")
+    monkeypatch.chdir(tmp_path)
+    mocker.patch("src.services.luckyos_console.access", return_value=True)
+
+    service.tar(data, tmp_path / "archive.tar.gz")
+
+    with tarfile.open(tmp_path / "archive.tar.gz", "r:gz") as tar:
+        member = tar.getmember("data/disk.img")
+        assert member.type == tarfile.GNUTYPE_SPARSE
+        assert member.size == 48 * 65536
+        assert tar.extractfile(member).read() == (data / "disk.img").read_bytes()
+        assert tar.extractfile("data/plain.txt").read() == b"plain"
+    (data / "disk.img").rename(tmp_path / "original.img")
+    (data / "plain.txt").unlink()
+    data.rmdir()
+    service.untar(tmp_path / "archive.tar.gz")
+    assert (data / "disk.img").read_bytes() == (tmp_path / "original.img").read_bytes()
+    assert (data / "plain.txt").read_text() == "plain"
+
+
+def test_tar_and_untar_report_progress(
+        service: OSConsoleServiceBase, logger, tmp_path, monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture
+):
+    """Тест tar и untar: итоговая скорость пишется в лог, untar не знает общий объем заранее"""
+    data = tmp_path / "data"
+    (data / "sub").mkdir(parents=True)
+    (data / "file.txt").write_bytes(b"x" * 1000)
+    (data / "sub" / "other.txt").write_bytes(b"y" * 500)
+    mocker.patch("src.services.luckyos_console.access", return_value=True)
+    reports = []
+    service.set_progress_callback(reports.append)
+
+    service.tar(data, tmp_path / "archive.tar.gz")
+    (tmp_path / "out").mkdir()
+    monkeypatch.chdir(tmp_path / "out")
+    service.untar(tmp_path / "archive.tar.gz")
+
+    tar_final, untar_final = [report for report in reports if report.finished]
+    assert (tar_final.bytes_done, tar_final.bytes_total, tar_final.files_done, tar_final.files_total) == (1500, 1500, 2, 2)
+    assert (untar_final.bytes_done, untar_final.bytes_total, untar_final.files_done) == (1500, None, 2)
+    logged = [call.args[0] for call in logger.info.call_args_list]
+    assert any(message.startswith("tar: файлов 2, 1.5 КБ") for message in logged)
+    assert any(message.startswith("untar: файлов 2, 1.5 КБ") for message in logged)
+    assert (tmp_path / "out" / "data" / "sub" / "other.txt").read_bytes() == b"y" * 500
@@ -103,3 +103,25 @@ def test_unzip_os_error(service: OSConsoleServiceBase, fs: FakeFilesystem, mocke
 
     with pytest.raises(OSError):
         service.unzip(archive_path)
+
+
+def test_zip_and_unzip_report_progress(service: OSConsoleServiceBase, fs: FakeFilesystem, mocker: MockerFixture):
+    """Тест zip и unzip: обработчик получает итог по байтам и файлам, директории файлами не считаются"""
+    fs.create_file(os.path.join("data", "file.txt"), contents="x" * 1000)
+    fs.create_file(os.path.join("data", "sub", "other.txt"), contents="y" * 500)
+    mocker.patch("src.services.luckyos_console.access", return_value=True)
+    reports = []
+    service.set_progress_callback(reports.append)
+
+    service.zip("data", "archive.zip")
+    with zipfile.ZipFile("archive.zip", "a") as archive:
+        archive.mkdir("empty")
+    fs.create_dir("out")
+    os.chdir("out")
+    service.unzip(os.path.join("..", "archive.zip"))
+
+    finals = [report for report in reports if report.finished]
+    assert [(report.operation, report.bytes_done, report.bytes_total, report.files_done, report.files_total)
+            for report in finals] == [("zip", 1500, 1500, 2, 2), ("unzip", 1500, 1500, 2, 2)]
+    with open(os.path.join("sub", "other.txt")) as file:
+        assert file.read() == "y" * 500